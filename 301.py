@@ -9,6 +9,22 @@ from web3.exceptions import ContractLogicError
 from dotenv import load_dotenv
 from eth_abi import encode
 from collections import deque
+from receipts import ReceiptTracker
+from wallet_state import WalletState
+from transport import make_provider, set_pool_size, set_rate_limiter
+from rate_limiter import RateLimiter, priority, EXECUTION
+from rpc_client import BatchRPCClient
+from abi_codec import FastRouter, encode_approve
+from quote_curve import CurveBook, QuoteCurve, RouteCurves, size_ladder
+from slippage import SlippageModel
+from block_clock import BlockClock
+from v3_pool import V3PoolBook
+from circuit_breaker import BreakerRegistry, quote_curves
+from price_daemon import price_source
+from snapshot import SnapshotBuffer, PRICE_FIELDS
+from records import QuoteTable
+from gas_model import GasModel
+from broadcaster import Broadcaster, submit_urls
 
 # --------------------------
 # 初始化配置
@@ -21,7 +37,9 @@ BSC_RPC_URLS = [
     os.getenv("BSC_RPC_URL2", "https://bsc-dataseed1.defibit.io/"),
     os.getenv("BSC_RPC_URL3", "https://bsc-dataseed2.defibit.io/")
 ]
-w3 = Web3(Web3.HTTPProvider(BSC_RPC_URLS[0]))
+# 各節點令牌桶限流：超速時排隊等待，不再因 429 頻繁切換節點
+set_rate_limiter(RateLimiter.for_urls(BSC_RPC_URLS))
+w3 = Web3(make_provider(BSC_RPC_URLS[0]))
 assert w3.is_connected(), "❌ BSC節點連接失敗"
 
 # 合約地址（强制校驗格式）
@@ -31,11 +49,15 @@ CONTRACT_ADDRESSES = {
     "babyswap_router": Web3.to_checksum_address("0x8317c460C22A9958c27b4B6403b98d2Ef4E2ad32"),
     "Mdex_router": Web3.to_checksum_address("0x7DAe51BD3E3376B8c7c4900E9107f12Be3AF1bA8"),
     "Openocean_router": Web3.to_checksum_address("0x8ea5219a16c2dbF1d6335A6aa0c6bd45c50347C5"),
+    "pancake_v3_factory": Web3.to_checksum_address("0x0BFbCF9fa4f9C56B0F40a671Ad40E0805A091865"),
     "usdt": Web3.to_checksum_address("0x55d398326f99059fF775485246999027B3197955"),
     "wbnb": Web3.to_checksum_address("0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"),
     "busd": Web3.to_checksum_address("0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56")
 }
 
+# 實際會下單的 V2 路由（授權只給這些）；Openocean 是聚合器地址、不是 V2 路由，只參與報價
+TRADE_DEXES = ["pancake", "Biswap", "Mdex", "babyswap"]
+
 # -----------------------price_monitor---
 # ABI 配置
 # --------------------------
@@ -75,9 +97,9 @@ busd_contract = w3.eth.contract(address=CONTRACT_ADDRESSES["busd"], abi=ERC20_AB
 #策略參數
 # --------------------------
 class Config:
-    CHECK_INTERVAL = 0.5          # 價格檢查時間（秒）
+    CHECK_INTERVAL = 0.5          # 價格檢查時間（秒，未接區塊時鐘時的快取時效）
     MAX_TX_DURATION = 1.0         # 最大交易耗時（秒）
-    SLIPPAGE_TOLERANCE = 1.5      # 滑點滑鐵盧（百分比）
+    SLIPPAGE_TOLERANCE = 1.5      # 滑點滑鐵盧（百分比，動態滑點上限）
     MIN_PROFIT_USDT = 0.3         # 最小套利利潤（USDT）
     TRADE_AMOUNT_USDT = 50        # 單次交易金額（USDT）
     GAS_LIMIT_BUFFER = 1.2        # Gas Limit 緩衝系數
@@ -85,15 +107,18 @@ class Config:
     BALANCE_BUFFER_BNB = 0.1      # 最低保留BNB餘額（BNB）
     RETRY_ATTEMPTS = 3            # 交易重試次數
     APPROVE_INFINITE = 2**256 -1  # 買賣授權額度無限大
+    V3_REFRESH_SECONDS = 30       # V3 池報價刷新間隔（秒，僅供顯示參考）
 
 # --------------------------
 # 高頻價格監控模組（二版）by祐
 # --------------------------
 class EnhancedPriceMonitor:
-    def __init__(self):
-        self.price_cache = {}
+    def __init__(self, rpc=None):
+        self.rpc = rpc or BatchRPCClient(BSC_RPC_URLS[0], urls=BSC_RPC_URLS)
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=5)
-        self.last_update = 0
+        self.block = None          # 區塊時鐘的最新區塊
+        # 各 DEX 買賣方向的報價曲線（交易金額附近的規模階梯），定量與選路都讀這份
+        self.curves = CurveBook()
         self.dex_list = [
             ("pancake", pancake_router),
             ("Openocean", Openocean_router),
@@ -101,65 +126,125 @@ class EnhancedPriceMonitor:
             ("Mdex", Mdex_router),
             ("babyswap", babyswap_router)
         ]
+        # 報價讀取來源：設定 PRICE_DAEMON_SOCKET 時與其他機器人共用本機報價服務
+        self.quotes = price_source(self.rpc)
+        # 報價走精簡編解碼，繞過 web3 合約函式機制
+        self.fast_routers = {name: FastRouter(self.quotes, router.address) for name, router in self.dex_list}
+        # 集中流動性（V3）池：只報價、不下單（沒有 V3 SwapRouter 執行路徑，不在 TRADE_DEXES 內）；
+        # 池鏡像每 Config.V3_REFRESH_SECONDS 才同步一次，期間沿用上次的價格顯示
+        self.v3_venues = [
+            ("pancakeV3", V3PoolBook(self.quotes, CONTRACT_ADDRESSES["pancake_v3_factory"]))
+        ]
+        self._v3_prices = {}       # 名稱 -> (計算時間, 買賣價)
+        # 註：StableSwap 池（USDT<->BUSD）的組合路徑無法以單筆 V2 路由交易成交，
+        # 本模組不載入；via busd 路徑只報價路由本身的三跳 swap
+        # 依 (路由, 路徑) 的報價斷路器：一直失敗的報價（例如聚合器地址）開啟後只偶爾探測
+        self.breakers = BreakerRegistry()
+        # 各 DEX 買賣價與其區塊 / 時間戳一起發布，讀取端永遠拿到同一輪的完整快照；
+        # 設定 PRICE_SNAPSHOT_SHM 時放在共享記憶體，其他行程可直接讀取
+        self.snapshots = SnapshotBuffer([name for name, _ in self.dex_list] + [name for name, _ in self.v3_venues],
+                                        PRICE_FIELDS, name=os.getenv("PRICE_SNAPSHOT_SHM"))
 #蘇
-    def get_real_time_prices(self):
-        """多線成獲取各DEX最優價格"""
-        if time.time() - self.last_update < Config.CHECK_INTERVAL:
-            return self.price_cache
+    def on_block(self, block):
+        """區塊時鐘回呼：新區塊到達後快取失效"""
+        self.block = block
 
+    def get_real_time_prices(self) -> QuoteTable:
+        """多線成獲取各DEX最優價格（以 DEX 序號為索引的買 / 賣價表）"""
+        snap = self.snapshots.read()
+        if self.block is not None:
+            # 每個區塊只報價一次，全部釘選在同一區塊
+            if snap.block == self.block and snap:
+                return QuoteTable.from_snapshot(snap)
+        elif snap.age() < Config.CHECK_INTERVAL:
+            return QuoteTable.from_snapshot(snap)
+
+        block = self.block
+        self.curves.reset(block if block is not None else time.time())
         futures = {}
         for dex_name, router in self.dex_list:
-            futures[self.executor.submit(self._fetch_dex_price, router)] = dex_name
-
+            futures[self.executor.submit(self._fetch_dex_price, self.fast_routers[dex_name], block or "latest", dex_name)] = dex_name
         updated_prices = {}
+        now = time.time()
+        for dex_name, book in self.v3_venues:
+            cached = self._v3_prices.get(dex_name)
+            if cached and now - cached[0] < Config.V3_REFRESH_SECONDS:
+                updated_prices[dex_name] = cached[1]
+                continue
+            futures[self.executor.submit(self._fetch_v3_price, book, block, dex_name)] = dex_name
+
         for future in concurrent.futures.as_completed(futures):
             dex_name = futures[future]
             try:
                 price_data = future.result()
+                if price_data is None:
+                    continue
                 updated_prices[dex_name] = {
                     'buy_price': price_data[0],
                     'sell_price': price_data[1]
                 }
+                if any(dex_name == name for name, _ in self.v3_venues):
+                    self._v3_prices[dex_name] = (now, updated_prices[dex_name])
             except Exception as e:
                 print(f"[{dex_name}] 價格獲取異常: {str(e)}")
 
         if updated_prices:
-            self.price_cache = updated_prices
-            self.last_update = time.time()
-        return self.price_cache
+            self.snapshots.publish(updated_prices, block)
+        return QuoteTable.from_snapshot(self.snapshots.read())
+
+    # 買入：USDT -> WBNB；賣出：WBNB -> USDT
+    BUY_PATHS = [
+        [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]],
+        [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["wbnb"]]]
+    SELL_PATHS = [
+        [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]],
+        [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["usdt"]]]
 
-    def _fetch_dex_price(self, router):
+    def _ladders(self, dex_name):
+        """交易金額附近的規模階梯；1 單位的點用於價格顯示與比較"""
+        trade = Config.TRADE_AMOUNT_USDT * 10**18
+        last_sell = self.snapshots.read().value(dex_name, 'sell_price') if dex_name else None
+        usdt_sizes = size_ladder(trade, extra=[10**18])
+        wbnb_sizes = size_ladder(int(trade / last_sell), extra=[10**18]) if last_sell else [10**18]
+        return usdt_sizes, wbnb_sizes
+
+    def _publish_curves(self, dex_name, buy, sell):
+        if dex_name:
+            self.curves.put((dex_name, "buy"), buy)
+            self.curves.put((dex_name, "sell"), sell)
+        buy_prices = [c.amount_out(10**18) / 1e18 for c in buy.curves]
+        sell_prices = [c.amount_out(10**18) / 1e18 for c in sell.curves]
+        return (max(buy_prices) if buy_prices else 0,
+                max(sell_prices) if sell_prices else 0)
+
+    def _fetch_dex_price(self, router, block="latest", dex_name=None):
         """獲取雙向最優價格（買/賣）"""
         try:
-            # 買入：USDT -> WBNB
-            buy_paths = [
-                [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]],
-                [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["wbnb"]]]
-            buy_prices = []
-            for path in buy_paths:
-                try:
-                    amounts = router.functions.getAmountsOut(10**18, path).call(timeout=2)
-                    buy_prices.append(amounts[-1] / 1e18)
-                except:
-                    continue
-            
-            # 賣出：WBNB -> USDT
-            sell_paths = [
-                [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]],
-                [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["usdt"]]]
-            sell_prices = []
-            for path in sell_paths:
-                try:
-                    amounts = router.functions.getAmountsOut(10**18, path).call(timeout=2)
-                    sell_prices.append(amounts[-1] / 1e18)
-                except:
-                    continue
-
-            return (max(buy_prices) if buy_prices else 0, 
-                    max(sell_prices) if sell_prices else 0)
+            # 買賣四條路徑 × 規模階梯一次批次報價
+            usdt_sizes, wbnb_sizes = self._ladders(dex_name)
+            plans = [(p, usdt_sizes) for p in self.BUY_PATHS] + [(p, wbnb_sizes) for p in self.SELL_PATHS]
+            # 斷路器開啟中的路徑不送出；全部開啟時本輪略過這個 DEX
+            curves = quote_curves(self.breakers, router, plans, block)
+            if not any(curves):
+                return None
+            n = len(self.BUY_PATHS)
+            return self._publish_curves(dex_name, RouteCurves(curves[:n]), RouteCurves(curves[n:]))
         except Exception as e:
             raise RuntimeError(f"DEX價格獲取失敗: {str(e)}")
 
+    def _fetch_v3_price(self, book, block=None, dex_name=None):
+        """V3 池鏡像推進到目前區塊後，整條規模階梯在本地計算"""
+        try:
+            if block is None:
+                block = self.rpc.block_number()
+            book.sync([pair for path in self.BUY_PATHS for pair in zip(path, path[1:])], block)
+            usdt_sizes, wbnb_sizes = self._ladders(dex_name)
+            buy = RouteCurves([QuoteCurve(p, usdt_sizes, [book.quote(s, p) for s in usdt_sizes]) for p in self.BUY_PATHS])
+            sell = RouteCurves([QuoteCurve(p, wbnb_sizes, [book.quote(s, p) for s in wbnb_sizes]) for p in self.SELL_PATHS])
+            return self._publish_curves(dex_name, buy, sell)
+        except Exception as e:
+            raise RuntimeError(f"V3價格計算失敗: {str(e)}")
+
 # --------------------------
 # 套利引擎核心（完整版）
 # --------------------------
@@ -167,23 +252,35 @@ class CompleteArbitrageEngine:
     def __init__(self):
         self.wallet_address = Web3.to_checksum_address(os.getenv("WALLET_ADDRESS"))
         self.private_key = os.getenv("PRIVATE_KEY")
-        self.price_monitor = EnhancedPriceMonitor()
-        self.nonce = w3.eth.get_transaction_count(self.wallet_address)
+        # 零散讀取自動合併成批次請求
+        self.rpc = BatchRPCClient(BSC_RPC_URLS[0], urls=BSC_RPC_URLS)
+        self.price_monitor = EnhancedPriceMonitor(self.rpc)
+        self.nonce = self.rpc.get_transaction_count(self.wallet_address, "latest")
         self.nonce_lock = threading.Lock()
         self.gas_strategy = self.dynamic_gas_price
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+        # 連線池大小對齊價格監控與交易執行的並行數
+        set_pool_size(self.price_monitor.executor._max_workers + self.executor._max_workers)
         self.pending_transactions = {}
+        self.receipts = ReceiptTracker(BSC_RPC_URLS[0])
+        # 已簽名交易同時送往所有節點（含 BSC_SUBMIT_URLS 額外端點），第一個確認即返回
+        self.broadcaster = Broadcaster(BSC_RPC_URLS, extra=submit_urls())
+        # 錢包餘額與授權快取（交易前不再讀鏈）；只追蹤實際下單的 V2 路由
+        self.wallet = WalletState(
+            BSC_RPC_URLS[0],
+            self.wallet_address,
+            [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]],
+            [self._get_router_address(dex) for dex in TRADE_DEXES],
+        ).load()
+        # 動態滑點：依價格衝擊與路徑近期波動計算最低輸出
+        self.slippage = SlippageModel(max_bps=Config.SLIPPAGE_TOLERANCE * 100)
+        # Gas 上限依過去收據學到的用量（Config.GAS_LIMIT_BUFFER 為安全邊際），送單前不再 estimate_gas
+        self.gas_model = GasModel(margin=Config.GAS_LIMIT_BUFFER)
         
         # 初始化代幣精度
         self.usdt_decimals = usdt_contract.functions.decimals().call()
         self.wbnb_decimals = wbnb_contract.functions.decimals().call()
 
-   # --------------------------
-# 套利引擎核心（完整版）
-# --------------------------
-class CompleteArbitrageEngine:
-
-
     def check_and_execute_arbitrage(self):
         """完整的套利檢測與執行流程"""
         prices = self.price_monitor.get_real_time_prices()
@@ -192,38 +289,24 @@ class CompleteArbitrageEngine:
 
         # +++ 新增价格显示功能 +++
         print("\n=== 实时价格监控 ===")
-        for dex, data in prices.items():
-            buy_price = data['buy_price'] if data['buy_price'] else 0.0
-            sell_price = data['sell_price'] if data['sell_price'] else 0.0
-            print(f"[{dex.upper():<10}] 买价: {buy_price:.6f} | 卖价: {sell_price:.6f} | 价差: {(sell_price - buy_price):.4f}")
+        for i in prices.live():
+            buy_price = prices.buy[i] or 0.0
+            sell_price = prices.sell[i] or 0.0
+            print(f"[{prices.names[i].upper():<10}] 买价: {buy_price:.6f} | 卖价: {sell_price:.6f} | 价差: {(sell_price - buy_price):.4f}")
+        breakers = self.price_monitor.breakers.report()
+        if breakers:
+            print("🔌 斷路中: " + " | ".join(breakers))
         print("====================\n")
 
-        # 尋找最佳套利組合
-        best_opp = None
-        for buy_dex, buy_data in prices.items():
-            for sell_dex, sell_data in prices.items():
-                if buy_dex == sell_dex:
-                    continue
-                
-                spread = sell_data['sell_price'] - buy_data['buy_price']
-                if spread < Config.MIN_PROFIT_USDT:
-                    continue
-                
-                if not best_opp or spread > best_opp['spread']:
-                    best_opp = {
-                        'buy_dex': buy_dex,
-                        'sell_dex': sell_dex,
-                        'spread': spread,
-                        'buy_price': buy_data['buy_price'],
-                        'sell_price': sell_data['sell_price']
-                    }
-
+        # 尋找最佳套利組合（直接在價格陣列上比較，只配置一個結果）；
+        # 只在有 V2 路由可下單的 DEX 間選擇，聚合器與 V3 池的報價僅供參考
+        best_opp = prices.best_opportunity(Config.MIN_PROFIT_USDT, TRADE_DEXES)
         if not best_opp:
             return False
 
-        # 計算實際利潤
+        # 計算實際利潤（扣除依 Gas 模型估算的買賣兩筆交易成本）
         net_profit = self.calculate_net_profit(
-            best_opp['spread'], 
+            best_opp, 
             Config.TRADE_AMOUNT_USDT
         )
         if net_profit < Config.MIN_PROFIT_USDT:
@@ -231,23 +314,43 @@ class CompleteArbitrageEngine:
 
         # 執行套利交易
         
+    def calculate_net_profit(self, opp, amount_usdt):
+        """買入 → 賣出一輪的淨利（USDT）：以本輪買賣價換算毛利，再扣預估 Gas 成本"""
+        gross = amount_usdt * opp.buy_price * opp.sell_price - amount_usdt
+        return gross - self._expected_gas_cost(opp, amount_usdt)
+
+    def _expected_gas_cost(self, opp, amount_usdt):
+        """買賣兩筆交易的預估 Gas 成本（USDT）：用量讀 Gas 模型（依實際選的路徑），不打節點估算"""
+        usdt, wbnb = CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]
+        amount_in = int(amount_usdt * 10**18)
+        gas_units = 0
+        for dex_name, side, default, size in ((opp.buy_dex, "buy", [usdt, wbnb], amount_in),
+                                              (opp.sell_dex, "sell", [wbnb, usdt], int(amount_in * opp.buy_price))):
+            curves = self.price_monitor.curves.get((dex_name, side))
+            path = (curves.best(size)[0] if curves else None) or default
+            gas_units += self.gas_model.estimate(self._get_router_address(dex_name), path)
+        # 賣價即 1 WBNB 換得的 USDT，直接當 BNB 價格使用
+        return gas_units * self.gas_strategy() / 1e18 * opp.sell_price
+
     def _calculate_gas_cost(self, start_time):
         """計算總Gas成本"""
         current_bnb_price = self._get_bnb_price()
         gas_used = 0
-        for tx_hash in self.pending_transactions.values():
-            try:
-                receipt = w3.eth.get_transaction_receipt(tx_hash)
-                gas_used += receipt.gasUsed * receipt.effectiveGasPrice
-            except:
-                continue
+        # 一次批次查詢全部在途交易收據
+        try:
+            receipts = self.receipts.fetch_many(self.pending_transactions.values())
+        except Exception as e:
+            print(f"⚠️ 收據批次查詢失敗: {str(e)}")
+            receipts = {}
+        for receipt in receipts.values():
+            gas_used += receipt.gasUsed * receipt.effectiveGasPrice
         return (gas_used / 1e18) * current_bnb_price
 
     def _get_router_address(self, dex_name):
         return CONTRACT_ADDRESSES[f"{dex_name}_router"]
 
     def dynamic_gas_price(self):
-        current_gas = w3.eth.gas_price
+        current_gas = self.rpc.gas_price()
         return min(int(current_gas * 1.15), Web3.to_wei(Config.MAX_GAS_GWEI, "gwei"))
 
     def _get_optimal_path(self, router, in_token, out_token, amount_in):
@@ -262,40 +365,91 @@ class CompleteArbitrageEngine:
             [token_map[in_token], token_map["busd"], token_map[out_token]]
         ]
         
-        best_path = None
-        max_out = 0
-        for path in possible_paths:
-            try:
-                amounts = router.functions.getAmountsOut(amount_in, path).call()
-                if amounts[-1] > max_out:
-                    max_out = amounts[-1]
-                    best_path = path
-            except:
-                continue
+        # 優先讀價格監控本輪的報價曲線；沒有時才以 [千分之一探測, 實際金額] 一次批次報價
+        dex_name = next((name for name, r in self.price_monitor.dex_list if r.address == router.address), None)
+        side = {("usdt", "wbnb"): "buy", ("wbnb", "usdt"): "sell"}.get((in_token, out_token))
+        curves = self.price_monitor.curves.get((dex_name, side))
+        if not curves:
+            probe_in = max(amount_in // 1000, 1)
+            curves = RouteCurves(quote_curves(self.price_monitor.breakers, FastRouter(self.rpc, router.address),
+                                              [(p, [probe_in, amount_in]) for p in possible_paths]))
+        best_path, max_out = curves.best(amount_in)
         
         if not best_path:
             raise ValueError("無有效交易路徑")
+        impact = curves.curve(best_path).impact(amount_in)
         
-        min_out = int(max_out * (100 - Config.SLIPPAGE_TOLERANCE) / 100)
+        key = (router.address, tuple(best_path))
+        self.slippage.tracker.observe(key, max_out / amount_in)
+        min_out = self.slippage.min_amount_out(max_out, key, impact)
         return best_path, min_out
 
+    def ensure_approvals(self):
+        """啟動時一次對 TRADE_DEXES 的 V2 路由送出 USDT / WBNB 無限授權（Config.APPROVE_INFINITE），
+        交易路徑上不再需要讀授權；已授權的組合略過"""
+        sent = 0
+        for dex_name in TRADE_DEXES:
+            for token in (CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]):
+                try:
+                    sent += self.ensure_approval(token, dex_name) is not None
+                except Exception as e:
+                    print(f"⚠️ {dex_name} 授權失敗: {str(e)}")
+        print(f"🔓 路由授權完成（新送出 {sent} 筆）")
+        return sent
+
+    def ensure_approval(self, token, dex_name):
+        """對 TRADE_DEXES 的 V2 路由授權單一代幣，授權交易上鏈後由收據更新快取；
+        回傳授權交易哈希，已有足夠額度時回傳 None。之後以下一個 nonce 送出的 swap 會排在授權之後執行"""
+        if dex_name not in TRADE_DEXES:
+            raise ValueError(f"{dex_name} 不是可下單的 V2 路由，不授權")
+        spender = self._get_router_address(dex_name)
+        if self.wallet.allowance(token, spender) >= Config.APPROVE_INFINITE // 2:
+            return None
+        key = f"approve_{token}_{spender}"
+        if key in self.pending_transactions:
+            return self.pending_transactions[key]
+        # 授權是交易執行路徑的一部分，讀取與送出優先於價格監控
+        with priority(EXECUTION):
+            tx = {
+                'from': self.wallet_address,
+                'to': token,
+                'data': encode_approve(spender, Config.APPROVE_INFINITE),
+                'value': 0,
+                'gas': self._estimate_gas(token, [token]),
+                'gasPrice': self.gas_strategy(),
+                'nonce': self._get_nonce(),
+                'chainId': 56
+            }
+            signed = w3.eth.account.sign_transaction(tx, self.private_key)
+            raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+            tx_hash = self.broadcaster.send_raw(raw)
+            self.pending_transactions[key] = tx_hash
+            self.receipts.track(tx_hash, callback=lambda r, t=token: self._on_approval_receipt(t, r))
+            print(f"🔓 {dex_name} 無限授權送出: {tx_hash.hex()}")
+            return tx_hash
+
     def _check_balances(self, amount_usdt):
-        usdt_balance = usdt_contract.functions.balanceOf(self.wallet_address).call()
+        usdt_balance = self.wallet.balance(CONTRACT_ADDRESSES["usdt"])
         if usdt_balance < amount_usdt * 10**self.usdt_decimals:
             print(f"❌ USDT餘額不足 需要: {amount_usdt} 當前的: {usdt_balance/10**self.usdt_decimals:.2f}")
             return False
         
-        bnb_balance = w3.eth.get_balance(self.wallet_address)
+        bnb_balance = self.wallet.bnb
         if bnb_balance < Web3.to_wei(Config.BALANCE_BUFFER_BNB, "ether"):
             print(f"❌ BNB餘額不足 需要至少 {Config.BALANCE_BUFFER_BNB} BNB")
             return False
         return True
 
-    def _estimate_gas(self, router, tx):
-        try:
-            return int(router.estimate_gas(tx) * Config.GAS_LIMIT_BUFFER)
-        except:
-            return 300000
+    def _estimate_gas(self, to, tokens):
+        """交易 gas 上限：從 Gas 模型讀（不打節點）；上鏈後以 _record_gas 回饋實際用量"""
+        return self.gas_model.limit(to, tokens)
+
+    def _record_gas(self, to, tokens, receipt):
+        self.gas_model.record_receipt(to, tokens, receipt)
+
+    def _on_approval_receipt(self, token, receipt):
+        self.wallet.apply_receipt(receipt)
+        self._record_gas(token, [token], receipt)
 
     def _get_nonce(self):
         with self.nonce_lock:
@@ -305,10 +459,10 @@ class CompleteArbitrageEngine:
 
     def _get_bnb_price(self):
         try:
-            amounts = pancake_router.functions.getAmountsOut(
+            amounts = FastRouter(self.rpc, CONTRACT_ADDRESSES["pancake_router"]).get_amounts_out(
                 10**18,
                 [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]
-            ).call()
+            )
             return amounts[-1] / 1e18
         except:
             return 300
@@ -318,23 +472,27 @@ class CompleteArbitrageEngine:
 # --------------------------
 def main():
     engine = CompleteArbitrageEngine()
+    # 啟動時一次送出無限授權（只限實際下單的 V2 路由），交易前不再檢查授權
+    engine.ensure_approvals()
+    # 區塊時鐘：每個新區塊檢查一次，收據追蹤與價格快取也跟著區塊走
+    clock = BlockClock(engine.rpc, ws_url=os.getenv("BSC_WS_URL"))
+    clock.subscribe(engine.price_monitor.on_block)
+    engine.receipts.attach(clock)
+    clock.start()
     print("🚀高頻價格監控模組啟動")
     
-    while True:
-        cycle_start = time.time()
-        
-        try:
-            if engine.check_and_execute_arbitrage():
-                print("🎉 完成套利循環")
-            else:
-                print("🔍 未發現有效機會")
-        except Exception as e:
-            print(f"⚠️ 系統異常: {str(e)}")
-        
-        # 精確間隔控制
-        elapsed = time.time() - cycle_start
-        sleep_time = max(Config.CHECK_INTERVAL - elapsed, 0)
-        time.sleep(sleep_time)
+    try:
+        for block in clock.ticks():
+            try:
+                if engine.check_and_execute_arbitrage():
+                    print("🎉 完成套利循環")
+                else:
+                    print("🔍 未發現有效機會")
+            except Exception as e:
+                print(f"⚠️ 系統異常: {str(e)}")
+    finally:
+        # 共享記憶體快照隨主程式結束釋放
+        engine.price_monitor.snapshots.close(unlink=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+# --------------------------
+# 精簡 ABI 編解碼（只支援實際用到的函式）
+# --------------------------
+# 取代 contract.functions.xxx(...).call() 的函式查找、參數正規化與
+# eth_abi 通用編解碼：選擇器與固定部分預先算好，回傳值以 memoryview
+# 逐字（32 bytes）讀取，不複製整段資料。
+SEL_GET_AMOUNTS_OUT = "0xd06ca61f"      # getAmountsOut(uint256,address[])
+SEL_GET_RESERVES = "0x0902f1ac"         # getReserves()
+SEL_GET_PAIR = "0xe6a43905"             # getPair(address,address)
+SEL_SWAP_EXACT_TOKENS = "0x38ed1739"    # swapExactTokensForTokens(uint256,uint256,address[],address,uint256)
+SEL_SWAP_EXACT_TOKENS_FEE = "0x5c11d795"  # swapExactTokensForTokensSupportingFeeOnTransferTokens(...)
+SEL_APPROVE = "0x095ea7b3"              # approve(address,uint256)
+SEL_BALANCE_OF = "0x70a08231"           # balanceOf(address)
+SEL_ALLOWANCE = "0xdd62ed3e"            # allowance(address,address)
+SEL_TRANSFER = "0xa9059cbb"             # transfer(address,uint256)
+
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+def _addr(a: str) -> str:
+    return a[2:].lower().rjust(64, "0") if a.startswith("0x") else a.lower().rjust(64, "0")
+
+
+def _uint(v: int) -> str:
+    return format(v, "064x")
+
+
+@lru_cache(maxsize=1024)
+def _path_tail(path: Tuple[str, ...]) -> str:
+    """address[] 動態參數：offset 之後的長度與元素（依路徑快取）"""
+    return _uint(len(path)) + "".join(_addr(a) for a in path)
+
+
+@lru_cache(maxsize=1024)
+def _amounts_out_suffix(path: Tuple[str, ...]) -> str:
+    # 固定部分：offset(0x40) + 陣列長度 + 地址
+    return _uint(0x40) + _path_tail(path)
+
+
+def encode_get_amounts_out(amount_in: int, path: Sequence[str]) -> str:
+    return SEL_GET_AMOUNTS_OUT + _uint(amount_in) + _amounts_out_suffix(tuple(path))
+
+
+def encode_get_pair(token_a: str, token_b: str) -> str:
+    return SEL_GET_PAIR + _addr(token_a) + _addr(token_b)
+
+
+def encode_swap_exact_tokens(amount_in: int, amount_out_min: int, path: Sequence[str], to: str,
+                             deadline: int, supporting_fee: bool = False) -> str:
+    sel = SEL_SWAP_EXACT_TOKENS_FEE if supporting_fee else SEL_SWAP_EXACT_TOKENS
+    # 頭部 5 個字：amountIn, amountOutMin, offset(0xa0), to, deadline
+    return (sel + _uint(amount_in) + _uint(amount_out_min) + _uint(0xa0) + _addr(to)
+            + _uint(deadline) + _path_tail(tuple(path)))
+
+
+def encode_approve(spender: str, amount: int) -> str:
+    return SEL_APPROVE + _addr(spender) + _uint(amount)
+
+
+def encode_transfer(to: str, amount: int) -> str:
+    return SEL_TRANSFER + _addr(to) + _uint(amount)
+
+
+def encode_balance_of(owner: str) -> str:
+    return SEL_BALANCE_OF + _addr(owner)
+
+
+def encode_allowance(owner: str, spender: str) -> str:
+    return SEL_ALLOWANCE + _addr(owner) + _addr(spender)
+
+
+# --------------------------
+# 收據 / 事件欄位正規化（bytes、HexBytes 或字串一律轉成小寫 0x 字串）
+# --------------------------
+def hex_str(v) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return "0x" + bytes(v).hex()
+    return str(v).lower()
+
+
+def topic_address(topic) -> str:
+    """indexed address 參數（32 bytes topic）取後 20 bytes"""
+    return "0x" + hex_str(topic)[-40:]
+
+
+def tx_hash_hex(tx_hash) -> str:
+    """交易雜湊統一成 0x 開頭的小寫字串（作為追蹤表的 key）"""
+    h = hex_str(tx_hash)
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _view(data) -> memoryview:
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    return memoryview(data)
+
+
+def _word(mv: memoryview, i: int) -> int:
+    return int.from_bytes(mv[i * 32:(i + 1) * 32], "big")
+
+
+# 其他合約的編解碼（V3 池、StableSwap 池）共用的公開名稱
+address_word = _addr      # address 參數 → 32 bytes 十六進位（無 0x）
+uint_word = _uint         # uint256 參數 → 32 bytes 十六進位（無 0x）
+abi_view = _view          # 回傳值 / 事件 data → memoryview
+read_word = _word         # 第 i 個 32 bytes 字組 → int
+
+
+def decode_uint(data) -> int:
+    return _word(_view(data), 0)
+
+
+def decode_uint_array(data) -> List[int]:
+    """解碼單一 uint256[] 回傳值（getAmountsOut）"""
+    mv = _view(data)
+    start = _word(mv, 0) // 32
+    n = _word(mv, start)
+    return [_word(mv, start + 1 + i) for i in range(n)]
+
+
+def decode_last_uint(data) -> int:
+    """只取 uint256[] 最後一個元素（報價只需要最終輸出）"""
+    mv = _view(data)
+    start = _word(mv, 0) // 32
+    return _word(mv, start + _word(mv, start))
+
+
+def decode_reserves(data) -> Tuple[int, int, int]:
+    mv = _view(data)
+    return _word(mv, 0), _word(mv, 1), _word(mv, 2)
+
+
+def decode_address(data) -> str:
+    mv = _view(data)
+    return "0x" + bytes(mv[12:32]).hex()
+
+
+# --------------------------
+# 走批次 RPC 的快速路由報價
+# --------------------------
+class FastRouter:
+    """以精簡編解碼直接 eth_call，可共用 BatchRPCClient 自動合併請求"""
+
+    def __init__(self, rpc, address: str):
+        self.rpc = rpc
+        self.address = address
+
+    def get_amounts_out(self, amount_in: int, path: Sequence[str], block="latest") -> List[int]:
+        data = self.rpc.eth_call({"to": self.address, "data": encode_get_amounts_out(amount_in, path)}, block)
+        return decode_uint_array(data)
+
+    def quote_many(self, requests: Sequence[Tuple[int, Sequence[str]]], block="latest") -> list:
+        """同一路由多筆報價一次批次送出；失敗項目回傳 None"""
+        block = hex(block) if isinstance(block, int) else block
+        calls = [("eth_call", [{"to": self.address, "data": encode_get_amounts_out(a, p)}, block])
+                 for a, p in requests]
+        out = []
+        for res in self.rpc.call_many(calls):
+            out.append(decode_uint_array(res) if isinstance(res, str) and len(res) > 2 else None)
+        return out
+
+
+# --------------------------
+# 效能比較：python abi_codec.py
+# --------------------------
+if __name__ == "__main__":
+    import timeit
+    from eth_abi import encode, decode
+    from web3 import Web3
+
+    path = ["0x55d398326f99059fF775485246999027B3197955",
+            "0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56",
+            "0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"]
+    ret = "0x" + encode(["uint256[]"], [[10**18, 10**18 + 7, 3 * 10**15]]).hex()
+    router = Web3().eth.contract(address=Web3.to_checksum_address("0x10ED43C718714eb63d5aA57B78B54704E256024E"), abi=[{
+        "inputs": [{"name": "amountIn", "type": "uint256"}, {"name": "path", "type": "address[]"}],
+        "name": "getAmountsOut", "outputs": [{"name": "amounts", "type": "uint256[]"}],
+        "stateMutability": "view", "type": "function"}])
+
+    assert encode_get_amounts_out(10**18, path) == SEL_GET_AMOUNTS_OUT + encode(["uint256", "address[]"], [10**18, path]).hex()
+    assert decode_uint_array(ret) == list(decode(["uint256[]"], bytes.fromhex(ret[2:]))[0])
+
+    n = 20000
+    cases = {
+        "web3 contract 編碼": lambda: router.functions.getAmountsOut(10**18, path)._encode_transaction_data(),
+        "eth_abi 編碼": lambda: SEL_GET_AMOUNTS_OUT + encode(["uint256", "address[]"], [10**18, path]).hex(),
+        "abi_codec 編碼": lambda: encode_get_amounts_out(10**18, path),
+        "eth_abi 解碼": lambda: decode(["uint256[]"], bytes.fromhex(ret[2:])),
+        "abi_codec 解碼": lambda: decode_uint_array(ret),
+    }
+    for name, fn in cases.items():
+        t = timeit.timeit(fn, number=n)
+        print(f"{name:<20} {t / n * 1e6:8.2f} µs/次")
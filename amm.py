@@ -0,0 +1,124 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from abi_codec import encode_get_pair, decode_address, decode_reserves, SEL_GET_RESERVES, ZERO_ADDRESS
+
+# --------------------------
+# 本地 V2 儲備模型（x*y=k）
+# --------------------------
+# 與 UniswapV2Library.getAmountOut 相同的整數運算，
+# 可在本地對任意交易規模估算輸出與價格衝擊，不必再打節點
+PANCAKE_V2_FEE_BPS = 25     # PancakeSwap V2：0.25%
+BISWAP_FEE_BPS = 10         # BiSwap 預設 0.1%（個別交易對可能不同）
+MDEX_FEE_BPS = 30           # MDEX：0.3%
+BABYSWAP_FEE_BPS = 30       # BabySwap：0.3%
+
+Hop = Tuple[int, int, int]  # (輸入儲備, 輸出儲備, 手續費 bps)
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int, fee_bps: int = PANCAKE_V2_FEE_BPS) -> int:
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    amount_in_with_fee = amount_in * (10000 - fee_bps)
+    return amount_in_with_fee * reserve_out // (reserve_in * 10000 + amount_in_with_fee)
+
+
+def get_amounts_out(amount_in: int, hops: Sequence[Hop]) -> List[int]:
+    amounts = [amount_in]
+    for reserve_in, reserve_out, fee_bps in hops:
+        amounts.append(get_amount_out(amounts[-1], reserve_in, reserve_out, fee_bps))
+    return amounts
+
+
+def spot_price(hops: Sequence[Hop]) -> float:
+    """無限小交易的邊際匯率（含手續費）"""
+    price = 1.0
+    for reserve_in, reserve_out, fee_bps in hops:
+        price *= reserve_out / reserve_in * (10000 - fee_bps) / 10000
+    return price
+
+
+def price_impact(amount_in: int, hops: Sequence[Hop]) -> float:
+    """交易本身造成的價格衝擊（0~1）：1 - 實際輸出 / 邊際匯率輸出"""
+    if amount_in <= 0:
+        return 0.0
+    ideal = amount_in * spot_price(hops)
+    if ideal <= 0:
+        return 1.0
+    return max(0.0, 1.0 - get_amounts_out(amount_in, hops)[-1] / ideal)
+
+
+def impact_from_quotes(amount_in: int, amount_out: int, probe_in: int, probe_out: int) -> float:
+    """沒有儲備資料時（聚合器、未知工廠），以小額探測報價推估價格衝擊"""
+    if amount_in <= 0 or probe_in <= 0 or probe_out <= 0:
+        return 0.0
+    return max(0.0, 1.0 - (amount_out / amount_in) / (probe_out / probe_in))
+
+
+def _sort(token_a: str, token_b: str) -> Tuple[str, str]:
+    a, b = token_a.lower(), token_b.lower()
+    return (a, b) if a < b else (b, a)
+
+
+# --------------------------
+# 交易對儲備快取（批次載入）
+# --------------------------
+class ReserveBook:
+    """單一工廠的交易對地址與儲備快取；地址只查一次，儲備每次 load 以一個批次刷新"""
+
+    def __init__(self, rpc, factory: str, fee_bps: int = PANCAKE_V2_FEE_BPS):
+        self.rpc = rpc
+        self.factory = factory
+        self.fee_bps = fee_bps
+        self._pairs: Dict[Tuple[str, str], str] = {}              # (token0, token1) -> 交易對地址
+        self._reserves: Dict[str, Tuple[int, int]] = {}           # 交易對地址 -> (reserve0, reserve1)
+
+    def pair_address(self, token_a: str, token_b: str) -> Optional[str]:
+        """已知的交易對地址；不存在的交易對回傳 None"""
+        pair = self._pairs.get(_sort(token_a, token_b))
+        return None if pair in (None, ZERO_ADDRESS) else pair
+
+    def load(self, token_pairs: Iterable[Tuple[str, str]], block="latest") -> "ReserveBook":
+        keys = list(dict.fromkeys(_sort(a, b) for a, b in token_pairs))
+        missing = [k for k in keys if k not in self._pairs]
+        if missing:
+            results = self.rpc.call_many([
+                ("eth_call", [{"to": self.factory, "data": encode_get_pair(*k)}, "latest"]) for k in missing])
+            for k, res in zip(missing, results):
+                if isinstance(res, str) and len(res) > 2:
+                    self._pairs[k] = decode_address(res)
+        pairs = [self._pairs[k] for k in keys if self._pairs.get(k) not in (None, ZERO_ADDRESS)]
+        if pairs:
+            block = hex(block) if isinstance(block, int) else block
+            results = self.rpc.call_many([
+                ("eth_call", [{"to": pair, "data": SEL_GET_RESERVES}, block]) for pair in pairs])
+            for pair, res in zip(pairs, results):
+                if isinstance(res, str) and len(res) > 2:
+                    r0, r1, _ = decode_reserves(res)
+                    self._reserves[pair] = (r0, r1)
+        return self
+
+    def update(self, pair: str, reserve0: int, reserve1: int):
+        """由 Sync 事件直接更新儲備"""
+        self._reserves[pair.lower()] = (reserve0, reserve1)
+
+    def reserves(self, token_a: str, token_b: str) -> Optional[Tuple[int, int]]:
+        """依呼叫順序回傳 (token_a 儲備, token_b 儲備)；未載入或不存在回傳 None"""
+        pair = self.pair_address(token_a, token_b)
+        if pair is None:
+            return None
+        r = self._reserves.get(pair)
+        if r is None:
+            return None
+        return r if token_a.lower() < token_b.lower() else (r[1], r[0])
+
+    def hops(self, path: Sequence[str], refresh: bool = True, block="latest") -> List[Hop]:
+        hop_pairs = list(zip(path, path[1:]))
+        if refresh:
+            self.load(hop_pairs, block)
+        out = []
+        for a, b in hop_pairs:
+            r = self.reserves(a, b)
+            if r is None:
+                raise ValueError(f"交易對不存在或儲備未載入: {a}/{b}")
+            out.append((r[0], r[1], self.fee_bps))
+        return out
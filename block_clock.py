@@ -0,0 +1,128 @@
+import json
+import time
+import threading
+from typing import Callable, Iterator, List, Optional
+
+# --------------------------
+# 區塊時鐘：新區塊到達即觸發一次
+# --------------------------
+# 取代各主迴圈的固定 time.sleep：監控、快取與執行器都以「每個新區塊一次」
+# 為節奏。有 websocket 節點時訂閱 newHeads，否則以 eth_blockNumber 密集輪詢；
+# 偵測到新區塊後先休息半個（實測的）出塊間隔，再回到密集輪詢，減少無效請求
+BLOCK_TIME = 3.0
+
+
+class BlockClock:
+    def __init__(self, rpc, ws_url: Optional[str] = None, poll_interval: float = 0.2,
+                 block_time: float = BLOCK_TIME):
+        self.rpc = rpc
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.block_time = block_time
+        self.block = 0
+        self.block_time_seen = 0.0
+        self.interval = block_time   # 實測出塊間隔（指數平均）
+        self.ticks_emitted = 0
+        self.polls = 0
+        self.source = "poll"
+        self._subscribers: List[Callable[[int], None]] = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "BlockClock":
+        self._thread = threading.Thread(target=self._run, name="block-clock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def subscribe(self, callback: Callable[[int], None]):
+        """新區塊回呼（在時鐘執行緒內依序呼叫，需快速返回）"""
+        self._subscribers.append(callback)
+
+    def wait_next(self, after: Optional[int] = None, timeout: Optional[float] = None) -> Optional[int]:
+        """阻塞到出現高於 after 的區塊；逾時或停止時回傳 None"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            after = self.block if after is None else after
+            while self.block <= after and not self._stop.is_set():
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return None if self._stop.is_set() else self.block
+
+    def ticks(self, every: int = 1) -> Iterator[int]:
+        """每 every 個區塊產出一次最新區塊高度；處理太慢時跳過中間區塊，只做最新的"""
+        last = None
+        while not self._stop.is_set():
+            if last is None:
+                # 第一次：時鐘已有區塊就立即產出
+                block = self.block or self.wait_next(0)
+            else:
+                block = self.wait_next(last + every - 1)
+            if block is None:
+                return
+            last = block
+            yield block
+
+    def _publish(self, block: int):
+        with self._cond:
+            if block <= self.block:
+                return
+            now = time.time()
+            if self.block:
+                est = (now - self.block_time_seen) / (block - self.block)
+                self.interval = 0.8 * self.interval + 0.2 * est
+            self.block = block
+            self.block_time_seen = now
+        for cb in self._subscribers:
+            try:
+                cb(block)
+            except Exception as e:
+                print(f"[BlockClock] 回呼異常: {str(e)}")
+        self.ticks_emitted += 1
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        if self.ws_url:
+            try:
+                self._run_ws()
+            except ImportError:
+                print("[BlockClock] 未安裝 websockets，改用輪詢")
+            except Exception as e:
+                print(f"[BlockClock] 訂閱中斷，改用輪詢: {str(e)}")
+        self.source = "poll"
+        self._run_poll()
+
+    def _run_ws(self):
+        from websockets.sync.client import connect
+        with connect(self.ws_url, open_timeout=10) as ws:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            self.source = "ws"
+            while not self._stop.is_set():
+                msg = json.loads(ws.recv(timeout=self.block_time * 5))
+                head = (msg.get("params") or {}).get("result")
+                if head and head.get("number"):
+                    self._publish(int(head["number"], 16))
+
+    def _run_poll(self):
+        while not self._stop.is_set():
+            try:
+                self.polls += 1
+                block = self.rpc.block_number()
+            except Exception as e:
+                print(f"[BlockClock] 區塊查詢失敗: {str(e)}")
+                self._stop.wait(self.poll_interval * 5)
+                continue
+            if block > self.block:
+                self._publish(block)
+                # 下一個區塊不會太快出現，先休息半個出塊間隔
+                self._stop.wait(max(self.interval * 0.5 - self.poll_interval, 0))
+            else:
+                self._stop.wait(self.poll_interval)
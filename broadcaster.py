@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+import concurrent.futures
+from typing import Dict, Iterable, List, Optional, Union
+
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from rate_limiter import priority, EXECUTION
+from rpc_client import RPCError, rpc_batch
+from transport import get_session
+
+# --------------------------
+# 交易多節點廣播
+# --------------------------
+# send_raw_transaction 只送到目前的單一節點，交易得先經它傳播到出塊節點，
+# 這段延遲直接加在上鏈時間上。同一筆已簽名交易同時送往所有節點（含額外的提交端點），
+# 第一個確認即返回（交易哈希在本地由 raw 計算，各節點回的一定相同）；
+# 「already known」代表別的節點已經把交易傳過來，視同成功。
+# 其餘請求在背景跑完，各端點的確認延遲以指數平均記錄，供節點排名
+ENV_SUBMIT_URLS = "BSC_SUBMIT_URLS"      # 額外提交端點（逗號分隔），例如私有交易中繼
+ALREADY_KNOWN = ("already known", "known transaction", "already imported", "already exists")
+DEFAULT_TIMEOUT = 5.0
+ALPHA = 0.2
+
+
+def submit_urls() -> List[str]:
+    """環境變數設定的額外提交端點"""
+    return [u.strip() for u in os.getenv(ENV_SUBMIT_URLS, "").split(",") if u.strip()]
+
+
+def _is_known(error: RPCError) -> bool:
+    message = (error.message or "").lower()
+    return any(s in message for s in ALREADY_KNOWN)
+
+
+class _Endpoint:
+    __slots__ = ("url", "acks", "known", "errors", "wins", "latency", "last_error")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.acks = 0
+        self.known = 0
+        self.errors = 0
+        self.wins = 0
+        self.latency = None
+        self.last_error = None
+
+    def observe(self, elapsed: float):
+        self.latency = elapsed if self.latency is None else self.latency + ALPHA * (elapsed - self.latency)
+
+
+class Broadcaster:
+    def __init__(self, urls: Iterable[str], extra: Optional[Iterable[str]] = None, timeout: float = DEFAULT_TIMEOUT,
+                 session=None):
+        self.urls = list(dict.fromkeys(list(urls) + list(extra or [])))
+        self.timeout = timeout
+        self.session = session or get_session()
+        self.sent = 0
+        self._endpoints: Dict[str, _Endpoint] = {u: _Endpoint(u) for u in self.urls}
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(self.urls) * 4, 4),
+                                                           thread_name_prefix="broadcast")
+        self._lock = threading.Lock()
+
+    def _submit(self, url: str, raw: str):
+        """單一端點送出；回傳 (是否確認, 錯誤)"""
+        ep = self._endpoints[url]
+        start = time.perf_counter()
+        try:
+            # 背景執行緒不會繼承呼叫端的優先等級，送單一律以交易執行等級排隊
+            with priority(EXECUTION):
+                result = rpc_batch(self.session, url, [("eth_sendRawTransaction", [raw])], self.timeout)[0]
+        except Exception as e:
+            with self._lock:
+                ep.errors += 1
+                ep.last_error = str(e)
+            return False, e
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if not isinstance(result, RPCError):
+                ep.acks += 1
+                ep.observe(elapsed)
+                return True, None
+            if _is_known(result):
+                ep.known += 1
+                ep.observe(elapsed)
+                return True, None
+            ep.errors += 1
+            ep.last_error = result.message
+        return False, result
+
+    def send_raw(self, raw: Union[bytes, str]) -> HexBytes:
+        """同時送往所有端點，第一個確認即回傳交易哈希；全部失敗時拋出節點錯誤（例如 nonce too low）"""
+        raw_hex = raw if isinstance(raw, str) else "0x" + bytes(raw).hex()
+        if not raw_hex.startswith("0x"):
+            raw_hex = "0x" + raw_hex
+        tx_hash = HexBytes(keccak(hexstr=raw_hex))
+        futures = {self._pool.submit(self._submit, url, raw_hex): url for url in self.urls}
+        errors = []
+        try:
+            for fut in concurrent.futures.as_completed(futures, timeout=self.timeout * 2):
+                ok, error = fut.result()
+                if ok:
+                    with self._lock:
+                        self._endpoints[futures[fut]].wins += 1
+                        self.sent += 1
+                    return tx_hash
+                errors.append(error)
+        except concurrent.futures.TimeoutError:
+            raise ConnectionError(f"交易廣播逾時：{len(self.urls)} 個端點都沒有確認")
+        # 節點明確拒絕（nonce、餘額、Gas）比網路錯誤更有意義
+        raise next((e for e in errors if isinstance(e, RPCError)), errors[0] if errors else
+                   ConnectionError("沒有可用的廣播端點"))
+
+    def ranking(self) -> List[tuple]:
+        """(端點, 平均確認延遲 ms, 搶先次數)，依延遲排序；從未確認的排最後"""
+        with self._lock:
+            eps = list(self._endpoints.values())
+        eps.sort(key=lambda e: (e.latency is None, e.latency or 0))
+        return [(e.url, None if e.latency is None else round(e.latency * 1000, 1), e.wins) for e in eps]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "endpoints": {e.url: {"acks": e.acks, "known": e.known, "errors": e.errors, "wins": e.wins,
+                                      "latency_ms": None if e.latency is None else round(e.latency * 1000, 1),
+                                      "last_error": e.last_error}
+                              for e in self._endpoints.values()},
+            }
@@ -0,0 +1,131 @@
+import time
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from quote_curve import QuoteCurve, curves_from_router
+
+# --------------------------
+# 報價斷路器（依 (路由, 路徑) 分別計算）
+# --------------------------
+# 同一條 (路由, 路徑) 連續 threshold 次報價全失敗就「開啟」，之後不再送出報價；
+# 冷卻時間到了放行一次探測（半開），探測成功恢復，失敗則冷卻時間加倍（上限 max_delay）。
+# 例如把聚合器地址當成 V2 路由，getAmountsOut 每輪都 revert，開啟後只剩偶爾一次探測
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Breaker:
+    __slots__ = ("state", "failures", "opened_at", "delay", "trips", "last_error")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.delay = 0.0
+        self.trips = 0
+        self.last_error = None
+
+
+def _fmt(key) -> str:
+    if isinstance(key, tuple) and len(key) == 2:
+        router, path = key
+        router = f"{router[:10]}…" if isinstance(router, str) and router.startswith("0x") else router
+        if isinstance(path, (tuple, list)):
+            path = "→".join(p[:6] for p in path)
+        return f"{router}[{path}]"
+    return str(key)
+
+
+class BreakerRegistry:
+    def __init__(self, threshold: int = 3, base_delay: float = 5.0, max_delay: float = 300.0):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.skipped = 0
+        self._breakers: Dict[Hashable, _Breaker] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: Hashable) -> bool:
+        """是否可以送出這筆報價；冷卻結束時放行一次探測"""
+        with self._lock:
+            b = self._breakers.get(key)
+            if b is None or b.state == CLOSED:
+                return True
+            now = time.time()
+            if now - b.opened_at >= b.delay:
+                # 冷卻結束（或上一次探測沒有回報）：再放行一次探測
+                b.state = HALF_OPEN
+                b.opened_at = now
+                return True
+            self.skipped += 1
+            return False
+
+    def success(self, key: Hashable):
+        with self._lock:
+            b = self._breakers.get(key)
+            if b is None or b.state == CLOSED and b.failures == 0:
+                return
+            if b.state != CLOSED:
+                print(f"🔌 斷路器恢復: {_fmt(key)}")
+            b.state, b.failures, b.delay = CLOSED, 0, 0.0
+
+    def failure(self, key: Hashable, error: Optional[str] = None):
+        with self._lock:
+            b = self._breakers.setdefault(key, _Breaker())
+            b.failures += 1
+            b.last_error = error
+            if b.state == HALF_OPEN:
+                b.delay = min(b.delay * 2, self.max_delay)
+            elif b.state == CLOSED and b.failures >= self.threshold:
+                b.delay = self.base_delay
+                b.trips += 1
+            else:
+                return
+            b.state, b.opened_at = OPEN, time.time()
+            print(f"🔌 斷路器開啟: {_fmt(key)}（連續 {b.failures} 次失敗，{b.delay:.0f} 秒後探測）")
+
+    def state(self, key: Hashable) -> str:
+        b = self._breakers.get(key)
+        return b.state if b else CLOSED
+
+    def open_keys(self) -> List[Hashable]:
+        with self._lock:
+            return [k for k, b in self._breakers.items() if b.state != CLOSED]
+
+    def report(self) -> List[str]:
+        """非正常狀態的斷路器，供畫面顯示"""
+        with self._lock:
+            now = time.time()
+            return [f"{_fmt(k)} {b.state} 失敗{b.failures}次 剩{max(b.delay - (now - b.opened_at), 0):.0f}s"
+                    for k, b in self._breakers.items() if b.state != CLOSED]
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = [b.state for b in self._breakers.values()]
+            return {
+                "tracked": len(states),
+                "open": states.count(OPEN),
+                "half_open": states.count(HALF_OPEN),
+                "trips": sum(b.trips for b in self._breakers.values()),
+                "skipped": self.skipped,
+            }
+
+
+def quote_curves(breakers: BreakerRegistry, router, plans: Sequence[Tuple[Sequence[str], Sequence[int]]],
+                 block="latest") -> List[Optional[QuoteCurve]]:
+    """curves_from_router 加上斷路器：開啟中的 (路由, 路徑) 不送出（對應位置為 None），
+    整條階梯都報價失敗記一次失敗；整批請求本身失敗（網路）時照常拋出，不計入斷路器"""
+    keys = [(router.address, tuple(path)) for path, _ in plans]
+    allowed = [i for i, key in enumerate(keys) if breakers.allow(key)]
+    out: List[Optional[QuoteCurve]] = [None] * len(plans)
+    if not allowed:
+        return out
+    curves = curves_from_router(router, [plans[i] for i in allowed], block)
+    for i, curve in zip(allowed, curves):
+        if curve:
+            breakers.success(keys[i])
+        else:
+            breakers.failure(keys[i], "報價全部失敗")
+        out[i] = curve
+    return out
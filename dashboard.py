@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import threading
+from collections import deque
+from typing import Callable, List
+
+# --------------------------
+# 非阻塞終端儀表板（差異重繪）
+# --------------------------
+# 監控端只把快照丟進佇列（只保留最新一份），繪製在背景執行緒進行；
+# 每幀只重寫內容有變動的列，以 ANSI 游標定位取代 os.system('clear')
+# - 列數超過終端高度時分頁輪播（表頭每頁保留），最後一列顯示頁碼與隱藏列數
+# - 執行期間的 print 經由儀表板寫在表格下方的日誌區，不再與差異重繪交錯
+CSI = "\x1b["
+LOG_ROWS = 5           # 日誌區保留的最近行數
+PAGE_INTERVAL = 3.0    # 分頁輪播間隔（秒）
+
+
+def _enable_ansi():
+    """Windows 10+ 主控台需先啟用 VT 模式才能解析 ANSI 控制碼"""
+    if os.name == "nt":
+        os.system("")
+
+
+class _LogStream:
+    """取代 sys.stdout：完整的一行才交給儀表板日誌區"""
+
+    def __init__(self, dashboard: "Dashboard", original):
+        self._dashboard = dashboard
+        self._original = original
+        self._buf = ""
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self._buf += text
+            *done, self._buf = self._buf.split("\n")
+        for line in done:
+            if line.strip():
+                self._dashboard.log(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+class Dashboard:
+    def __init__(self, render: Callable[[object], List[str]], fps: float = 4,
+                 full_refresh: float = 5.0, stream=None, header_rows: int = 0,
+                 log_rows: int = LOG_ROWS, page_interval: float = PAGE_INTERVAL):
+        self.render = render
+        self.frame_interval = 1.0 / fps
+        self.full_refresh = full_refresh
+        self.stream = stream or sys.stdout
+        self.header_rows = header_rows          # 分頁時每頁都保留的表頭列數
+        self.page_interval = page_interval
+        self.frames = 0
+        self.rows_written = 0
+        self._inbox = queue.Queue(maxsize=1)
+        self._prev: List[str] = []
+        self._lines: List[str] = []             # 最近一次 render 的結果（換頁 / 新日誌時重繪）
+        self._logs = deque(maxlen=log_rows)
+        self._logs_dirty = False
+        self._log_lock = threading.Lock()
+        self._stdout = None
+        self._last_full = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, capture_stdout: bool = True) -> "Dashboard":
+        """capture_stdout：執行期間的 print 改寫進日誌區（close 時還原）"""
+        _enable_ansi()
+        if capture_stdout and self._stdout is None:
+            self._stdout = sys.stdout
+            sys.stdout = _LogStream(self, self._stdout)
+        self._thread = threading.Thread(target=self._run, name="dashboard", daemon=True)
+        self._thread.start()
+        return self
+
+    def log(self, text: str):
+        """日誌行顯示在表格下方（只保留最近 log_rows 行），下一幀重繪"""
+        with self._log_lock:
+            self._logs.extend(str(text).splitlines() or [""])
+            self._logs_dirty = True
+
+    def publish(self, snapshot):
+        """非阻塞送出快照；來不及繪製的舊快照直接丟棄"""
+        while True:
+            try:
+                self._inbox.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self._inbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(1)
+        if self._stdout is not None:
+            sys.stdout = self._stdout
+            self._stdout = None
+        self.stream.write(f"{CSI}?25h{CSI}{len(self._prev) + 1};1H\n")
+        self.stream.flush()
+
+    def _run(self):
+        next_frame = 0.0
+        while not self._stop.is_set():
+            try:
+                snapshot = self._inbox.get(timeout=0.2)
+            except queue.Empty:
+                # 沒有新快照：有新日誌或需要換頁時以上一份內容重繪
+                if self._logs_dirty or (self._lines and self._paged()):
+                    self._draw(self._lines)
+                continue
+            # 幀率上限：等待期間到達的新快照會覆蓋這一份
+            wait = next_frame - time.time()
+            if wait > 0:
+                time.sleep(wait)
+                try:
+                    snapshot = self._inbox.get_nowait()
+                except queue.Empty:
+                    pass
+            try:
+                self._lines = self.render(snapshot)
+                self._draw(self._lines)
+            except Exception as e:
+                self.log(f"[Dashboard] 繪製異常: {str(e)}")
+            next_frame = time.time() + self.frame_interval
+
+    def _paged(self) -> bool:
+        return len(self._lines) > max(self._height() - 1 - len(self._logs), 1)
+
+    @staticmethod
+    def _height() -> int:
+        return shutil.get_terminal_size((120, 40)).lines
+
+    def frame(self, lines: List[str], height: int, now: float) -> List[str]:
+        """組出一幀：表格（超過可用高度時分頁，最後一列為頁碼 / 隱藏列數）+ 日誌區"""
+        with self._log_lock:
+            logs = list(self._logs)
+            self._logs_dirty = False
+        available = max(height - 1 - len(logs), 1)
+        if len(lines) > available:
+            header = lines[:min(self.header_rows, available - 1)]
+            body = lines[len(header):]
+            per_page = max(available - len(header) - 1, 1)
+            pages = (len(body) + per_page - 1) // per_page
+            page = int(now / self.page_interval) % pages
+            shown = body[page * per_page:(page + 1) * per_page]
+            status = f"… 第 {page + 1}/{pages} 頁（另有 {len(body) - len(shown)} 列未顯示，每 {self.page_interval:g} 秒換頁）"
+            lines = (header + shown + [status])[:available]
+        if logs:
+            lines = lines + ["─" * 40] + logs if len(lines) + len(logs) < height - 1 else lines + logs
+        return lines[:max(height - 1, 1)]
+
+    def _draw(self, lines: List[str]):
+        now = time.time()
+        lines = self.frame(lines, self._height(), now)
+        out = []
+        if now - self._last_full >= self.full_refresh:
+            # 定期整頁重繪，修復其他輸出造成的畫面殘留
+            out.append(f"{CSI}?25l{CSI}2J")
+            self._prev = []
+            self._last_full = now
+        prev = self._prev
+        for row, line in enumerate(lines):
+            if row >= len(prev) or prev[row] != line:
+                out.append(f"{CSI}{row + 1};1H{line}{CSI}K")
+                self.rows_written += 1
+        for row in range(len(lines), len(prev)):
+            out.append(f"{CSI}{row + 1};1H{CSI}K")
+        out.append(f"{CSI}{len(lines) + 1};1H")
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self._prev = lines
+        self.frames += 1
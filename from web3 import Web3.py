@@ -1,30 +1,45 @@
-import json
 import time
-import threading
-from itertools import permutations
 from decimal import Decimal
 from web3 import Web3
-import requests
+from pipeline import Pipeline, DROP_OLDEST
+from receipts import ReceiptTracker
+from notifier import Notifier, TelegramSender
+from transport import make_provider, set_pool_size, set_rate_limiter
+from rate_limiter import RateLimiter, priority, EXECUTION
+from rpc_client import BatchRPCClient
+from abi_codec import FastRouter, encode_swap_exact_tokens, hex_str, topic_address
+from amm import ReserveBook, get_amounts_out, spot_price, price_impact
+from stableswap import StablePool, ELLIPSIS_3POOL
+from slippage import SlippageModel
+from inflight import InFlightRegistry
+from wallet_pool import WalletPool
+from block_clock import BlockClock
+from wallet_state import TRANSFER_TOPIC
+from gas_model import GasModel
+from broadcaster import Broadcaster, submit_urls
 
 # ========== 1. 基本設定 ==========
 BSC_RPC = "https://bsc-dataseed.binance.org/"
-web3 = Web3(Web3.HTTPProvider(BSC_RPC))
+# 節點令牌桶限流：偵測執行緒一起報價時排隊送出，交易執行的讀取優先
+set_rate_limiter(RateLimiter.for_urls([BSC_RPC]))
+web3 = Web3(make_provider(BSC_RPC))
 if not web3.is_connected():
     raise Exception("❌ 無法連接到 BSC")
 
 # 你的錢包資訊（請填入自己的私鑰）
 PRIVATE_KEY = "YOUR_PRIVATE_KEY"
 ACCOUNT = web3.eth.account.from_key(PRIVATE_KEY).address
+# 其他已注資的執行帳戶私鑰（多錢包並行執行，各自獨立的 nonce 與餘額）
+EXTRA_PRIVATE_KEYS = []
+PRIVATE_KEYS = [PRIVATE_KEY] + EXTRA_PRIVATE_KEYS
 
 # Telegram Bot 設定（填入你自己的 bot token 與 chat id）
 TELEGRAM_TOKEN = "YOUR_TELEGRAM_BOT_TOKEN"
 TELEGRAM_CHAT_ID = "YOUR_CHAT_ID"
-def tg_send(text):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    try:
-        requests.post(url, json={"chat_id": TELEGRAM_CHAT_ID, "text": text})
-    except Exception as e:
-        print(f"[Telegram] 發送錯誤: {e}")
+# 通知由背景執行緒批次送出，偵測/交易執行緒只負責入列
+NOTIFIER = Notifier(TelegramSender(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
+def tg_send(text, key=None):
+    NOTIFIER.send(text, key)
 
 # ========== 2. 合約與 ABI ==========
 # PancakeSwap Router 主網地址與內嵌 ABI（僅包含 getAmountsOut 與 swapExactTokensForTokens）
@@ -60,6 +75,22 @@ ROUTER_ABI = [
 ]
 router = web3.eth.contract(address=ROUTER_ADDR, abi=ROUTER_ABI)
 
+# 所有執行緒的在途交易共用一個收據追蹤器（每個新區塊一次批次查詢）
+RECEIPTS = ReceiptTracker(BSC_RPC)
+# 各偵測執行緒的零散讀取（Gas、nonce）自動合併成批次請求
+RPC = BatchRPCClient(BSC_RPC)
+# 報價走精簡編解碼 + 批次 RPC，不經 web3 合約函式
+FAST_ROUTER = FastRouter(RPC, ROUTER_ADDR)
+PANCAKE_FACTORY = "0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73"
+# 本地儲備模型：交易對地址只查一次，每次偵測以一個批次刷新整條路徑的儲備
+BOOK = ReserveBook(RPC, PANCAKE_FACTORY)
+# 每筆機會依池深度、交易規模與路徑近期波動計算 amountOutMin
+SLIPPAGE = SlippageModel()
+# 穩定幣腿（BUSD/USDC -> USDT）改與 StableSwap 池比價，每個區塊一個批次刷新
+STABLE = StablePool(RPC, ELLIPSIS_3POOL)
+# 各 (合約, 跳數, 代幣集合) 的 Gas 用量：偵測算成本、送單填上限都從記憶體讀，不再 estimate_gas
+GAS = GasModel()
+
 # ========== 3. 代幣設定 ==========
 # 代幣地址（均轉為 checksum 格式）
 TOKENS = {
@@ -97,42 +128,11 @@ def from_token_amount(value: int, symbol: str) -> Decimal:
 def check_liquidity(token0: str, token1: str) -> bool:
     """檢查交易對的流動性是否足夠"""
     try:
-        # 獲取交易對地址
-        factory = web3.eth.contract(
-            address=Web3.to_checksum_address("0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73"),
-            abi=[{
-                "inputs": [
-                    {"internalType": "address", "name": "tokenA", "type": "address"},
-                    {"internalType": "address", "name": "tokenB", "type": "address"}
-                ],
-                "name": "getPair",
-                "outputs": [{"internalType": "address", "name": "pair", "type": "address"}],
-                "stateMutability": "view",
-                "type": "function"
-            }]
-        )
-        
-        pair_address = factory.functions.getPair(TOKENS[token0], TOKENS[token1]).call()
-        if pair_address == "0x0000000000000000000000000000000000000000":
+        # 儲備由偵測階段批次載入，這裡只讀快取
+        reserves = BOOK.reserves(TOKENS[token0], TOKENS[token1])
+        if reserves is None:
             return False
-            
-        # 獲取流動性
-        pair = web3.eth.contract(
-            address=pair_address,
-            abi=[{
-                "inputs": [],
-                "name": "getReserves",
-                "outputs": [
-                    {"internalType": "uint112", "name": "_reserve0", "type": "uint112"},
-                    {"internalType": "uint112", "name": "_reserve1", "type": "uint112"},
-                    {"internalType": "uint32", "name": "_blockTimestampLast", "type": "uint32"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            }]
-        )
-        
-        reserve0, reserve1, _ = pair.functions.getReserves().call()
+        reserve0, reserve1 = reserves
         
         # 檢查流動性是否足夠（至少10,000 USDT等值）
         min_liquidity = 10000 * 10**18  # 10,000 USDT等值
@@ -144,71 +144,75 @@ def check_liquidity(token0: str, token1: str) -> bool:
 
 def get_price(amount_in: int, path: list) -> int:
     # 回傳以 path 最後代幣單位表示的數值
-    return router.functions.getAmountsOut(amount_in, path).call()[-1]
+    return FAST_ROUTER.get_amounts_out(amount_in, path)[-1]
 
 def get_gas_price():
     """獲取當前Gas價格，並增加10%作為緩衝"""
-    gas_price = web3.eth.gas_price
+    gas_price = RPC.gas_price()
     return int(gas_price * 1.1)
 
-def estimate_gas_cost(tx):
-    """估算交易所需的Gas費用"""
-    try:
-        gas_estimate = web3.eth.estimate_gas(tx)
-        return gas_estimate
-    except Exception as e:
-        print(f"Gas估算錯誤: {e}")
-        return 300000  # 返回預設值
+def estimate_gas_cost(to: str, tokens: list) -> int:
+    """Gas 上限：依過去收據學到的用量加安全邊際（不打節點）"""
+    return GAS.limit(to, tokens)
 
-def build_tx(function_call):
+def build_tx(wallet, gas_limit: int):
     """構建交易參數"""
     gas_price = get_gas_price()
-    nonce = web3.eth.get_transaction_count(ACCOUNT)
+    # 每個帳戶在本地配發自己的 nonce：並行執行緒不會拿到同一個 nonce
+    nonce = wallet.nonces.next()
     
     # 構建基本交易參數
     tx = {
-        'from': ACCOUNT,
-        'gas': 300000,
+        'from': wallet.address,
+        'gas': gas_limit,
         'gasPrice': gas_price,
         'nonce': nonce,
         'chainId': 56  # BSC主網的chainId
     }
-    
-    # 估算實際Gas用量
-    try:
-        gas_estimate = estimate_gas_cost(tx)
-        tx['gas'] = int(gas_estimate * 1.2)  # 增加20%作為緩衝
-    except Exception as e:
-        print(f"Gas估算失敗，使用預設值: {e}")
-    
     return tx
 
-def execute_swap(path: list, amount_in: int, amount_out_min: int):
+def execute_swap(path: list, amount_in: int, amount_out_min: int, wallet):
     """執行代幣交換"""
+    # 設置交易截止時間（30秒）
+    deadline = int(time.time()) + 30
+    return send_and_wait(ROUTER_ADDR, encode_swap_exact_tokens(amount_in, amount_out_min, path, wallet.address, deadline), wallet, path)
+
+def execute_stable_swap(token_in: str, token_out: str, amount_in: int, amount_out_min: int, wallet):
+    """經 StableSwap 池互換穩定幣"""
+    return send_and_wait(STABLE.address, STABLE.exchange_data(token_in, token_out, amount_in, amount_out_min), wallet,
+                         [token_in, token_out])
+
+def received_amount(receipt, token: str, owner: str) -> int:
+    """收據中轉入 owner 的 token 數量"""
+    total = 0
+    for log in receipt.get("logs", []):
+        topics = log.get("topics") or []
+        if (len(topics) >= 3 and hex_str(log.get("address")) == token.lower()
+                and hex_str(topics[0]) == TRANSFER_TOPIC and topic_address(topics[2]) == owner.lower()):
+            data = hex_str(log.get("data") or "0x")
+            total += int(data, 16) if data != "0x" else 0
+    return total
+
+def send_and_wait(to: str, data: str, wallet, tokens: list):
+    """以執行帳戶送出合約呼叫並等待確認；tokens 為經過的代幣，用於 Gas 模型"""
     try:
-        # 設置交易截止時間（30秒）
-        deadline = int(time.time()) + 30
-        
         # 構建交易
-        tx = router.functions.swapExactTokensForTokens(
-            amount_in, 
-            amount_out_min, 
-            path, 
-            ACCOUNT, 
-            deadline
-        ).build_transaction(build_tx(router))
-        
-        # 簽名交易
-        signed = web3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+        tx = {
+            'to': to,
+            'data': data,
+            'value': 0,
+            **build_tx(wallet, estimate_gas_cost(to, tokens))
+        }
         
-        # 發送交易
-        tx_hash = web3.eth.send_raw_transaction(signed.rawTransaction)
+        # 以執行帳戶簽名並發送（未送出就失敗時該帳戶重新同步 nonce）
+        tx_hash = POOL.send(wallet, tx)
         
         # 等待交易確認
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=30)
+        receipt = RECEIPTS.wait(tx_hash, timeout=30)
         
         # 檢查交易狀態
         if receipt['status'] == 1:
+            GAS.record_receipt(to, tokens, receipt)
             return receipt
         else:
             raise Exception("交易失敗")
@@ -234,65 +238,225 @@ PRIORITY_PAIRS = [
     ("USDT", "DOT", "BUSD"),
     ("USDT", "LINK", "BUSD")
 ]
+EXECUTE_WORKERS = len(PRIVATE_KEYS)    # 每個帳戶同時只處理一筆交易
+REBALANCE_EVERY = 20                   # 每隔幾個區塊檢查一次帳戶間資金分配
+# 連線池大小對齊偵測與執行執行緒數（另加收據追蹤）
+set_pool_size(len(PRIORITY_PAIRS) + EXECUTE_WORKERS + 1)
+
+# 穩定幣腿可能走 StableSwap 池：路徑最後一跳的穩定幣要對池子授權，
+# 池子互換失敗時改走路由的 V2 交易對換回，也要對路由授權
+try:
+    STABLE.load()
+except Exception as e:
+    print(f"⚠️ StableSwap 池載入失敗，穩定幣腿只走路由: {e}")
+STABLE_LEG_TOKENS = sorted({TOKENS[p[-1]] for p in PRIORITY_PAIRS if STABLE.has(TOKENS[p[-1]], TOKENS[BASE])})
 
-def worker(path_symbols: tuple):
-    """工作線程函數"""
+# 並行執行的共用狀態：多錢包池（各帳戶 nonce / 餘額 / 授權）、在途交易登記
+# 已簽名交易同時送往節點與 BSC_SUBMIT_URLS 額外端點，第一個確認即返回
+BROADCASTER = Broadcaster([BSC_RPC], extra=submit_urls())
+POOL = WalletPool(RPC, BSC_RPC, PRIVATE_KEYS, [TOKENS[BASE]] + STABLE_LEG_TOKENS, [ROUTER_ADDR, STABLE.address],
+                  receipts=RECEIPTS, broadcaster=BROADCASTER)
+INFLIGHT = InFlightRegistry(POOL.total_balance)
+
+def detect(path_symbols: tuple):
+    """偵測階段：計算單一三角路徑的淨利"""
     path = [TOKENS[s] for s in (*path_symbols, path_symbols[0])]
+    # 一個批次刷新整條路徑三個交易對的儲備
+    detected_at = time.time()
+    BOOK.load(zip(path, path[1:]))
+    # 檢查流動性
+    for i in range(len(path_symbols)):
+        if not check_liquidity(path_symbols[i], path_symbols[(i+1)%3]):
+            print(f"⚠️ 路徑 {'->'.join(path_symbols)} 中 {path_symbols[i]}-{path_symbols[(i+1)%3]} 流動性不足")
+            return
+
+    # 獲取當前價格
+    amt_in = to_token_amount(amount_in_token, BASE)
+    out = get_price(amt_in, path)
+    profit = out - amt_in
+    hops = BOOK.hops(path, refresh=False)
+    SLIPPAGE.tracker.observe(path_symbols, spot_price(hops))
+    pools = [BOOK.pair_address(a, b) for a, b in zip(path, path[1:])]
+    impact = price_impact(amt_in, hops)
+    # 最後一跳是穩定幣互換時，V2 交易對與 StableSwap 池取輸出較多者（本地計算，不打節點；
+    # 池狀態由來源階段每個區塊刷新一次）
+    v2_out = out
+    stable_mid = 0
+    if STABLE.has(path[-2], path[-1]):
+        mid = get_amounts_out(amt_in, hops[:-1])[-1]
+        stable_out = STABLE.amount_out(path[-2], path[-1], mid)
+        if stable_out > out:
+            out, stable_mid = stable_out, mid
+            profit = out - amt_in
+            pools = pools[:-1] + [STABLE.address]
+            impact = price_impact(amt_in, hops[:-1])
+    profit_token = from_token_amount(profit, BASE)
+
+    # 計算Gas成本：依實際要送出的交易（穩定幣路徑是路由兩跳 + 池互換兩筆）查 Gas 模型
+    gas_price = get_gas_price()
+    if stable_mid:
+        gas_units = GAS.estimate(ROUTER_ADDR, path[:-1]) + GAS.estimate(STABLE.address, path[-2:])
+    else:
+        gas_units = GAS.estimate(ROUTER_ADDR, path)
+    gas_cost = Decimal(gas_price * gas_units) / Decimal(10**18)  # 轉換為BNB
+    gas_cost_usdt = gas_cost * Decimal(get_price(web3.to_wei(1, 'ether'), [TOKENS['WBNB'], TOKENS['USDT']])) / Decimal(10**18)
+
+    # 計算淨利潤
+    net_profit = profit_token - gas_cost_usdt
+
+    # 印出檢測結果
+    print(f"[{time.strftime('%H:%M:%S')}] 檢測 {'->'.join(path_symbols)} | 毛利 {profit_token:.6f} {BASE} | Gas成本 {gas_cost_usdt:.6f} USDT | 淨利 {net_profit:.6f} USDT")
+    yield {
+        "path_symbols": path_symbols,
+        "path": path,
+        "amt_in": amt_in,
+        "out": out,
+        "v2_out": v2_out,
+        "profit_token": profit_token,
+        "gas_cost_usdt": gas_cost_usdt,
+        "net_profit": net_profit,
+        "gas_price": gas_price,
+        "impact": impact,
+        "pools": pools,
+        "stable_mid": stable_mid,
+        "detected_at": detected_at
+    }
+
+def risk_filter(opp: dict):
+    """風控階段：只放行達到利潤門檻的機會"""
+    if opp["net_profit"] >= Decimal(profit_threshold):
+        msg = f"💰 套利機會：{'->'.join(opp['path_symbols'])}\n毛利: {opp['profit_token']:.6f} {BASE}\nGas成本: {opp['gas_cost_usdt']:.6f} USDT\n淨利: {opp['net_profit']:.6f} USDT"
+        print(msg)
+        tg_send(msg)
+        yield opp
+
+def execute(opp: dict):
+    """執行階段：送出交易並等待確認"""
+    # 最低接受輸出：依本筆交易的價格衝擊與路徑近期波動動態計算
+    min_out = SLIPPAGE.min_amount_out(opp["out"], opp["path_symbols"], opp["impact"])
+    # 鎖定路徑上的交易對並預留投入金額；重複、衝突或已過期的機會直接略過
+    res = INFLIGHT.try_acquire(opp["path_symbols"], opp["pools"], TOKENS[BASE], opp["amt_in"], opp["detected_at"])
+    if res is None:
+        print(f"⏭️ 略過 {'->'.join(opp['path_symbols'])}：與在途交易重複或衝突 | {INFLIGHT.stats()}")
+        return
+    # 分派給閒置、餘額足夠且已授權路由的帳戶
+    wallet = POOL.acquire(TOKENS[BASE], opp["amt_in"], ROUTER_ADDR)
+    if wallet is None:
+        INFLIGHT.release(res, touched=False)
+        print(f"⏭️ 略過 {'->'.join(opp['path_symbols'])}：沒有閒置且餘額足夠的帳戶")
+        return
+    receipt = None
+    path = opp["path"]
+    # 穩定幣腿只在這個帳戶已授權池子時才走 StableSwap，否則整條路徑走路由
+    use_stable = opp["stable_mid"] and wallet.state.allowance(path[-2], STABLE.address) >= opp["stable_mid"]
     try:
-        # 檢查流動性
-        for i in range(len(path_symbols)):
-            if not check_liquidity(path_symbols[i], path_symbols[(i+1)%3]):
-                print(f"⚠️ 路徑 {'->'.join(path_symbols)} 中 {path_symbols[i]}-{path_symbols[(i+1)%3]} 流動性不足")
-                return
-        
-        # 獲取當前價格
-        amt_in = to_token_amount(amount_in_token, BASE)
-        out = get_price(amt_in, path)
-        profit = out - amt_in
-        profit_token = from_token_amount(profit, BASE)
-
-        # 計算Gas成本
-        gas_price = get_gas_price()
-        gas_cost = Decimal(gas_price * 300000) / Decimal(10**18)  # 轉換為BNB
-        gas_cost_usdt = gas_cost * Decimal(get_price(web3.to_wei(1, 'ether'), [TOKENS['WBNB'], TOKENS['USDT']])) / Decimal(10**18)
-        
-        # 計算淨利潤
-        net_profit = profit_token - gas_cost_usdt
+        with priority(EXECUTION):
+            if use_stable:
+                # 前兩跳走路由，穩定幣腿以實際收到的數量經 StableSwap 池換回
+                mid_min = SLIPPAGE.min_amount_out(opp["stable_mid"], opp["path_symbols"], opp["impact"])
+                first = execute_swap(path[:-1], opp["amt_in"], mid_min, wallet)
+                wallet.state.apply_receipt(first)
+                received = received_amount(first, path[-2], wallet.address)
+                receipt = settle_stable_leg(path[-2], path[-1], received, wallet)
+            else:
+                if opp["stable_mid"]:
+                    min_out = SLIPPAGE.min_amount_out(opp["v2_out"], opp["path_symbols"], opp["impact"])
+                receipt = execute_swap(path, opp["amt_in"], min_out, wallet)
+    finally:
+        POOL.release(wallet, receipt)
+        INFLIGHT.release(res)
 
-        # 印出檢測結果
-        print(f"[{time.strftime('%H:%M:%S')}] 檢測 {'->'.join(path_symbols)} | 毛利 {profit_token:.6f} {BASE} | Gas成本 {gas_cost_usdt:.6f} USDT | 淨利 {net_profit:.6f} USDT")
-        
-        if net_profit >= Decimal(profit_threshold):
-            msg = f"💰 套利機會：{'->'.join(path_symbols)}\n毛利: {profit_token:.6f} {BASE}\nGas成本: {gas_cost_usdt:.6f} USDT\n淨利: {net_profit:.6f} USDT"
-            print(msg)
-            tg_send(msg)
-            
-            # 設定最低接受輸出為 99.7% 的預估數量（0.3% 滑點保護）
-            min_out = int(out * 0.997)
-            receipt = execute_swap(path, amt_in, min_out)
-            
-            tx_msg = f"✅ 交易完成：{receipt.transactionHash.hex()}\nGas使用: {receipt.gasUsed}\nGas價格: {web3.from_wei(gas_price, 'gwei')} Gwei"
-            print(tx_msg)
-            tg_send(tx_msg)
-            
+    tx_msg = f"✅ 交易完成：{receipt.transactionHash.hex()}\nGas使用: {receipt.gasUsed}\nGas價格: {web3.from_wei(opp['gas_price'], 'gwei')} Gwei"
+    print(tx_msg)
+    tg_send(tx_msg)
+
+def settle_stable_leg(token_in: str, token_out: str, amount: int, wallet):
+    """中間代幣經 StableSwap 池換回；池子互換失敗時改走路由的 V2 交易對，不把中間代幣留在帳戶裡"""
+    try:
+        if wallet.state.allowance(token_in, STABLE.address) < amount:
+            raise Exception("StableSwap 池授權不足")
+        stable_min = SLIPPAGE.min_amount_out(STABLE.amount_out(token_in, token_out, amount), ("stable", token_in, token_out), 0)
+        return execute_stable_swap(token_in, token_out, amount, stable_min, wallet)
     except Exception as e:
-        error_msg = f"[{path_symbols}] 錯誤：{str(e)}"
-        print(error_msg)
-        tg_send(error_msg)
+        print(f"↩️ 穩定幣腿改走路由換回: {e}")
+        # 失敗的池子交易也花了 Gas：歸還帳戶時重新載入餘額
+        wallet.stale = True
+        hop = BOOK.hops([token_in, token_out], refresh=True)
+        expected = get_amounts_out(amount, hop)[-1]
+        fallback_min = SLIPPAGE.min_amount_out(expected, ("unwind", token_in, token_out), price_impact(amount, hop))
+        return execute_swap([token_in, token_out], amount, fallback_min, wallet)
+
+def on_stage_error(item, e):
+    path_symbols = item["path_symbols"] if isinstance(item, dict) else item
+    error_msg = f"[{path_symbols}] 錯誤：{str(e)}"
+    print(error_msg)
+    # 同一路徑同類錯誤合併通知，避免錯誤風暴洗版
+    tg_send(error_msg, key=f"{path_symbols}:{type(e).__name__}")
+
+def quote_source():
+    """來源階段：每個新區塊依序產出優先套利組合"""
+    for block in CLOCK.ticks():
+        # StableSwap 池狀態每個區塊只刷新一次，偵測執行緒都讀同一份
+        try:
+            STABLE.load(block)
+        except Exception as e:
+            print(f"⚠️ StableSwap 池刷新失敗: {e}")
+        if len(POOL) > 1 and block % REBALANCE_EVERY == 0:
+            try:
+                POOL.rebalance(TOKENS[BASE], to_token_amount(amount_in_token * 2, BASE))
+            except Exception as e:
+                print(f"⚠️ 資金再平衡失敗: {e}")
+        for pair in PRIORITY_PAIRS:
+            yield pair
+
+# ========== 6. 串流管線監控 ==========
+# 偵測與執行分離：執行器入口只保留最新機會並丟棄過期機會，
+# 等待交易確認時監控仍照常全速運轉；多個執行緒經在途登記後並行送出互不衝突的交易
+OPPORTUNITY_MAX_AGE = 6  # 機會最長有效秒數（約兩個區塊）
+
+def warm_gas_model():
+    """啟動時以一個批次的 eth_estimateGas 預熱各三角路徑的 Gas 用量（需帳戶持有投入代幣）"""
+    amt_in = to_token_amount(amount_in_token, BASE)
+    # 只讀帳戶快取挑一個持有投入代幣的帳戶，不占用執行帳戶
+    wallet = next((w for w in POOL.wallets if w.state.balance(TOKENS[BASE]) >= amt_in), None)
+    if wallet is None:
+        return
+    try:
+        deadline = int(time.time()) + 300
+        calls = []
+        for symbols in PRIORITY_PAIRS:
+            path = [TOKENS[s] for s in (*symbols, symbols[0])]
+            calls.append((ROUTER_ADDR, path, encode_swap_exact_tokens(amt_in, 0, path, wallet.address, deadline)))
+        learned = GAS.warm(RPC, wallet.address, calls)
+        print(f"⛽ Gas 模型預熱：{learned}/{len(calls)} 條路徑 | {GAS.stats()}")
+    except Exception as e:
+        print(f"⚠️ Gas 模型預熱失敗（改由收據學習）: {e}")
+
+# 區塊時鐘：新區塊到達即掃描一輪，收據追蹤也由它驅動
+CLOCK = BlockClock(RPC)
+RECEIPTS.attach(CLOCK)
+CLOCK.start()
+
+# 每個執行帳戶補齊對路由的無限授權，交易前不再逐筆檢查（Gas 預熱的模擬也需要授權）
+if not POOL.prepare():
+    raise Exception("❌ 執行帳戶授權失敗")
+warm_gas_model()
 
-# ========== 6. 多線程監控 ==========
 print("🔎 開始三角套利監控與自動交易...\n")
-while True:
-    threads = []
-    # 優先處理優先套利組合
-    for pair in PRIORITY_PAIRS:
-        t = threading.Thread(target=worker, args=(pair,))
-        t.start()
-        threads.append(t)
-    
-    # 等待優先組合處理完成
-    for t in threads:
-        t.join()
-    
-    # 每輪掃描間隔 3 秒（縮短間隔以提高機會捕捉）
-    time.sleep(3)
+pipeline = (
+    Pipeline(quote_source, maxsize=len(PRIORITY_PAIRS))
+    .stage("detect", detect, workers=len(PRIORITY_PAIRS), on_error=on_stage_error)
+    .stage("filter", risk_filter, maxsize=len(PRIORITY_PAIRS), on_error=on_stage_error)
+    .stage("execute", execute, workers=EXECUTE_WORKERS, maxsize=EXECUTE_WORKERS, policy=DROP_OLDEST,
+           max_age=OPPORTUNITY_MAX_AGE, on_error=on_stage_error)
+    .start()
+)
+try:
+    while True:
+        time.sleep(1)
+except KeyboardInterrupt:
+    CLOCK.stop()
+    pipeline.stop()
+    NOTIFIER.close()
+    print(f"\n🛑 監控已停止 | {pipeline.stats()}")
+    print(f"📡 廣播端點排名（延遲ms / 搶先次數）: {BROADCASTER.ranking()}")
@@ -0,0 +1,192 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, List, Optional
+
+from abi_codec import tx_hash_hex
+
+# --------------------------
+# 卡單替換與 Gas 加價排程
+# --------------------------
+# 送出的交易登記後，每個新區塊檢查一次：連續 stuck_blocks 個區塊未上鏈，
+# 就以相同 nonce 提高 Gas 價格重新簽名送出（節點要求至少加價 10%）；
+# 加價超過上限、次數用盡或交易已過期時改送取消交易（對自己轉 0 BNB）。
+# 任一版本上鏈即完成，卡住的 nonce 不再凍結後續所有交易。
+# 簽名與送出交給背景執行緒池，區塊時鐘執行緒只負責挑出卡住的交易
+MIN_BUMP = 1.1
+
+
+class TxCancelled(Exception):
+    """交易已被取消交易取代"""
+    def __init__(self, receipt):
+        self.receipt = receipt
+        super().__init__(f"交易已取消（nonce 由取消交易 {receipt.transactionHash.hex()} 使用）")
+
+
+class _Pending:
+    __slots__ = ("tx", "hashes", "cancel_hashes", "sent_block", "bumps", "expires_at", "allow_cancel",
+                 "future", "gave_up", "sending")
+
+    def __init__(self, tx, tx_hash, block, expires_at, allow_cancel):
+        self.tx = dict(tx)
+        self.hashes = [tx_hash]
+        self.cancel_hashes = set()
+        self.sent_block = block
+        self.bumps = 0
+        self.expires_at = expires_at
+        self.allow_cancel = allow_cancel
+        self.future = Future()
+        self.gave_up = False
+        self.sending = False
+
+
+class GasBumper:
+    def __init__(self, rpc, receipts, sign: Callable[[dict], str], max_gas_price: int,
+                 stuck_blocks: int = 3, bump: float = 1.125, max_bumps: int = 5, broadcaster=None,
+                 workers: int = 2):
+        self.rpc = rpc
+        self.broadcaster = broadcaster
+        self.receipts = receipts
+        self.sign = sign
+        self.max_gas_price = max_gas_price
+        self.stuck_blocks = stuck_blocks
+        self.bump = max(bump, MIN_BUMP)
+        self.max_bumps = max_bumps
+        self.block = 0
+        self.replaced = 0
+        self.cancelled = 0
+        self._pending: Dict[int, _Pending] = {}     # nonce -> 在途交易
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gas-bumper")
+
+    def attach(self, clock):
+        """由區塊時鐘驅動"""
+        self.block = clock.block
+        clock.subscribe(self.on_block)
+
+    def watch(self, tx: dict, tx_hash, expires_at: Optional[float] = None,
+              allow_cancel: bool = True) -> Future:
+        """登記已送出的交易；回傳的 Future 以最先上鏈的版本收據完成
+
+        allow_cancel=False 時只加價不取消（例如持有部位後的平倉交易）
+        """
+        tx_hash = tx_hash_hex(tx_hash)
+        entry = _Pending(tx, tx_hash, self.block, expires_at, allow_cancel)
+        with self._lock:
+            self._pending[tx["nonce"]] = entry
+        self._track(entry, tx_hash)
+        return entry.future
+
+    def wait(self, tx: dict, tx_hash, timeout: float, expires_at: Optional[float] = None,
+             allow_cancel: bool = True):
+        future = self.watch(tx, tx_hash, expires_at, allow_cancel)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self._forget(tx["nonce"])
+            raise
+
+    def _forget(self, nonce: int):
+        """呼叫端放棄等待：不再加價重送，也不再追蹤該 nonce 的各版本"""
+        with self._lock:
+            entry = self._pending.pop(nonce, None)
+        if entry is not None:
+            entry.gave_up = True
+            for h in entry.hashes:
+                self.receipts.untrack(h)
+
+    def _track(self, entry: _Pending, tx_hash: str):
+        self.receipts.track(tx_hash, callback=lambda r, e=entry, h=tx_hash: self._landed(e, h, r))
+
+    def _landed(self, entry: _Pending, tx_hash: str, receipt):
+        with self._lock:
+            if entry.future.done():
+                return
+            self._pending.pop(entry.tx["nonce"], None)
+        # 同一 nonce 的其他版本永遠不會上鏈，不再追蹤
+        for h in entry.hashes:
+            if h != tx_hash:
+                self.receipts.untrack(h)
+        if tx_hash in entry.cancel_hashes:
+            entry.future.set_exception(TxCancelled(receipt))
+        else:
+            entry.future.set_result(receipt)
+
+    def on_block(self, block: int):
+        self.block = block
+        with self._lock:
+            stuck = [e for e in self._pending.values()
+                     if not e.gave_up and not e.sending and block - e.sent_block >= self.stuck_blocks]
+            for entry in stuck:
+                entry.sending = True
+                entry.sent_block = block
+        for entry in stuck:
+            self._executor.submit(self._bump, entry)
+
+    def _bump(self, entry: _Pending):
+        expired = entry.expires_at is not None and time.time() > entry.expires_at
+        try:
+            if entry.future.done() or entry.gave_up:
+                return
+            if entry.allow_cancel and not entry.cancel_hashes and (expired or entry.bumps >= self.max_bumps):
+                self._cancel(entry)
+            else:
+                self._replace(entry)
+        except Exception as e:
+            print(f"[GasBumper] nonce {entry.tx['nonce']} 替換失敗: {str(e)}")
+        finally:
+            entry.sending = False
+
+    def _next_price(self, entry: _Pending) -> Optional[int]:
+        current = entry.tx["gasPrice"]
+        price = min(int(current * self.bump) + 1, self.max_gas_price)
+        # 加價不足 10% 節點會拒絕替換
+        return price if price >= current * MIN_BUMP else None
+
+    def _replace(self, entry: _Pending):
+        price = self._next_price(entry)
+        if price is None:
+            if not entry.cancel_hashes:
+                print(f"[GasBumper] nonce {entry.tx['nonce']} 已達 Gas 上限，無法再加價")
+            entry.gave_up = True
+            return
+        tx = dict(entry.tx, gasPrice=price)
+        tx_hash = self._send(tx)
+        entry.tx = tx
+        entry.bumps += 1
+        if entry.cancel_hashes:
+            # 取消交易本身也卡住時繼續加價
+            entry.cancel_hashes.add(tx_hash)
+        entry.hashes.append(tx_hash)
+        self.replaced += 1
+        print(f"⛽ nonce {tx['nonce']} 加價重送: {price / 1e9:.2f} gwei | {tx_hash}")
+        self._track(entry, tx_hash)
+
+    def _cancel(self, entry: _Pending):
+        price = self._next_price(entry)
+        if price is None:
+            entry.gave_up = True
+            print(f"[GasBumper] nonce {entry.tx['nonce']} 已達 Gas 上限，無法取消")
+            return
+        src = entry.tx["from"]
+        tx = {"from": src, "to": src, "value": 0, "data": "0x", "gas": 21000, "gasPrice": price,
+              "nonce": entry.tx["nonce"], "chainId": entry.tx.get("chainId", 56)}
+        tx_hash = self._send(tx)
+        entry.tx = tx
+        entry.cancel_hashes.add(tx_hash)
+        entry.hashes.append(tx_hash)
+        self.cancelled += 1
+        print(f"🛑 nonce {tx['nonce']} 送出取消交易: {price / 1e9:.2f} gwei | {tx_hash}")
+        self._track(entry, tx_hash)
+
+    def _send(self, tx: dict) -> str:
+        if self.broadcaster is not None:
+            return tx_hash_hex(self.broadcaster.send_raw(self.sign(tx)))
+        return tx_hash_hex(self.rpc.call("eth_sendRawTransaction", [self.sign(tx)]))
+
+    def pending(self) -> List[int]:
+        with self._lock:
+            return sorted(self._pending)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
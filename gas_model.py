@@ -0,0 +1,119 @@
+import threading
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+# --------------------------
+# Gas 用量模型（依自身收據與批次模擬學習，記憶體內估算）
+# --------------------------
+# 每筆交易前 eth_estimateGas 多一次往返，偵測階段又以固定 300000 估成本，
+# 多跳路徑的成本因此被高估或低估。同一個 (合約, 跳數, 代幣集合) 的實際用量相當穩定：
+# - 每筆成功交易的 gasUsed 更新指數平均與近期峰值
+# - 啟動時以一個批次的 eth_estimateGas 預熱常用路徑
+# - 沒有樣本時依同合約同跳數的平均，再不行才用依跳數的保守先驗
+# estimate() 為預期用量（算成本），limit() 加上安全邊際（填交易的 gas 上限）
+BASE_GAS = 50000         # 先驗：交易基本開銷 + 路由合約固定成本
+PER_HOP_GAS = 70000      # 先驗：每多一跳（一次 pair.swap + 轉帳）
+DEFAULT_MARGIN = 1.25
+PEAK_MARGIN = 1.05       # 上限至少比近期最高用量多這個比例
+ALPHA = 0.2
+
+Key = Tuple[str, int, FrozenSet[str]]
+
+
+def prior_gas(hops: int) -> int:
+    return BASE_GAS + PER_HOP_GAS * max(hops, 1)
+
+
+class _Stat:
+    __slots__ = ("mean", "samples", "recent")
+
+    def __init__(self, gas: int):
+        self.mean = float(gas)
+        self.samples = 1
+        self.recent = deque([gas], maxlen=16)
+
+    def add(self, gas: int, alpha: float):
+        self.mean += alpha * (gas - self.mean)
+        self.samples += 1
+        self.recent.append(gas)
+
+
+class GasModel:
+    def __init__(self, margin: float = DEFAULT_MARGIN, alpha: float = ALPHA):
+        self.margin = margin
+        self.alpha = alpha
+        self.hits = 0
+        self.fallbacks = 0
+        self._stats: Dict[Key, _Stat] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(to: str, tokens: Sequence[str]) -> Key:
+        """tokens 為依序經過的代幣（路由路徑，或穩定幣池的 [輸入, 輸出]）"""
+        return to.lower(), max(len(tokens) - 1, 1), frozenset(t.lower() for t in tokens)
+
+    def record(self, to: str, tokens: Sequence[str], gas_used: int):
+        if not gas_used:
+            return
+        key = self.key(to, tokens)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                self._stats[key] = _Stat(gas_used)
+            else:
+                stat.add(gas_used, self.alpha)
+
+    def record_receipt(self, to: str, tokens: Sequence[str], receipt) -> None:
+        """只學成功的交易；revert 的用量與正常路徑無關"""
+        if receipt and receipt.get("status") == 1:
+            self.record(to, tokens, receipt.get("gasUsed") or 0)
+
+    def _lookup(self, to: str, tokens: Sequence[str]) -> Tuple[float, int]:
+        """(預期用量, 近期峰值)；沒有樣本時峰值為 0"""
+        key = self.key(to, tokens)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is not None:
+                self.hits += 1
+                return stat.mean, max(stat.recent)
+            self.fallbacks += 1
+            # 同合約同跳數的其他代幣組合
+            similar = [s for (t, h, _), s in self._stats.items() if t == key[0] and h == key[1]]
+        if similar:
+            return sum(s.mean for s in similar) / len(similar), max(max(s.recent) for s in similar)
+        return float(prior_gas(key[1])), 0
+
+    def estimate(self, to: str, tokens: Sequence[str]) -> int:
+        """預期 gasUsed（計算成本用）"""
+        return int(self._lookup(to, tokens)[0])
+
+    def limit(self, to: str, tokens: Sequence[str]) -> int:
+        """交易 gas 上限：預期用量加安全邊際，且不低於近期峰值"""
+        mean, peak = self._lookup(to, tokens)
+        return int(max(mean * self.margin, peak * PEAK_MARGIN))
+
+    def warm(self, rpc, sender: str, calls: Iterable[Tuple[str, Sequence[str], str]], block="latest") -> int:
+        """以一個批次的 eth_estimateGas 預熱 (合約, 代幣, calldata)；回傳成功筆數。
+        sender 需持有輸入代幣與授權，估算失敗（revert）的路徑略過，之後由收據學習"""
+        calls = list(calls)
+        if not calls:
+            return 0
+        tag = hex(block) if isinstance(block, int) else block
+        results = rpc.call_many([("eth_estimateGas", [{"from": sender, "to": to, "data": data}, tag])
+                                 for to, _, data in calls])
+        learned = 0
+        for (to, tokens, _), res in zip(calls, results):
+            if isinstance(res, str):
+                self.record(to, tokens, int(res, 16))
+                learned += 1
+        return learned
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"routes": len(self._stats), "samples": sum(s.samples for s in self._stats.values()),
+                    "hits": self.hits, "fallbacks": self.fallbacks}
+
+    def table(self) -> List[Tuple[str, int, int, int]]:
+        """(合約, 跳數, 平均用量, 樣本數)，供顯示 / 除錯"""
+        with self._lock:
+            return [(t, h, int(s.mean), s.samples) for (t, h, _), s in self._stats.items()]
@@ -0,0 +1,118 @@
+import time
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+# --------------------------
+# 在途交易登記（池鎖 / 餘額預留 / 重複機會抑制）
+# --------------------------
+# 多個執行緒同時偵測到機會時，送出前先在此登記：
+# 1. 同一機會（key）已在途 → 重複，略過
+# 2. 任何一個交易對已被其他在途交易鎖定 → 衝突，略過
+# 3. 可用餘額扣掉其他在途交易預留後不足 → 略過
+# 4. 機會的觀測時間早於某交易對上次被自己的交易改動 → 已過期，略過
+# 收到收據（成功或失敗）後釋放；互不衝突的機會可同時執行
+
+
+class Reservation:
+    __slots__ = ("key", "pools", "token", "amount", "created_at")
+
+    def __init__(self, key, pools, token, amount):
+        self.key = key
+        self.pools = pools
+        self.token = token
+        self.amount = amount
+        self.created_at = time.time()
+
+
+class InFlightRegistry:
+    def __init__(self, balance_of: Optional[Callable[[str], int]] = None):
+        self.balance_of = balance_of
+        self.acquired = 0
+        self.duplicates = 0
+        self.conflicts = 0
+        self.insufficient = 0
+        self.stale = 0
+        self._keys: Dict[Hashable, Reservation] = {}
+        self._pools: Dict[str, Reservation] = {}
+        self._reserved: Dict[str, int] = {}
+        self._touched: Dict[str, float] = {}    # 交易對 -> 自己的交易上次改動該池的時間
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: Hashable, pools: Iterable[str], token: Optional[str] = None,
+                    amount: int = 0, observed_at: Optional[float] = None) -> Optional[Reservation]:
+        """登記一筆待送出交易；與在途交易重複或衝突時回傳 None"""
+        pools = tuple(p.lower() for p in pools)
+        with self._lock:
+            if key in self._keys:
+                self.duplicates += 1
+                return None
+            if any(p in self._pools for p in pools):
+                self.conflicts += 1
+                return None
+            if observed_at is not None and any(self._touched.get(p, 0) > observed_at for p in pools):
+                self.stale += 1
+                return None
+            if token is not None and amount and self.balance_of is not None:
+                if self._reserved.get(token, 0) + amount > self.balance_of(token):
+                    self.insufficient += 1
+                    return None
+            res = Reservation(key, pools, token, amount)
+            self._keys[key] = res
+            for p in pools:
+                self._pools[p] = res
+            if token is not None:
+                self._reserved[token] = self._reserved.get(token, 0) + amount
+            self.acquired += 1
+            return res
+
+    def release(self, res: Reservation, touched: bool = True):
+        """交易確認（或送出失敗）後釋放；touched 表示交易已上鏈改動過這些池"""
+        now = time.time()
+        with self._lock:
+            if self._keys.get(res.key) is res:
+                del self._keys[res.key]
+            for p in res.pools:
+                if self._pools.get(p) is res:
+                    del self._pools[p]
+                if touched:
+                    self._touched[p] = now
+            if res.token is not None:
+                self._reserved[res.token] = max(self._reserved.get(res.token, 0) - res.amount, 0)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight(),
+            "acquired": self.acquired,
+            "duplicates": self.duplicates,
+            "conflicts": self.conflicts,
+            "insufficient": self.insufficient,
+            "stale": self.stale,
+        }
+
+
+# --------------------------
+# 本地 nonce 配發
+# --------------------------
+class NonceManager:
+    """啟動時讀一次鏈上 pending nonce，之後在本地遞增配發；送出失敗時重新同步"""
+
+    def __init__(self, rpc, address: str):
+        self.rpc = rpc
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = rpc.get_transaction_count(address, "pending")
+
+    def next(self) -> int:
+        with self._lock:
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def resync(self):
+        """交易未送出就失敗時，以鏈上 pending nonce 為準避免留下空號"""
+        with self._lock:
+            self._next = self.rpc.get_transaction_count(self.address, "pending")
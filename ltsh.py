@@ -10,6 +10,24 @@ from collections import deque
 from typing import Optional, Dict
 import eth_utils
 from eth_abi import encode
+from pipeline import Pipeline, DROP_OLDEST
+from receipts import ReceiptTracker
+from wallet_state import WalletState
+from simulation import simulate_plan
+from dashboard import Dashboard
+from transport import make_provider, get_session, set_rate_limiter
+from rate_limiter import RateLimiter, priority, EXECUTION
+from rpc_client import BatchRPCClient
+from abi_codec import FastRouter, encode_approve, encode_swap_exact_tokens
+from amm import ReserveBook, price_impact, PANCAKE_V2_FEE_BPS, BISWAP_FEE_BPS, MDEX_FEE_BPS, BABYSWAP_FEE_BPS
+from slippage import SlippageModel, VolatilityTracker
+from block_clock import BlockClock, BLOCK_TIME
+from quote_curve import CurveBook, RouteCurves, size_ladder
+from circuit_breaker import BreakerRegistry, quote_curves
+from gas_bumper import GasBumper, TxCancelled
+from split_optimizer import Route, optimize_split
+from price_daemon import price_source
+from broadcaster import Broadcaster, submit_urls
 
 # --------------------------
 # 1. 載入環境變數與常數配置
@@ -24,10 +42,13 @@ if not WALLET_ADDRESS or not PRIVATE_KEY:
 
 # 常數設定
 CACHE_TIMEOUT = 10            # 價格緩存超時秒數
-MAX_SLIPPAGE = 1.0            # 最大滑點百分比
+MAX_SLIPPAGE = 1.0            # 最大滑點百分比（動態滑點上限）
 MIN_PROFIT_THRESHOLD = 0.5    # 最小套利利潤閥值 (USDT)
 MAX_GAS_PRICE_GWEI = 50       # 最大Gas價格（單位：gwei）
 BALANCE_BUFFER = 30           # 交易前最低需要保留BNB數量（以ether計）
+APPROVE_INFINITE = 2**256 - 1 # 啟動時預先無限授權額度
+CHAIN_ID = 56                 # BSC 主網
+SPLIT_LEG_GAS = 150000        # 拆單每多一腿（一筆 swap）的估計 Gas 用量
 
 # --------------------------
 # 2. 高可用 BSC RPC 節點
@@ -37,6 +58,8 @@ BSC_RPC_URLS = [
     "https://bsc-dataseed2.binance.org",
     "https://bsc-dataseed3.binance.org"
 ]
+# 各節點令牌桶限流：超速時排隊等待，不再因 429 頻繁切換節點
+set_rate_limiter(RateLimiter.for_urls(BSC_RPC_URLS))
 
 # --------------------------
 # 3. 完整合約 ABI 配置
@@ -132,12 +155,14 @@ class EnhancedWeb3:
         self.current_provider = 0
         self.w3 = self._connect()
         self._verify_connection()
+        # 零散讀取（區塊高度、Gas、餘額、nonce、收據）自動合併成批次請求
+        self.batch = BatchRPCClient(self.rpc_urls[self.current_provider], urls=self.rpc_urls)
+        # 切換節點時一起改送新節點的客戶端（批次 RPC、收據追蹤器等，需有 set_url）
+        self.clients = [self.batch]
 
     def _connect(self):
-        return Web3(Web3.HTTPProvider(
-            self.rpc_urls[self.current_provider],
-            request_kwargs={'timeout': 10}
-        ))
+        # 共用長連線池：切換節點時沿用已暖機的連線
+        return Web3(make_provider(self.rpc_urls[self.current_provider], timeout=10))
 
     def _verify_connection(self):
         if not self.w3.is_connected():
@@ -148,6 +173,8 @@ class EnhancedWeb3:
         print(f"🔄 切換到節點: {self.rpc_urls[self.current_provider]}")
         self.w3 = self._connect()
         self._verify_connection()
+        for client in self.clients:
+            client.set_url(self.rpc_urls[self.current_provider])
 
     def __getattr__(self, name):
         return getattr(self.w3, name)
@@ -160,6 +187,13 @@ CONTRACT_ADDRESSES = {
     "pancake": Web3.to_checksum_address("0x10ED43C718714eb63d5aA57B78B54704E256024E"),
     "biswap": Web3.to_checksum_address("0x3a6d8cA21D1CF76F653A67577FA0D27453350dD8"),
     "mdex": Web3.to_checksum_address("0x7DAe51BD3E3376B8c7c4900E9107f12Be3AF1bA8"),
+    "babyswap": Web3.to_checksum_address("0x8317c460C22A9958c27b4B6403b98d2Ef4E2ad32"),
+
+    # 交易所工廠合約（本地儲備模型用）
+    "pancake_factory": Web3.to_checksum_address("0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73"),
+    "biswap_factory": Web3.to_checksum_address("0x858E3312ed3A876947EA49d572A7C42DE08af7EE"),
+    "mdex_factory": Web3.to_checksum_address("0x3CD1C46068dAEa5Ebb0d3f55F6915B10648062B8"),
+    "babyswap_factory": Web3.to_checksum_address("0x86407bEa2078ea5f5EB5A52B2caA963bC1F889Da"),
     
     # 代幣合約 (修正後)
     "usdt": Web3.to_checksum_address("0x55d398326f99059fF775485246999027B3197955"),
@@ -197,18 +231,47 @@ def get_raw_tx(signed_tx):
 # 7. 價格管理 (內部建立 Pancake 與 BakerySwap 合約)
 # --------------------------
 class PriceManager:
-    def __init__(self, w3):
+    def __init__(self, w3, rpc: Optional[BatchRPCClient] = None):
         self.w3 = w3
+        self.rpc = rpc or BatchRPCClient(self.w3.provider.endpoint_uri)
         # 建立路由合約實例
-        self.pancake_router = self.w3.eth.contract(address=CONTRACT_ADDRESSES["pancake"], abi=PANCAKE_ROUTER_ABI)
-        self.bakery_router  = self.w3.eth.contract(address=CONTRACT_ADDRESSES["biswap"],  abi=PANCAKE_ROUTER_ABI)
+        # 報價走精簡編解碼，繞過 web3 合約函式機制；設定 PRICE_DAEMON_SOCKET 時經本機報價服務
+        self.quotes = price_source(self.rpc)
+        self.pancake_router = FastRouter(self.quotes, CONTRACT_ADDRESSES["pancake"])
+        self.bakery_router  = FastRouter(self.quotes, CONTRACT_ADDRESSES["biswap"])
         self.price_cache = deque(maxlen=5)
         self.last_update = 0
-
-    def get_prices(self) -> Optional[Dict]:
-        if time.time() - self.last_update < CACHE_TIMEOUT and self.price_cache:
+        self.last_block = None
+        # 每輪報價順便更新各交易所的價格波動，供動態滑點使用
+        self.volatility = VolatilityTracker()
+        # 每輪對交易金額附近的規模階梯一次批次報價，定量與執行都讀同一組曲線
+        self.curves = CurveBook()
+        self.trade_size = 0
+        # 依 (路由, 路徑) 的報價斷路器，持續失敗的路徑不再每輪報價
+        self.breakers = BreakerRegistry()
+
+    def set_trade_size(self, usdt_wei: int):
+        """設定單次交易金額，報價曲線以此為中心"""
+        self.trade_size = usdt_wei
+
+    def get_prices(self, block: Optional[int] = None) -> Optional[Dict]:
+        if block is not None:
+            # 由區塊時鐘驅動：同一區塊只報價一次
+            if block == self.last_block and self.price_cache:
+                return self.price_cache[-1]
+        elif time.time() - self.last_update < CACHE_TIMEOUT and self.price_cache:
             return self.price_cache[-1]
         prices = {}
+        # 同一輪報價釘選在同一區塊，交易前模擬也以此區塊為準
+        if block is not None:
+            self.last_block = block
+        else:
+            try:
+                self.last_block = self.rpc.block_number()
+            except Exception as e:
+                print(f"區塊高度查詢錯誤: {e}")
+                self.last_block = None
+        self.curves.reset(self.last_block)
         for fn in [self._get_pancake_price, self._get_bakeryswap_price]:
             try:
                 r = fn()
@@ -217,6 +280,8 @@ class PriceManager:
             except Exception as e:
                 print(f"查詢錯誤: {str(e)}")
         if prices:
+            for dex, price in prices.items():
+                self.volatility.observe(dex, price)
             self.price_cache.append(prices)
             self.last_update = time.time()
             return prices
@@ -225,18 +290,37 @@ class PriceManager:
         else:
             return None
 
+    def _build_curves(self, dex: str, router: FastRouter) -> RouteCurves:
+        """買賣兩個方向、各兩條路徑、整條規模階梯，一個批次報價"""
+        usdt, wbnb, busd = CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"]
+        last_price = self.price_cache[-1].get(dex) if self.price_cache else None
+        usdt_sizes = size_ladder(self.trade_size, extra=[10**18]) if self.trade_size else [10**18]
+        # WBNB 階梯以上一輪價格換算；第一輪只有 1 單位報價
+        wbnb_sizes = (size_ladder(int(self.trade_size / last_price), extra=[10**18])
+                      if self.trade_size and last_price else [10**18])
+        buy_paths = [[usdt, wbnb], [usdt, busd, wbnb]]
+        sell_paths = [[wbnb, usdt], [wbnb, busd, usdt]]
+        curves = quote_curves(self.breakers, router, [(p, usdt_sizes) for p in buy_paths] + [(p, wbnb_sizes) for p in sell_paths],
+                              self.last_block or 'latest')
+        buy, sell = RouteCurves(curves[:2]), RouteCurves(curves[2:])
+        self.curves.put((dex, "buy"), buy)
+        self.curves.put((dex, "sell"), sell)
+        return sell
+
     def _get_pancake_price(self) -> Dict:
         try:
-            amounts = self.pancake_router.functions.getAmountsOut(10**18, [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]).call()
-            return {"pancake": amounts[-1] / 1e18}
+            sell = self._build_curves("pancake", self.pancake_router)
+            direct = sell.curve([CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]])
+            return {"pancake": direct.amount_out(10**18) / 1e18} if direct else {}
         except Exception as e:
             print(f"Pancake 查詢錯誤: {e}")
             return {}
 
     def _get_bakeryswap_price(self) -> Dict:
         try:
-            amounts = self.bakery_router.functions.getAmountsOut(10**18, [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]).call()
-            return {"bakeryswap": amounts[-1] / 1e18}
+            sell = self._build_curves("bakeryswap", self.bakery_router)
+            direct = sell.curve([CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]])
+            return {"bakeryswap": direct.amount_out(10**18) / 1e18} if direct else {}
         except Exception as e:
             print(f"BakerySwap 查詢錯誤: {e}")
             return {}
@@ -245,16 +329,81 @@ class PriceManager:
 # 8. 套利執行
 # --------------------------
 class ArbitrageExecutor:
-    def __init__(self, w3):
+    def __init__(self, w3, rpc: Optional[BatchRPCClient] = None):
         self.w3 = w3  # 使用 EnhancedWeb3 的 w3
-        self.price_manager = PriceManager(self.w3)
+        self.rpc = rpc or BatchRPCClient(self.w3.provider.endpoint_uri)
+        self.price_manager = PriceManager(self.w3, self.rpc)
+        # 本地儲備模型與動態滑點（上限為 MAX_SLIPPAGE）
+        self.books = {
+            "pancake": ReserveBook(self.rpc, CONTRACT_ADDRESSES["pancake_factory"], PANCAKE_V2_FEE_BPS),
+            "bakeryswap": ReserveBook(self.rpc, CONTRACT_ADDRESSES["biswap_factory"], BISWAP_FEE_BPS),
+            # 以下只參與買入拆單，不做價格比較
+            "mdex": ReserveBook(self.rpc, CONTRACT_ADDRESSES["mdex_factory"], MDEX_FEE_BPS),
+            "babyswap": ReserveBook(self.rpc, CONTRACT_ADDRESSES["babyswap_factory"], BABYSWAP_FEE_BPS)
+        }
+        self.slippage = SlippageModel(self.price_manager.volatility, max_bps=MAX_SLIPPAGE * 100)
         self.dex_map = {
             "pancake": self.w3.eth.contract(address=CONTRACT_ADDRESSES["pancake"], abi=PANCAKE_ROUTER_ABI),
             "bakeryswap": self.w3.eth.contract(address=CONTRACT_ADDRESSES["biswap"], abi=PANCAKE_ROUTER_ABI)
             # 可根據需要加入 mdex
         }
+        # 所有可下單的路由（含只參與拆單的交易所）
+        self.routers = {dex: router.address for dex, router in self.dex_map.items()}
+        self.routers.update(mdex=CONTRACT_ADDRESSES["mdex"], babyswap=CONTRACT_ADDRESSES["babyswap"])
         # 建立 USDT 合約實例
         self.usdt_contract = self.w3.eth.contract(address=CONTRACT_ADDRESSES["usdt"], abi=USDT_ABI)
+        # 所有在途交易共用一個逐區塊批次查詢的收據追蹤器
+        self.receipts = ReceiptTracker(self.rpc.url)
+        # 已簽名交易同時送往所有節點（含 BSC_SUBMIT_URLS 額外端點），第一個確認即返回
+        self.broadcaster = Broadcaster(BSC_RPC_URLS, extra=submit_urls())
+        # 卡單替換：連續數個區塊未上鏈就以相同 nonce 加價重送，上限為 MAX_GAS_PRICE_GWEI
+        self.bumper = GasBumper(self.rpc, self.receipts, self._sign, Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei'),
+                                broadcaster=self.broadcaster)
+        # 錢包餘額與授權快取：啟動時載入一次，之後只依自己的收據更新
+        self.wallet = WalletState(
+            self.w3.provider.endpoint_uri,
+            WALLET_ADDRESS,
+            [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]],
+            list(self.routers.values())
+        ).load()
+
+    def prepare(self) -> bool:
+        """啟動時對所有路由預先無限授權，交易前不再檢查額度"""
+        for token_addr, spender_addr in self.wallet.missing_approvals():
+            if not self._approve_if_needed(token_addr, spender_addr, APPROVE_INFINITE):
+                return False
+        return True
+
+    def _min_out(self, dex: str, path: list, amount_in: int, expected_out: int) -> int:
+        """依池深度、交易規模與近期波動計算最低可接受輸出"""
+        book = self.books[dex]
+        try:
+            # 儲備已在拆單 / 報價時載入本區塊，直接讀快取；只有尚未載入的交易對才補打一次節點
+            try:
+                hops = book.hops(path, refresh=False)
+            except ValueError:
+                hops = book.hops(path)
+            impact = price_impact(amount_in, hops)
+        except Exception as e:
+            print(f"⚠️ 儲備查詢失敗，使用最大滑點: {e}")
+            return int(expected_out * (100 - MAX_SLIPPAGE) / 100)
+        return self.slippage.min_amount_out(expected_out, dex, impact)
+
+    def _sign(self, tx: dict) -> str:
+        return "0x" + bytes(get_raw_tx(self.w3.eth.account.sign_transaction(tx, PRIVATE_KEY))).hex()
+
+    def _wait_receipt(self, txh, timeout: int = 180, tx: Optional[Dict] = None, allow_cancel: bool = True):
+        """等待收據；附上原始交易時卡單會自動加價替換（或取消）"""
+        if tx is None:
+            rc = self.receipts.wait(txh, timeout)
+        else:
+            try:
+                rc = self.bumper.wait(tx, txh, timeout, allow_cancel=allow_cancel)
+            except TxCancelled as e:
+                self.wallet.apply_receipt(e.receipt)
+                raise
+        self.wallet.apply_receipt(rc)
+        return rc
 
     def check_opportunity(self, prices: Dict) -> Optional[Dict]:
         if not prices or len(prices) < 2:
@@ -276,113 +425,143 @@ class ArbitrageExecutor:
                 "sell_dex": sell_dex,
                 "buy_price": buy_price,
                 "sell_price": sell_price,
-                "spread": spread
+                "spread": spread,
+                "block": self.price_manager.last_block
             }
         return None
 
-    def _decide_path_usdt_to_wbnb(self, router, amt_in: int):
-        best_path = [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]]
-        best_out = 0
-        try:
-            single = router.functions.getAmountsOut(amt_in, [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]]).call()
-            out_single = single[-1]
-            if out_single > best_out:
-                best_out = out_single
-                best_path = [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"]]
-        except Exception as e:
-            print(f"單跳路徑計算失敗: {e}")
-        try:
-            multi = router.functions.getAmountsOut(amt_in, [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["wbnb"]]).call()
-            out_multi = multi[-1]
-            if out_multi > best_out:
-                best_out = out_multi
-                best_path = [CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["wbnb"]]
-        except Exception as e:
-            print(f"多跳路徑計算失敗: {e}")
+    def _decide_path(self, router, amt_in: int, side: str, dex: Optional[str] = None):
+        """讀取本區塊的報價曲線選擇最佳路徑；沒有曲線時兩條路徑一次批次報價"""
+        curves = self.price_manager.curves.get((dex, side)) if dex else None
+        if not curves:
+            usdt, wbnb, busd = CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"]
+            paths = [[usdt, wbnb], [usdt, busd, wbnb]] if side == "buy" else [[wbnb, usdt], [wbnb, busd, usdt]]
+            try:
+                curves = RouteCurves(quote_curves(self.price_manager.breakers, FastRouter(self.rpc, router.address),
+                                                  [(p, [amt_in]) for p in paths]))
+            except Exception as e:
+                print(f"路徑報價失敗 ({side}): {e}")
+                return paths[0], 0
+        best_path, best_out = curves.best(amt_in)
+        if best_path is None:
+            return curves.curves[0].path if curves.curves else [], 0
         return best_path, best_out
 
-    def _decide_path_wbnb_to_usdt(self, router, amt_in: int):
-        best_path = [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]
-        best_out = 0
-        try:
-            single = router.functions.getAmountsOut(amt_in, [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]).call()
-            out_single = single[-1]
-            if out_single > best_out:
-                best_out = out_single
-                best_path = [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["usdt"]]
-        except Exception as e:
-            print(f"單跳路徑 (WBNB->USDT) 計算失敗: {e}")
+    def _decide_path_usdt_to_wbnb(self, router, amt_in: int, dex: Optional[str] = None):
+        return self._decide_path(router, amt_in, "buy", dex)
+
+    def _decide_path_wbnb_to_usdt(self, router, amt_in: int, dex: Optional[str] = None):
+        return self._decide_path(router, amt_in, "sell", dex)
+
+    def _split_buy(self, amt_in: int, exclude: str, gas_price: int):
+        """USDT -> WBNB 依本地儲備拆到各路由 / 路徑；排除賣出端，避免買單推高自己要賣出的池"""
+        usdt, wbnb, busd = CONTRACT_ADDRESSES["usdt"], CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"]
+        paths = [[usdt, wbnb], [usdt, busd, wbnb]]
+        pairs = [pair for p in paths for pair in zip(p, p[1:])]
+        routes = []
+        for dex, book in self.books.items():
+            if dex == exclude:
+                continue
+            try:
+                book.load(pairs, self.price_manager.last_block or 'latest')
+            except Exception as e:
+                print(f"⚠️ {dex} 儲備載入失敗: {e}")
+                continue
+            for p in paths:
+                try:
+                    hops = book.hops(p, refresh=False)
+                except ValueError:
+                    continue
+                routes.append(Route(dex, p, hops, [book.pair_address(a, b) for a, b in zip(p, p[1:])]))
+        return optimize_split(amt_in, routes, leg_cost=gas_price * SPLIT_LEG_GAS)
+
+    def _plan_buy(self, amt_in: int, buy_dex: str, sell_dex: str, gas_price: int) -> list:
+        """買入各腿 {dex, router, path, amount_in, expected, min_out}；拆單不可用時走單一路由最佳路徑"""
+        plan = None
         try:
-            multi = router.functions.getAmountsOut(amt_in, [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["usdt"]]).call()
-            out_multi = multi[-1]
-            if out_multi > best_out:
-                best_out = out_multi
-                best_path = [CONTRACT_ADDRESSES["wbnb"], CONTRACT_ADDRESSES["busd"], CONTRACT_ADDRESSES["usdt"]]
+            plan = self._split_buy(amt_in, sell_dex, gas_price)
         except Exception as e:
-            print(f"多跳路徑 (WBNB->BUSD->USDT) 計算失敗: {e}")
-        return best_path, best_out
+            print(f"⚠️ 拆單計算失敗，改走單一路由: {e}")
+        if plan is None:
+            path, out = self._decide_path_usdt_to_wbnb(self.dex_map[buy_dex], amt_in, buy_dex)
+            legs = [(buy_dex, path, amt_in, out)]
+        else:
+            if len(plan) > 1:
+                desc = ", ".join(f"{l.key}:{len(l.path) - 1}跳 {l.amount_in / 1e18:.2f}" for l in plan.legs)
+                print(f"✂️ 拆單 {len(plan)} 腿（{desc}）| 較單一路徑多得 {plan.gain / 1e18:.6f} WBNB")
+            legs = [(l.key, l.path, l.amount_in, l.amount_out) for l in plan.legs]
+        return [{"dex": dex, "router": self.routers[dex], "path": path, "amount_in": a, "expected": out,
+                 "min_out": self._min_out(dex, path, a, out)} for dex, path, a, out in legs]
 
     def _approve_if_needed(self, token_addr: str, spender_addr: str, amt_wei: int) -> bool:
         curr_allow = self._get_allowance(token_addr, WALLET_ADDRESS, spender_addr)
         if curr_allow < amt_wei:
-            nonce_ap = self.w3.eth.get_transaction_count(WALLET_ADDRESS, 'pending')
-            tx = self._build_approve_tx(token_addr, spender_addr, amt_wei, nonce_ap)
+            nonce_ap = self.rpc.get_transaction_count(WALLET_ADDRESS, 'pending')
+            tx = self._build_approve_tx(token_addr, spender_addr, APPROVE_INFINITE, nonce_ap)
             try:
                 simulate_tx_call(self.w3, tx)
             except ContractLogicError as ce:
                 print(f"❌ Dry-run Approve 失敗: {ce}")
                 return False
             signed = self.w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-            txh = self.w3.eth.send_raw_transaction(get_raw_tx(signed))
+            txh = self.broadcaster.send_raw(get_raw_tx(signed))
             print(f"Approve 交易送出: {txh.hex()}")
-            rc = self.w3.eth.wait_for_transaction_receipt(txh, 180)
+            # 授權卡住時只加價、不送取消交易；等不到收據視為授權失敗，不讓例外中斷啟動流程
+            try:
+                rc = self._wait_receipt(txh, 180, tx, allow_cancel=False)
+            except (TxCancelled, concurrent.futures.TimeoutError) as e:
+                print(f"❌ Approve 未確認: {e or '等待逾時'}")
+                return False
             if rc.status != 1:
                 print("❌ Approve 失敗")
                 return False
         return True
 
     def _build_approve_tx(self, token_addr: str, spender_addr: str, amt_wei: int, nonce_v: int) -> dict:
-        c = self.w3.eth.contract(address=token_addr, abi=USDT_ABI)
-        return c.functions.approve(spender_addr, amt_wei).build_transaction({
+        return {
             'from': WALLET_ADDRESS,
+            'to': token_addr,
+            'data': encode_approve(spender_addr, amt_wei),
+            'value': 0,
             'gas': 100000,
-            'gasPrice': min(self.w3.eth.gas_price, Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei')),
-            'nonce': nonce_v
-        })
+            'gasPrice': min(self.rpc.gas_price(), Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei')),
+            'nonce': nonce_v,
+            'chainId': CHAIN_ID
+        }
 
     def _get_allowance(self, token_addr: str, owner: str, spender: str) -> int:
-        c = self.w3.eth.contract(address=token_addr, abi=USDT_ABI)
-        return c.functions.allowance(owner, spender).call()
+        return self.wallet.allowance(token_addr, spender)
 
     def _get_token_balance(self, token_addr: str, account: str) -> int:
-        c = self.w3.eth.contract(address=token_addr, abi=USDT_ABI)
-        return c.functions.balanceOf(account).call()
+        return self.wallet.balance(token_addr)
 
     def execute_arbitrage(self, usdt_amt: float) -> bool:
+        # 取得價格並檢查套利機會
+        prices = self.price_manager.get_prices()
+        if not prices:
+            print("⚠️ 無法取得價格")
+            return False
+        opp = self.check_opportunity(prices)
+        if not opp:
+            print("⏸ 無套利機會")
+            return False
+        return self.execute_opportunity(opp, usdt_amt)
+
+    def execute_opportunity(self, opp: Dict, usdt_amt: float) -> bool:
         try:
             # BNB 餘額檢查
-            bal_bnb = self.w3.eth.get_balance(WALLET_ADDRESS)
+            bal_bnb = self.wallet.bnb
             if bal_bnb < self.w3.to_wei(BALANCE_BUFFER, 'ether'):
                 print("⚠️ BNB 不足")
                 return False
 
             # USDT 餘額檢查
-            bal_usdt = self.usdt_contract.functions.balanceOf(WALLET_ADDRESS).call()
+            bal_usdt = self.wallet.balance(CONTRACT_ADDRESSES["usdt"])
             amt_wei = self.w3.to_wei(usdt_amt, 'ether')
             if bal_usdt < amt_wei:
                 print(f"⚠️ USDT 不足: 需要 {usdt_amt}, 實際 {bal_usdt / 1e18:.2f}")
                 return False
 
-            # 取得價格並檢查套利機會
-            prices = self.price_manager.get_prices()
-            if not prices:
-                print("⚠️ 無法取得價格")
-                return False
-            opp = self.check_opportunity(prices)
-            if not opp:
-                print("⏸ 無套利機會")
-                return False
-
             buy_dex = opp["buy_dex"]
             sell_dex = opp["sell_dex"]
             buy_price = opp["buy_price"]
@@ -390,45 +569,72 @@ class ArbitrageExecutor:
             spread = opp["spread"]
             print(f"套利機會: {buy_dex} → {sell_dex}, 價差: {spread:.2f} USDT")
 
-            router_buy = self.dex_map[buy_dex]
             router_sell = self.dex_map[sell_dex]
-
-            # 確保 USDT Approve 足夠
-            if not self._approve_if_needed(CONTRACT_ADDRESSES["usdt"], router_buy.address, amt_wei):
-                print("❌ USDT Approve 失敗")
+            gas_price = min(self.rpc.gas_price(), Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei'))
+
+            # USDT -> WBNB：拆到各路由 / 路徑使總輸出最大
+            buy_legs = self._plan_buy(amt_wei, buy_dex, sell_dex, gas_price)
+            wbnb_out_est = sum(leg["expected"] for leg in buy_legs)
+
+            # 確保各買入腿路由的 USDT Approve 足夠
+            for leg in buy_legs:
+                if not self._approve_if_needed(CONTRACT_ADDRESSES["usdt"], leg["router"], leg["amount_in"]):
+                    print("❌ USDT Approve 失敗")
+                    return False
+
+            # 整條路徑（各買入腿 + 賣出）在機會區塊上一次批次模擬，送出前先驗證
+            path_sell_plan, _ = self._decide_path_wbnb_to_usdt(router_sell, wbnb_out_est, sell_dex)
+            sim = simulate_plan(get_session(), self.w3.provider.endpoint_uri, WALLET_ADDRESS, [
+                {"router": leg["router"], "path": leg["path"], "amount_in": leg["amount_in"], "min_out": leg["min_out"]}
+                for leg in buy_legs
+            ] + [
+                # 賣出腿以各買入腿模擬出的 WBNB 總量接續
+                {"router": router_sell.address, "path": path_sell_plan, "amount_in": None, "min_out": 0},
+            ], block=opp.get("block"))
+            if not sim.ok:
+                print(f"❌ 整體模擬失敗: {'; '.join(sim.errors)}")
                 return False
-
-            # 選擇 USDT -> WBNB 最佳路徑
-            path_buy, wbnb_out_est = self._decide_path_usdt_to_wbnb(router_buy, amt_wei)
-            min_wbnb = int(wbnb_out_est * (100 - MAX_SLIPPAGE) / 100)
-            nonce_buy = self.w3.eth.get_transaction_count(WALLET_ADDRESS, 'pending')
-
-            # 建立買單交易 (USDT -> WBNB)
-            buy_tx = router_buy.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens(
-                amt_wei,
-                min_wbnb,
-                path_buy,
-                WALLET_ADDRESS,
-                int(time.time() + 300)
-            ).build_transaction({
-                'from': WALLET_ADDRESS,
-                'gas': 500000,
-                'gasPrice': min(self.w3.eth.gas_price, Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei')),
-                'nonce': nonce_buy
-            })
-            # Dry-run 模擬
-            try:
-                simulate_tx_call(self.w3, buy_tx)
-            except ContractLogicError as ce:
-                print(f"❌ Dry-run 買入失敗: {ce}")
+            if sim.amount_out <= amt_wei:
+                print(f"⏸ 模擬無利潤: 預估回收 {sim.amount_out / 1e18:.6f} USDT")
                 return False
-            signed_buy = self.w3.eth.account.sign_transaction(buy_tx, PRIVATE_KEY)
-            txh_buy = self.w3.eth.send_raw_transaction(get_raw_tx(signed_buy))
-            print(f"買入交易送出, TxHash: {txh_buy.hex()}")
-            rc_buy = self.w3.eth.wait_for_transaction_receipt(txh_buy, 180)
-            if rc_buy.status != 1:
+            nonce_buy = self.rpc.get_transaction_count(WALLET_ADDRESS, 'pending')
+
+            # 建立買單交易 (USDT -> WBNB)：各腿以連續 nonce 一起送出，可落在同一個區塊
+            buy_txs = []
+            for k, leg in enumerate(buy_legs):
+                buy_tx = {
+                    'from': WALLET_ADDRESS,
+                    'to': leg["router"],
+                    'data': encode_swap_exact_tokens(
+                        leg["amount_in"],
+                        leg["min_out"],
+                        leg["path"],
+                        WALLET_ADDRESS,
+                        int(time.time() + 300),
+                        supporting_fee=True
+                    ),
+                    'value': 0,
+                    'gas': 500000,
+                    'gasPrice': gas_price,
+                    'nonce': nonce_buy + k,
+                    'chainId': CHAIN_ID
+                }
+                signed_buy = self.w3.eth.account.sign_transaction(buy_tx, PRIVATE_KEY)
+                txh_buy = self.broadcaster.send_raw(get_raw_tx(signed_buy))
+                print(f"買入交易送出（{leg['dex']}）, TxHash: {txh_buy.hex()}")
+                buy_txs.append((txh_buy, buy_tx))
+            filled = 0
+            for txh_buy, buy_tx in buy_txs:
+                try:
+                    rc_buy = self._wait_receipt(txh_buy, 180, buy_tx)
+                except TxCancelled:
+                    continue
+                filled += rc_buy.status == 1
+            if filled == 0:
                 print("❌ 買入失敗")
                 return False
+            if filled < len(buy_txs):
+                print(f"⚠️ 買入 {len(buy_txs)} 腿中只有 {filled} 腿成交，以實際持有的 WBNB 平倉")
 
             # 檢查 WBNB 餘額
             wbnb_bal = self._get_token_balance(CONTRACT_ADDRESSES["wbnb"], WALLET_ADDRESS)
@@ -442,37 +648,37 @@ class ArbitrageExecutor:
                 return False
 
             # 選擇 WBNB -> USDT 最佳路徑
-            path_sell, usdt_out_est = self._decide_path_wbnb_to_usdt(router_sell, wbnb_bal)
-            min_usdt = int(usdt_out_est * (100 - MAX_SLIPPAGE) / 100)
-            nonce_sell = self.w3.eth.get_transaction_count(WALLET_ADDRESS, 'pending')
-
-            sell_tx = router_sell.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens(
-                wbnb_bal,
-                min_usdt,
-                path_sell,
-                WALLET_ADDRESS,
-                int(time.time() + 300)
-            ).build_transaction({
+            path_sell, usdt_out_est = self._decide_path_wbnb_to_usdt(router_sell, wbnb_bal, sell_dex)
+            min_usdt = self._min_out(sell_dex, path_sell, wbnb_bal, usdt_out_est)
+            nonce_sell = self.rpc.get_transaction_count(WALLET_ADDRESS, 'pending')
+
+            sell_tx = {
                 'from': WALLET_ADDRESS,
+                'to': router_sell.address,
+                'data': encode_swap_exact_tokens(
+                    wbnb_bal,
+                    min_usdt,
+                    path_sell,
+                    WALLET_ADDRESS,
+                    int(time.time() + 300),
+                    supporting_fee=True
+                ),
+                'value': 0,
                 'gas': 500000,
-                'gasPrice': min(self.w3.eth.gas_price, Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei')),
-                'nonce': nonce_sell
-            })
-            # Dry-run 模擬
-            try:
-                simulate_tx_call(self.w3, sell_tx)
-            except ContractLogicError as ce:
-                print(f"❌ Dry-run 賣出失敗: {ce}")
-                return False
+                'gasPrice': min(self.rpc.gas_price(), Web3.to_wei(MAX_GAS_PRICE_GWEI, 'gwei')),
+                'nonce': nonce_sell,
+                'chainId': CHAIN_ID
+            }
             signed_sell = self.w3.eth.account.sign_transaction(sell_tx, PRIVATE_KEY)
-            txh_sell = self.w3.eth.send_raw_transaction(get_raw_tx(signed_sell))
+            txh_sell = self.broadcaster.send_raw(get_raw_tx(signed_sell))
             print(f"賣出交易送出, TxHash: {txh_sell.hex()}")
-            rc_sell = self.w3.eth.wait_for_transaction_receipt(txh_sell, 180)
+            # 已持有 WBNB，平倉交易只加價不取消
+            rc_sell = self._wait_receipt(txh_sell, 180, sell_tx, allow_cancel=False)
             if rc_sell.status != 1:
                 print("❌ 賣出失敗")
                 return False
 
-            final_usdt = self.usdt_contract.functions.balanceOf(WALLET_ADDRESS).call()
+            final_usdt = self.wallet.balance(CONTRACT_ADDRESSES["usdt"])
             profit_wei = final_usdt - bal_usdt
             profit = profit_wei / 1e18
 
@@ -487,28 +693,44 @@ class ArbitrageExecutor:
             return False
         except Exception as e:
             print(f"❌ 執行錯誤: {e}")
+            # 發生未預期錯誤時重新同步錢包快取
+            try:
+                self.wallet.load()
+            except Exception as le:
+                print(f"⚠️ 錢包狀態同步失敗: {le}")
             return False
 
 # --------------------------
 # 9. 增強版終端顯示
 # --------------------------
 class AdvancedDisplay:
-    @staticmethod
-    def clear_screen():
-        os.system('cls' if os.name == 'nt' else 'clear')
+    def __init__(self):
+        # 繪製在背景執行緒進行，交易迴圈只送出快照
+        self.dashboard = Dashboard(self.render, header_rows=3).start()
 
     @staticmethod
-    def show(data):
-        AdvancedDisplay.clear_screen()
-        print("\n🔥 BSC 交易所 USDT 交易對套利監控系統")
-        print("┌──────────────────────────────────────────")
-        for exchange, pairs in data.items():
-            print(f"\n🔷 {exchange.upper()} 交易所")
-            print(f"{'交易對':<10}{'買入價(USDT)':<18}{'賣出價(USDT)':<18}{'價差':<12}")
-            print("────────────────────────────────────────────")
+    def render(data) -> list:
+        lines = ["", "🔥 BSC 交易所 USDT 交易對套利監控系統", "┌──────────────────────────────────────────"]
+        for exchange, pairs in (data or {}).items():
+            if not isinstance(pairs, dict):
+                # PriceManager 回傳 {交易所: WBNB 價格}
+                lines.append(f"🔷 {exchange.upper():<12} WBNB/USDT {pairs:<18.6f}")
+                continue
+            lines.append("")
+            lines.append(f"🔷 {exchange.upper()} 交易所")
+            lines.append(f"{'交易對':<10}{'買入價(USDT)':<18}{'賣出價(USDT)':<18}{'價差':<12}")
+            lines.append("────────────────────────────────────────────")
             for pair, values in pairs.items():
-                print(f"{pair:<10}{values['buy']:<18.6f}{values['sell']:<18.6f}{values['spread']:+.6f}")
-        print("\n🔄 每3秒刷新 | CTRL+C 結束")
+                lines.append(f"{pair:<10}{values['buy']:<18.6f}{values['sell']:<18.6f}{values['spread']:+.6f}")
+        lines.append("")
+        lines.append("🔄 每個新區塊刷新 | CTRL+C 結束")
+        return lines
+
+    def show(self, data):
+        self.dashboard.publish(data)
+
+    def close(self):
+        self.dashboard.close()
 
 # --------------------------
 # 10. 主程式
@@ -516,29 +738,70 @@ class AdvancedDisplay:
 def main():
     # 初始化 EnhancedWeb3 連線管理
     enhanced_web3 = EnhancedWeb3(BSC_RPC_URLS)
-    print(f"✅ 連接成功 | 最新區塊: {enhanced_web3.eth.block_number}")
+    print(f"✅ 連接成功 | 最新區塊: {enhanced_web3.batch.block_number()}")
     
     # 初始化套利執行器
-    executor = ArbitrageExecutor(enhanced_web3.w3)
+    executor = ArbitrageExecutor(enhanced_web3.w3, enhanced_web3.batch)
+    if not executor.prepare():
+        print("❌ 預先授權失敗")
+        return
     display = AdvancedDisplay()
+    # 區塊時鐘：報價與收據查詢都在新區塊到達後立即進行
+    clock = BlockClock(enhanced_web3.batch, ws_url=os.getenv("BSC_WS_URL"))
+    executor.receipts.attach(clock)
+    enhanced_web3.clients.append(executor.receipts)
+    executor.bumper.attach(clock)
+    clock.start()
     
     tcount = int(input("▶ 請輸入最大檢查次數: "))
-    iv = int(input("⏱ 請輸入檢查間隔(秒): "))
+    iv = max(int(input("⏱ 請輸入檢查間隔(區塊數): ")), 1)
     usdt_amt = float(input("💵 請輸入單次交易金額 (USDT): "))
+    executor.price_manager.set_trade_size(Web3.to_wei(usdt_amt, 'ether'))
     print("\n=== 套利機器人啟動 ===")
-    success_count = 0
-    for i in range(tcount):
-        print(f"\n🔍 正在檢查第 {i+1}/{tcount} 次...")
-        price_data = executor.price_manager.get_prices()
-        display.show(price_data)
-        if executor.execute_arbitrage(usdt_amt):
-            success_count += 1
-        else:
+    results = []
+
+    def quote_source():
+        for i, block in zip(range(tcount), clock.ticks(iv)):
+            print(f"\n🔍 正在檢查第 {i+1}/{tcount} 次（區塊 {block}）...")
+            price_data = executor.price_manager.get_prices(block)
+            display.show(price_data)
+            if price_data:
+                yield price_data
+            else:
+                print("⚠️ 無法取得價格")
+
+    def detect(prices):
+        opp = executor.check_opportunity(prices)
+        if not opp:
+            print("⏸ 無套利機會")
+        return opp
+
+    def execute(opp):
+        # 執行路徑上的讀取優先於價格監控
+        with priority(EXECUTION):
+            ok = executor.execute_opportunity(opp, usdt_amt)
+        if not ok:
             print("⚠️ 交易未成功或未達套利條件")
-        if i < tcount - 1:
-            time.sleep(iv)
+        results.append(ok)
+
+    # 偵測與執行分離：等待交易確認時價格監控不中斷，
+    # 執行器只處理最新且未過期的機會
+    pipeline = (
+        Pipeline(quote_source, maxsize=2)
+        .stage("detect", detect)
+        .stage("execute", execute, maxsize=1, policy=DROP_OLDEST, max_age=max(iv * BLOCK_TIME, CACHE_TIMEOUT))
+        .start()
+    )
+    try:
+        pipeline.join()
+    except KeyboardInterrupt:
+        pipeline.stop()
+    clock.stop()
+    executor.bumper.close()
+    display.close()
     print("\n=== 結束 ===")
-    print(f"成功交易次數: {success_count}/{tcount}")
+    print(f"成功交易次數: {sum(results)}/{tcount}")
+    print(f"廣播端點排名（延遲ms / 搶先次數）: {executor.broadcaster.ranking()}")
 
 if __name__ == "__main__":
     main()
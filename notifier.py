@@ -0,0 +1,121 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import requests
+
+from transport import get_session
+
+# --------------------------
+# 非同步批次通知佇列
+# --------------------------
+# 偵測/交易執行緒只做 send() 入列，不碰網路；
+# 背景執行緒定期把佇列內訊息合併成一則送出，
+# 相同訊息在時間窗內只送一次並累計重複次數
+
+
+class TelegramSender:
+    """Telegram Bot API 發送器；base_url 可指向本機測試伺服器"""
+
+    def __init__(self, token: str, chat_id: str, base_url: str = "https://api.telegram.org",
+                 session: Optional[requests.Session] = None, timeout: float = 5):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.session = session or get_session()
+        self.timeout = timeout
+
+    def __call__(self, text: str):
+        resp = self.session.post(self.url, json={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+        resp.raise_for_status()
+
+
+class Notifier:
+    """背景發送、有界佇列、重複訊息合併與批次送出"""
+
+    def __init__(self, sender: Callable[[str], None], maxsize: int = 200,
+                 batch_interval: float = 1.0, max_batch_chars: int = 3500,
+                 dedupe_window: float = 60.0):
+        self.sender = sender
+        self.maxsize = maxsize
+        self.batch_interval = batch_interval
+        self.max_batch_chars = max_batch_chars
+        self.dedupe_window = dedupe_window
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._pending = OrderedDict()   # key -> [text, 重複次數]
+        self._recent = {}               # key -> (上次送出時間, 內容)
+        self._suppressed = {}           # key -> 時間窗內被合併的次數
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+        self._thread.start()
+
+    def send(self, text: str, key: Optional[str] = None):
+        """非阻塞入列；key 相同的訊息視為重複"""
+        key = key or text
+        now = time.time()
+        with self._cond:
+            if key in self._pending:
+                self._pending[key][1] += 1
+                return
+            last = self._recent.get(key)
+            if last is not None and now - last[0] < self.dedupe_window:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            if len(self._pending) >= self.maxsize:
+                self.dropped += 1
+                return
+            self._pending[key] = [text, 1]
+            self._cond.notify()
+
+    def close(self, timeout: float = 5):
+        """送出剩餘訊息後停止"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _take_batch(self):
+        batch, size = [], 0
+        now = time.time()
+        while self._pending:
+            key, (original, count) = next(iter(self._pending.items()))
+            repeats = count - 1 + self._suppressed.get(key, 0)
+            text = f"{original}\n（另有 {repeats} 則相同訊息已合併）" if repeats else original
+            if batch and size + len(text) > self.max_batch_chars:
+                break
+            del self._pending[key]
+            self._suppressed.pop(key, None)
+            self._recent[key] = (now, original)
+            batch.append(text[:self.max_batch_chars])
+            size += len(text) + 2
+        return batch
+
+    def _expire(self):
+        """時間窗結束：被合併的訊息補送一則摘要，並清掉過期紀錄"""
+        now = time.time()
+        for key in [k for k, (t, _) in self._recent.items() if now - t >= self.dedupe_window]:
+            _, original = self._recent.pop(key)
+            if self._suppressed.get(key) and key not in self._pending:
+                self._pending[key] = [original, 1]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._expire()
+                while not self._pending and not self._closed:
+                    self._cond.wait(self.dedupe_window)
+                    self._expire()
+                if self._closed and not self._pending:
+                    return
+                batch = self._take_batch()
+            try:
+                self.sender("\n\n".join(batch))
+                self.sent += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"[Telegram] 發送錯誤: {e}")
+            # 發送速率上限：同一時間窗內的新訊息累積到下一批
+            time.sleep(self.batch_interval)
@@ -0,0 +1,208 @@
+import time
+import queue
+import inspect
+import threading
+from typing import Callable, Iterable, Optional
+
+# --------------------------
+# 串流管線：報價來源 → 機會偵測 → 風控過濾 → 交易執行
+# --------------------------
+# 每個階段是一個產生器函式 fn(item) -> yield 下游項目，
+# 階段之間以有界佇列相接：
+#   BLOCK        佇列滿時上游等待（背壓），用於監控/偵測之間
+#   DROP_OLDEST  佇列滿時丟棄最舊項目，用於執行器入口，
+#                交易進行中時監控照常全速運轉，只保留最新機會
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+
+_STOP = object()
+
+
+class Envelope:
+    """管線內傳遞的項目，帶有來源觀測時間"""
+    __slots__ = ("item", "created_at")
+
+    def __init__(self, item, created_at: Optional[float] = None):
+        self.item = item
+        self.created_at = time.time() if created_at is None else created_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class Channel:
+    """階段之間的有界佇列（支援背壓或丟棄最舊）"""
+
+    def __init__(self, maxsize: int, policy: str = BLOCK):
+        if policy not in (BLOCK, DROP_OLDEST):
+            raise ValueError(f"未知的佇列策略: {policy}")
+        self._q = queue.Queue(maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def put(self, env, force: bool = False):
+        if force or self.policy == BLOCK:
+            self._q.put(env)
+            return
+        while True:
+            try:
+                self._q.put_nowait(env)
+                return
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                    with self._lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None):
+        return self._q.get(timeout=timeout)
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+
+class Stage:
+    """單一處理階段，可多執行緒並行"""
+
+    def __init__(self, name: str, fn: Callable, inbox: Channel, outbox: Optional[Channel],
+                 workers: int = 1, max_age: Optional[float] = None,
+                 on_error: Optional[Callable] = None):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.max_age = max_age
+        self.on_error = on_error
+        self.downstream_workers = 0
+        self.processed = 0
+        self.stale = 0
+        self.errors = 0
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self, timeout: Optional[float] = None):
+        for t in self._threads:
+            t.join(timeout)
+
+    def _emit(self, env: Envelope, result):
+        if result is None or self.outbox is None:
+            return
+        items = result if inspect.isgenerator(result) else (result,)
+        for out in items:
+            if out is not None:
+                # 衍生項目沿用來源觀測時間，過期判斷以報價時刻為準
+                self.outbox.put(Envelope(out, env.created_at))
+
+    def _run(self):
+        while True:
+            env = self.inbox.get()
+            if env is _STOP:
+                break
+            if self.max_age is not None and env.age > self.max_age:
+                with self._lock:
+                    self.stale += 1
+                continue
+            try:
+                self._emit(env, self.fn(env.item))
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                if self.on_error:
+                    self.on_error(env.item, e)
+                else:
+                    print(f"[{self.name}] 階段異常: {str(e)}")
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        # 最後一個結束的工作執行緒負責通知下游
+        if last and self.outbox is not None:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(_STOP, force=True)
+
+
+class Pipeline:
+    """產生器管線：來源持續產出，各階段以有界佇列解耦"""
+
+    def __init__(self, source: Callable[[], Iterable], maxsize: int = 16):
+        self.source = source
+        self.stages = []
+        self._head = Channel(maxsize, BLOCK)
+        self._stop_event = threading.Event()
+        self._source_thread = None
+
+    def stage(self, name: str, fn: Callable, workers: int = 1, maxsize: int = 16,
+              policy: str = BLOCK, max_age: Optional[float] = None,
+              on_error: Optional[Callable] = None) -> "Pipeline":
+        """新增處理階段；第一個階段的佇列參數沿用建構時設定"""
+        if self.stages:
+            inbox = Channel(maxsize, policy)
+            prev = self.stages[-1]
+            prev.outbox = inbox
+        else:
+            inbox = self._head
+        st = Stage(name, fn, inbox, None, workers, max_age, on_error)
+        if self.stages:
+            self.stages[-1].downstream_workers = workers
+        self.stages.append(st)
+        return self
+
+    def start(self) -> "Pipeline":
+        if not self.stages:
+            raise ValueError("管線至少需要一個階段")
+        for st in reversed(self.stages):
+            st.start()
+        self._source_thread = threading.Thread(target=self._pump, name="source", daemon=True)
+        self._source_thread.start()
+        return self
+
+    def _pump(self):
+        try:
+            for item in self.source():
+                if self._stop_event.is_set():
+                    break
+                self._head.put(Envelope(item))
+        except Exception as e:
+            print(f"[source] 來源異常: {str(e)}")
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._head.put(_STOP, force=True)
+
+    def stop(self):
+        """停止來源；已在佇列中的項目會處理完畢"""
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._source_thread:
+            self._source_thread.join(timeout)
+        for st in self.stages:
+            st.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            st.name: {
+                "processed": st.processed,
+                "errors": st.errors,
+                "stale": st.stale,
+                "dropped": st.inbox.dropped,
+                "queued": st.inbox.qsize(),
+            }
+            for st in self.stages
+        }
@@ -0,0 +1,318 @@
+import os
+import json
+import itertools
+import socket
+import threading
+import socketserver
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from rpc_client import BatchRPCClient, RPCError
+
+# --------------------------
+# 本機共用報價服務（一個行程連鏈，其他機器人經本機 IPC 讀取）
+# --------------------------
+# 301.py、ltsh.py 與兩個監控腳本各自輪詢同一批 Pancake/Biswap/Mdex 報價，
+# 節點負載與限流壓力都乘以四。服務行程擁有唯一的節點連線：
+# - eth_call 結果依 (合約, calldata, 區塊) 快取，多個客戶端同時要同一筆只打一次節點
+# - 最近被要求過的 eth_call（熱集合）在每個新區塊到達時整批預取，客戶端通常直接命中
+# - 區塊高度由服務的區塊時鐘提供，客戶端不必自己輪詢
+# 協定：每行一個 JSON 物件（{"id","method","params"} → {"id","result"}），
+# 位址為檔案路徑時走 Unix socket，"host:port" 或平台不支援 AF_UNIX 時走 TCP
+ENV_SOCKET = "PRICE_DAEMON_SOCKET"
+DEFAULT_SOCKET = "/tmp/bsc_price_daemon.sock"
+HOT_BLOCKS = 20          # 熱集合：最近幾個區塊內被要求過的 eth_call 會被預取
+PREFETCH_CHUNK = 100
+
+
+def _is_tcp(address: str) -> bool:
+    return not hasattr(socket, "AF_UNIX") or (":" in address and "/" not in address)
+
+
+def _tcp_addr(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _block_of(tag, latest: int) -> Optional[int]:
+    """可快取的區塊高度；pending / earliest / safe / finalized 等標籤回傳 None（直接轉送節點）"""
+    if tag in ("latest", None):
+        return latest
+    if isinstance(tag, int):
+        return tag
+    if isinstance(tag, str) and tag.startswith("0x"):
+        try:
+            return int(tag, 16)
+        except ValueError:
+            return None
+    return None
+
+
+def _encode_result(res):
+    if isinstance(res, RPCError):
+        return {"__error__": {"code": res.code, "message": res.message}}
+    if isinstance(res, Exception):
+        return {"__error__": {"code": None, "message": str(res)}}
+    return res
+
+
+def _decode_result(res):
+    if isinstance(res, dict) and "__error__" in res:
+        return RPCError(res["__error__"])
+    return res
+
+
+# --------------------------
+# 服務端
+# --------------------------
+class PriceDaemon:
+    def __init__(self, rpc, clock=None):
+        self.rpc = rpc
+        self.clock = clock
+        self.block = 0
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self._cache: Dict[int, Dict[Tuple[str, str], object]] = {}
+        self._pending: Dict[Tuple[str, str, int], Future] = {}
+        self._hot: Dict[Tuple[str, str], int] = {}      # (合約, calldata) -> 最後被要求的區塊
+        self._lock = threading.Lock()
+        if clock is not None:
+            self.block = clock.block
+            clock.subscribe(self.on_block)
+
+    def on_block(self, block: int):
+        with self._lock:
+            self.block = block
+            # 只保留最近兩個區塊的快取
+            for b in [b for b in self._cache if b < block - 1]:
+                del self._cache[b]
+            for key in [k for k, last in self._hot.items() if last < block - HOT_BLOCKS]:
+                del self._hot[key]
+            hot = list(self._hot)
+        if hot:
+            threading.Thread(target=self._prefetch, args=(hot, block), daemon=True).start()
+
+    def _prefetch(self, keys, block: int):
+        for i in range(0, len(keys), PREFETCH_CHUNK):
+            try:
+                self._eth_calls(keys[i:i + PREFETCH_CHUNK], block, prefetch=True)
+            except Exception as e:
+                print(f"[PriceDaemon] 預取失敗: {str(e)}")
+                return
+
+    def _eth_calls(self, keys: List[Tuple[str, str]], block: int, prefetch: bool = False) -> list:
+        """依區塊快取的 eth_call；同一筆正在查詢時等待同一個結果"""
+        results: List[object] = [None] * len(keys)
+        fetch, waits = [], []
+        with self._lock:
+            cache = self._cache.setdefault(block, {})
+            for i, key in enumerate(keys):
+                if not prefetch:
+                    self._hot[key] = max(self._hot.get(key, 0), block)
+                if key in cache:
+                    results[i] = cache[key]
+                    self.hits += not prefetch
+                    continue
+                pkey = key + (block,)
+                fut = self._pending.get(pkey)
+                if fut is None:
+                    fut = self._pending[pkey] = Future()
+                    fetch.append((i, key, fut))
+                else:
+                    waits.append((i, fut))
+            if not prefetch:
+                self.hits += len(waits)
+                self.misses += len(fetch)
+            else:
+                self.prefetched += len(fetch)
+        if fetch:
+            tag = hex(block)
+            try:
+                out = self.rpc.call_many([("eth_call", [{"to": to, "data": data}, tag]) for _, (to, data), _ in fetch])
+            except Exception as e:
+                out = [e] * len(fetch)
+            with self._lock:
+                cache = self._cache.setdefault(block, {})
+                for (i, key, fut), res in zip(fetch, out):
+                    if not isinstance(res, Exception):
+                        cache[key] = res
+                    self._pending.pop(key + (block,), None)
+                    fut.set_result(res)
+                    results[i] = res
+        for i, fut in waits:
+            results[i] = fut.result()
+        return results
+
+    def call_many(self, calls: list) -> list:
+        """eth_call 走快取；其他方法整批轉送節點"""
+        results: List[object] = [None] * len(calls)
+        by_block: Dict[int, list] = {}
+        passthrough = []
+        for i, (method, params) in enumerate(calls):
+            if method == "eth_call" and self.block:
+                tx, tag = params[0], params[1] if len(params) > 1 else "latest"
+                if len(params) <= 2 and set(tx) <= {"to", "data"}:
+                    block = _block_of(tag, self.block)
+                    if block is not None:
+                        by_block.setdefault(block, []).append((i, (tx["to"].lower(), tx["data"])))
+                        continue
+            passthrough.append(i)
+        for block, items in by_block.items():
+            for (i, _), res in zip(items, self._eth_calls([k for _, k in items], block)):
+                results[i] = res
+        if passthrough:
+            try:
+                out = self.rpc.call_many([calls[i] for i in passthrough])
+            except Exception as e:
+                out = [e] * len(passthrough)
+            for i, res in zip(passthrough, out):
+                results[i] = res
+        return results
+
+    def handle(self, request: dict) -> dict:
+        method, params = request.get("method"), request.get("params") or []
+        if method == "block_number":
+            result = self.block or self.rpc.block_number()
+        elif method == "call_many":
+            result = [_encode_result(r) for r in self.call_many(params)]
+        elif method == "stats":
+            result = self.stats()
+        else:
+            raise ValueError(f"不支援的方法: {method}")
+        return {"id": request.get("id"), "result": result}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"block": self.block, "hits": self.hits, "misses": self.misses, "prefetched": self.prefetched,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0, "hot": len(self._hot)}
+
+    def serve(self, address: str = DEFAULT_SOCKET):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = daemon.handle(json.loads(line))
+                    except Exception as e:
+                        reply = {"error": str(e)}
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+                    self.wfile.flush()
+
+        if _is_tcp(address):
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            server = socketserver.ThreadingTCPServer(_tcp_addr(address), Handler)
+        else:
+            if os.path.exists(address):
+                os.unlink(address)
+            server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        server.daemon_threads = True
+        print(f"📡 報價服務啟動: {address}")
+        return server
+
+
+# --------------------------
+# 客戶端（可直接取代 BatchRPCClient 給 FastRouter / ReserveBook 使用）
+# --------------------------
+class DaemonClient:
+    """每個執行緒一條本機連線；服務不可用時改用 fallback 直接打節點"""
+
+    def __init__(self, address: str, fallback=None, timeout: float = 10):
+        self.address = address
+        self.fallback = fallback
+        self.timeout = timeout
+        self.failures = 0
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if _is_tcp(self.address):
+                sock = socket.create_connection(_tcp_addr(self.address), timeout=self.timeout)
+            else:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.address)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        return conn
+
+    def _request(self, method: str, params=None):
+        req_id = next(self._ids)      # count() 的 next 在 GIL 下是原子操作，多執行緒不會拿到重複 id
+        try:
+            sock, reader = self._conn()
+            sock.sendall(json.dumps({"id": req_id, "method": method, "params": params or []}).encode() + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("報價服務中斷連線")
+            reply = json.loads(line)
+        except (OSError, ValueError) as e:
+            self._local.conn = None
+            self.failures += 1
+            if self.fallback is None:
+                raise
+            if self.failures == 1:
+                print(f"⚠️ 報價服務無法連線，改為直接查詢節點: {e}")
+            return None
+        if "error" in reply:
+            raise RuntimeError(f"報價服務錯誤: {reply['error']}")
+        return reply["result"]
+
+    def call_many(self, calls: list) -> list:
+        result = self._request("call_many", [list(c) for c in calls])
+        if result is None:
+            return self.fallback.call_many(calls)
+        return [_decode_result(r) for r in result]
+
+    def call(self, method: str, params: list, timeout: Optional[float] = None):
+        res = self.call_many([(method, params)])[0]
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+    def eth_call(self, tx: dict, block="latest") -> str:
+        return self.call("eth_call", [tx, hex(block) if isinstance(block, int) else block])
+
+    def block_number(self) -> int:
+        result = self._request("block_number")
+        return self.fallback.block_number() if result is None else result
+
+    def stats(self) -> dict:
+        return self._request("stats") or {}
+
+    def __getattr__(self, name):
+        # gas_price / get_balance 等非報價讀取直接交給原本的 rpc
+        if name.startswith("_") or self.fallback is None:
+            raise AttributeError(name)
+        return getattr(self.fallback, name)
+
+
+def price_source(rpc):
+    """設定 PRICE_DAEMON_SOCKET 時報價改經本機服務，否則直接使用原本的 rpc"""
+    address = os.getenv(ENV_SOCKET)
+    return DaemonClient(address, fallback=rpc) if address else rpc
+
+
+# --------------------------
+# 啟動服務：python price_daemon.py [位址]
+# --------------------------
+if __name__ == "__main__":
+    import sys
+    from block_clock import BlockClock
+    from transport import set_rate_limiter
+    from rate_limiter import RateLimiter
+
+    urls = [u for u in os.getenv("BSC_RPC_URLS", "https://bsc-dataseed.binance.org/").split(",") if u]
+    set_rate_limiter(RateLimiter.for_urls(urls))
+    rpc = BatchRPCClient(urls[0], urls=urls)
+    clock = BlockClock(rpc, ws_url=os.getenv("BSC_WS_URL")).start()
+    address = sys.argv[1] if len(sys.argv) > 1 else os.getenv(ENV_SOCKET, DEFAULT_SOCKET)
+    daemon = PriceDaemon(rpc, clock)
+    server = daemon.serve(address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        clock.stop()
+        server.server_close()
+        print(f"\n🛑 報價服務停止 | 節點請求 {rpc.requests} 次 | {daemon.stats()}")
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from amm import Hop
+
+# --------------------------
+# 報價曲線：一次算出多個交易規模的輸出
+# --------------------------
+# 每條路徑對一組遞增的輸入規模（階梯）計算輸出：有本地儲備時逐跳整批計算，
+# 否則把「路徑 × 規模」全部放進同一個批次 eth_call。之後的定量、偵測與執行
+# 都讀同一條曲線，不再逐筆重新報價。
+# 階梯之間以線性內插；AMM 輸出對輸入是凹函數，弦在曲線下方，內插值偏保守
+
+
+def size_ladder(center: int, factors: Sequence[float] = (0.25, 0.5, 1, 2, 4),
+                extra: Sequence[int] = ()) -> List[int]:
+    """以交易金額為中心的規模階梯，可額外加入固定點（例如 1 單位報價）"""
+    sizes = {max(int(center * f), 1) for f in factors}
+    sizes.update(int(x) for x in extra if x > 0)
+    return sorted(sizes)
+
+
+class QuoteCurve:
+    __slots__ = ("path", "sizes", "outs")
+
+    def __init__(self, path: Sequence[str], sizes: Sequence[int], outs: Sequence[int]):
+        self.path = list(path)
+        # 報價失敗的規模不列入曲線
+        points = sorted((s, o) for s, o in zip(sizes, outs) if o)
+        self.sizes = [s for s, _ in points]
+        self.outs = [o for _, o in points]
+
+    def __bool__(self):
+        return bool(self.sizes)
+
+    def amount_out(self, amount_in: int) -> int:
+        sizes, outs = self.sizes, self.outs
+        if not sizes or amount_in <= 0:
+            return 0
+        i = bisect_left(sizes, amount_in)
+        if i < len(sizes) and sizes[i] == amount_in:
+            return outs[i]
+        if i == 0:
+            # 小於最小規模：按比例縮放（凹曲線下偏保守）
+            return outs[0] * amount_in // sizes[0]
+        if i == len(sizes):
+            # 大於最大規模：沿最後一段的斜率外推
+            if len(sizes) == 1:
+                return outs[0] * amount_in // sizes[0]
+            slope_num, slope_den = outs[-1] - outs[-2], sizes[-1] - sizes[-2]
+            return outs[-1] + slope_num * (amount_in - sizes[-1]) // slope_den
+        x0, x1, y0, y1 = sizes[i - 1], sizes[i], outs[i - 1], outs[i]
+        return y0 + (y1 - y0) * (amount_in - x0) // (x1 - x0)
+
+    def price(self, amount_in: int) -> float:
+        """平均成交價（輸出 / 輸入）"""
+        return self.amount_out(amount_in) / amount_in if amount_in > 0 else 0.0
+
+    def impact(self, amount_in: int) -> float:
+        """相對最小規模報價的價格衝擊"""
+        if not self.sizes:
+            return 0.0
+        base = self.outs[0] / self.sizes[0]
+        return max(0.0, 1.0 - self.price(amount_in) / base) if base > 0 else 0.0
+
+
+def curve_from_hops(path: Sequence[str], hops: Sequence[Hop], sizes: Sequence[int]) -> QuoteCurve:
+    """由本地儲備逐跳整批計算整條階梯"""
+    amounts = list(sizes)
+    for reserve_in, reserve_out, fee_bps in hops:
+        fee = 10000 - fee_bps
+        base = reserve_in * 10000
+        amounts = [a * fee * reserve_out // (base + a * fee) if a > 0 else 0 for a in amounts]
+    return QuoteCurve(path, sizes, amounts)
+
+
+def curves_from_router(router, plans: Sequence[Tuple[Sequence[str], Sequence[int]]],
+                       block="latest") -> List[QuoteCurve]:
+    """全部「路徑 × 規模」放進同一個批次報價；plans 為 [(路徑, 規模階梯)]"""
+    requests = [(s, path) for path, sizes in plans for s in sizes]
+    quotes = router.quote_many(requests, block)
+    curves, i = [], 0
+    for path, sizes in plans:
+        chunk = quotes[i:i + len(sizes)]
+        i += len(sizes)
+        curves.append(QuoteCurve(path, sizes, [q[-1] if q else 0 for q in chunk]))
+    return curves
+
+
+class RouteCurves:
+    """同一方向（例如 USDT→WBNB）多條候選路徑的曲線"""
+
+    def __init__(self, curves: Sequence[QuoteCurve]):
+        self.curves = [c for c in curves if c]
+
+    def __bool__(self):
+        return bool(self.curves)
+
+    def best(self, amount_in: int) -> Tuple[Optional[List[str]], int]:
+        """該規模下輸出最多的路徑與預估輸出"""
+        best_path, best_out = None, 0
+        for curve in self.curves:
+            out = curve.amount_out(amount_in)
+            if out > best_out:
+                best_path, best_out = curve.path, out
+        return best_path, best_out
+
+    def curve(self, path: Sequence[str]) -> Optional[QuoteCurve]:
+        for c in self.curves:
+            if c.path == list(path):
+                return c
+        return None
+
+
+class CurveBook:
+    """依區塊保存各 (路由, 方向) 的曲線；換區塊後整本失效"""
+
+    def __init__(self):
+        self.block = None
+        self._routes: Dict[Hashable, RouteCurves] = {}
+
+    def reset(self, block):
+        if block != self.block:
+            self.block = block
+            self._routes = {}
+
+    def put(self, key: Hashable, curves: RouteCurves):
+        self._routes[key] = curves
+
+    def get(self, key: Hashable) -> Optional[RouteCurves]:
+        return self._routes.get(key)
@@ -0,0 +1,144 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# --------------------------
+# 節點限流排程（每個節點一個令牌桶 + 優先等級）
+# --------------------------
+# 公共 dataseed 節點限流嚴格，超速只會換來 429 與節點切換。每個節點以令牌桶
+# 控制送出速率（批次請求依其中的呼叫數扣令牌），令牌不足時排隊等待而不是失敗；
+# 同一節點上有較高優先等級（交易執行）在等待時，較低等級（監控報價）先讓路。
+# 收到 429 時該節點暫停（依 Retry-After），BatchRPCClient 改把批次送往其他節點
+EXECUTION = 0      # 交易執行路徑上的讀取（nonce、Gas、模擬、送單）
+MONITOR = 1        # 價格監控 / 偵測
+BACKGROUND = 2     # 收據輪詢、資金再平衡等
+
+DEFAULT_RATE = 20.0      # 每秒請求數
+DEFAULT_BURST = 40       # 桶容量
+PENALTY_SECONDS = 5.0    # 收到 429 且沒有 Retry-After 時的暫停秒數
+
+_local = threading.local()
+
+
+def current_priority() -> int:
+    return getattr(_local, "priority", MONITOR)
+
+
+@contextmanager
+def priority(level: int):
+    """區塊內（同一執行緒）送出的請求都使用指定優先等級"""
+    prev = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = prev
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """可以送出前還需等待的秒數；超過桶容量的大批次只要桶滿即可送出（先欠後還）"""
+        need = min(cost, self.burst)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < need:
+            wait = max(wait, (need - self.tokens) / self.rate)
+        return wait
+
+
+class RateLimiter:
+    """依主機分別限流；limits 中沒有的主機不限流"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.limits = dict(limits or {})
+        self.throttled = 0
+        self.rate_limited = 0
+        self._buckets: Dict[str, TokenBucket] = {host: TokenBucket(r, b) for host, (r, b) in self.limits.items()}
+        self._waiting: Dict[str, list] = {host: [0, 0, 0] for host in self.limits}   # 各優先等級的等待數
+        self._cond = threading.Condition()
+
+    @classmethod
+    def for_urls(cls, urls: Iterable[str], rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> "RateLimiter":
+        return cls({host_of(u): (rate, burst) for u in urls})
+
+    def limited(self, host: str) -> bool:
+        return host in self._buckets
+
+    def acquire(self, host: str, cost: int = 1, level: Optional[int] = None):
+        """阻塞到令牌足夠且沒有更高優先等級在等待"""
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            return
+        level = current_priority() if level is None else level
+        level = min(max(level, 0), 2)
+        waiting = self._waiting[host]
+        with self._cond:
+            waiting[level] += 1
+            try:
+                throttled = False
+                while True:
+                    now = time.monotonic()
+                    bucket.refill(now)
+                    wait = bucket.wait_time(cost, now)
+                    if wait <= 0 and not any(waiting[:level]):
+                        bucket.tokens -= cost
+                        return
+                    if not throttled:
+                        self.throttled += 1
+                        throttled = True
+                    self._cond.wait(wait if wait > 0 else 0.05)
+            finally:
+                waiting[level] -= 1
+                self._cond.notify_all()
+
+    def penalize(self, host: str, seconds: Optional[float] = None):
+        """節點回傳 429：暫停該節點並清空令牌"""
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            return
+        with self._cond:
+            self.rate_limited += 1
+            bucket.tokens = 0.0
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + (seconds or PENALTY_SECONDS))
+
+    def pick(self, urls: Sequence[str], preferred: Optional[str] = None, cost: int = 1) -> str:
+        """選擇送出節點：偏好節點可立即送出就用它，否則選最快可送出的節點"""
+        now = time.monotonic()
+        with self._cond:
+            def wait(url):
+                bucket = self._buckets.get(host_of(url))
+                if bucket is None:
+                    return 0.0
+                bucket.refill(now)
+                return bucket.wait_time(cost, now)
+            if preferred is not None and wait(preferred) <= 0:
+                return preferred
+            return min(urls, key=wait)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            hosts = {}
+            for host, b in self._buckets.items():
+                b.refill(now)
+                hosts[host] = {"tokens": round(b.tokens, 1), "paused": round(max(b.paused_until - now, 0), 1),
+                               "waiting": sum(self._waiting[host])}
+        return {"throttled": self.throttled, "rate_limited": self.rate_limited, "hosts": hosts}
@@ -0,0 +1,172 @@
+import time
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import requests
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from abi_codec import tx_hash_hex
+from transport import get_session
+from rpc_client import rpc_batch, RPCError
+
+
+def _to_int(v):
+    return int(v, 16) if isinstance(v, str) else v
+
+
+def format_receipt(raw: dict) -> AttributeDict:
+    """將原始 JSON 收據轉為與 web3 相容的 AttributeDict"""
+    return AttributeDict({
+        "transactionHash": HexBytes(raw["transactionHash"]),
+        "blockHash": HexBytes(raw["blockHash"]),
+        "blockNumber": _to_int(raw["blockNumber"]),
+        "from": raw.get("from"),
+        "to": raw.get("to"),
+        "status": _to_int(raw.get("status", "0x1")),
+        "gasUsed": _to_int(raw["gasUsed"]),
+        "cumulativeGasUsed": _to_int(raw.get("cumulativeGasUsed", "0x0")),
+        "effectiveGasPrice": _to_int(raw.get("effectiveGasPrice", "0x0")),
+        "logs": raw.get("logs", []),
+    })
+
+
+# --------------------------
+# 非阻塞收據追蹤器
+# --------------------------
+class _Tracked:
+    __slots__ = ("future", "callbacks", "deadline")
+
+    def __init__(self, deadline: float):
+        self.future = Future()
+        self.callbacks = []
+        self.deadline = deadline
+
+
+class ReceiptTracker:
+    """統一追蹤所有在途交易，每個新區塊以一次批次請求查詢全部收據"""
+
+    def __init__(self, rpc_url: str, poll_interval: float = 0.5, timeout: float = 180,
+                 session: Optional[requests.Session] = None):
+        self.rpc_url = rpc_url
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = session or get_session()
+        self.last_block = 0
+        self._pending: Dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._clock = None
+        self._next_block = 0
+        self._wake = threading.Event()
+
+    def set_url(self, url: str):
+        """切換節點（之後的收據查詢改送新節點）"""
+        self.rpc_url = url
+
+    def attach(self, clock):
+        """改由共用的區塊時鐘驅動，不再自行輪詢區塊高度；
+        時鐘回呼只記下區塊並喚醒查詢執行緒，批次查詢與交易回呼都不占用時鐘執行緒"""
+        self._clock = clock
+        self._thread = threading.Thread(target=self._poll_on_wake, name="receipts", daemon=True)
+        self._thread.start()
+        clock.subscribe(self._on_clock)
+
+    def _on_clock(self, block_number: int):
+        self._next_block = max(self._next_block, block_number)
+        self._wake.set()
+
+    def _poll_on_wake(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            # 查詢期間又來了幾個區塊時只查最新的一次
+            self.on_block(self._next_block)
+
+    def track(self, tx_hash, callback: Optional[Callable] = None,
+              timeout: Optional[float] = None) -> Future:
+        """登記交易，回傳 Future；收據到達時以 AttributeDict 完成"""
+        key = tx_hash_hex(tx_hash)
+        with self._lock:
+            tracked = self._pending.get(key)
+            if tracked is None:
+                tracked = _Tracked(time.time() + (timeout or self.timeout))
+                self._pending[key] = tracked
+            if callback:
+                tracked.callbacks.append(callback)
+            if self._thread is None and self._clock is None:
+                self._thread = threading.Thread(target=self._run, name="receipts", daemon=True)
+                self._thread.start()
+        return tracked.future
+
+    def untrack(self, tx_hash):
+        """停止追蹤（例如同 nonce 已被其他版本取代的交易）"""
+        with self._lock:
+            self._pending.pop(tx_hash_hex(tx_hash), None)
+
+    def wait(self, tx_hash, timeout: Optional[float] = None) -> AttributeDict:
+        """阻塞等待單筆收據（僅阻塞呼叫端，輪詢由追蹤器共用）"""
+        timeout = timeout or self.timeout
+        return self.track(tx_hash, timeout=timeout).result(timeout + self.poll_interval * 2)
+
+    def fetch_many(self, tx_hashes) -> Dict[str, AttributeDict]:
+        """一次批次查詢多筆收據，未上鏈者不列入結果"""
+        keys = [tx_hash_hex(h) for h in tx_hashes]
+        results = rpc_batch(self.session, self.rpc_url,
+                            [("eth_getTransactionReceipt", [k]) for k in keys])
+        return {k: format_receipt(r) for k, r in zip(keys, results)
+                if r and not isinstance(r, RPCError)}
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def on_block(self, block_number: int):
+        """新區塊到達：批次查詢全部在途交易"""
+        self.last_block = block_number
+        with self._lock:
+            keys = list(self._pending)
+        if not keys:
+            return
+        try:
+            receipts = self.fetch_many(keys)
+        except Exception as e:
+            print(f"[Receipts] 批次查詢失敗: {str(e)}")
+            return
+        now = time.time()
+        done = []
+        with self._lock:
+            for key in keys:
+                tracked = self._pending.get(key)
+                if tracked is None:
+                    continue
+                if key in receipts:
+                    done.append((tracked, receipts[key], None))
+                    del self._pending[key]
+                elif now > tracked.deadline:
+                    done.append((tracked, None, TimeoutError(f"交易 {key} 等待收據逾時")))
+                    del self._pending[key]
+        for tracked, receipt, err in done:
+            if err:
+                tracked.future.set_exception(err)
+                continue
+            tracked.future.set_result(receipt)
+            for cb in tracked.callbacks:
+                try:
+                    cb(receipt)
+                except Exception as e:
+                    print(f"[Receipts] 回呼異常: {str(e)}")
+
+    def _run(self):
+        while True:
+            if not self.pending_count():
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                block = rpc_batch(self.session, self.rpc_url, [("eth_blockNumber", [])])[0]
+                if not isinstance(block, RPCError) and _to_int(block) > self.last_block:
+                    self.on_block(_to_int(block))
+            except Exception as e:
+                print(f"[Receipts] 區塊查詢失敗: {str(e)}")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,151 @@
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+# --------------------------
+# 精簡報價紀錄（取代每輪新建的巢狀 dict）
+# --------------------------
+# 每個 DEX 每輪一個 {'buy_price','sell_price'} dict、每個交易對一個七鍵 dict 加狀態字串，
+# 池子與區塊一多就是大量短命物件與 GC 壓力。這裡改用：
+# - __slots__ 紀錄（沒有每個物件的 __dict__）
+# - QuoteTable：以場所 id 為索引的欄式陣列（array('d')），整張表只有兩個數值陣列
+# - 狀態以整數代碼存放，只在顯示時才對應到文字
+STATUS_NO_DATA = 0
+STATUS_PROFIT = 1
+STATUS_LOSS = 2
+STATUS_FLAT = 3
+STATUS_LABELS = ("⚪ 无数据", "🟢 盈利", "🔴 亏损", "🟡 持平")
+MISSING = float("nan")
+
+
+class Opportunity:
+    """跨 DEX 價差：buy_dex 買入、sell_dex 賣出"""
+    __slots__ = ("buy_dex", "sell_dex", "spread", "buy_price", "sell_price")
+
+    def __init__(self, buy_dex: str, sell_dex: str, buy_price: float, sell_price: float):
+        self.buy_dex = buy_dex
+        self.sell_dex = sell_dex
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        self.spread = sell_price - buy_price
+
+
+class PairQuote:
+    """單一交易所單一交易對的買賣價與損益評估"""
+    __slots__ = ("exchange", "pair", "buy_price", "sell_price", "spread", "net_profit", "status")
+
+    def __init__(self, exchange: str, pair: str, buy_price: float = 0.0, sell_price: float = 0.0,
+                 net_profit: float = 0.0, status: int = STATUS_NO_DATA):
+        self.exchange = exchange
+        self.pair = pair
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        self.spread = sell_price - buy_price
+        self.net_profit = net_profit
+        self.status = status
+
+    @property
+    def status_label(self) -> str:
+        return STATUS_LABELS[self.status]
+
+
+class QuoteTable:
+    """以場所 id 為索引的買 / 賣價欄式表；缺值為 NaN"""
+    __slots__ = ("names", "buy", "sell", "block")
+
+    def __init__(self, names: Sequence[str], buy=None, sell=None, block: Optional[int] = None):
+        self.names = names
+        self.buy = buy if buy is not None else array("d", [MISSING]) * len(names)
+        self.sell = sell if sell is not None else array("d", [MISSING]) * len(names)
+        self.block = block
+
+    @classmethod
+    def from_snapshot(cls, snap) -> "QuoteTable":
+        """snapshot.Snapshot（欄位為 buy_price, sell_price）→ 兩個數值陣列，不建立逐列物件"""
+        values = snap.values
+        return cls(snap.keys, array("d", values[0::2]), array("d", values[1::2]), snap.block)
+
+    def __len__(self):
+        return sum(1 for _ in self.live())
+
+    def live(self) -> Iterator[int]:
+        """買賣價都有值的場所 id"""
+        buy, sell = self.buy, self.sell
+        for i in range(len(self.names)):
+            if not (math.isnan(buy[i]) or math.isnan(sell[i])):
+                yield i
+
+    def set(self, i: int, buy_price: float, sell_price: float):
+        self.buy[i] = buy_price
+        self.sell[i] = sell_price
+
+    def best_opportunity(self, min_spread: float = 0.0,
+                         venues: Optional[Iterable[str]] = None) -> Optional[Opportunity]:
+        """所有 (買, 賣) 場所組合中價差最大者；低於 min_spread 回傳 None（只配置一個結果物件）
+
+        venues 限定可實際下單的場所，其餘場所（只報價的聚合器、V3 池等）只顯示不參與選擇
+        """
+        allowed = None if venues is None else set(venues)
+        ids = [i for i in self.live() if allowed is None or self.names[i] in allowed]
+        buy, sell = self.buy, self.sell
+        best, best_spread = None, 0.0
+        for i in ids:
+            for j in ids:
+                if i == j:
+                    continue
+                spread = sell[j] - buy[i]
+                if spread >= min_spread and (best is None or spread > best_spread):
+                    best, best_spread = (i, j), spread
+        if best is None:
+            return None
+        i, j = best
+        return Opportunity(self.names[i], self.names[j], buy[i], sell[j])
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """舊格式（除錯 / 相容用）"""
+        return {self.names[i]: {"buy_price": self.buy[i], "sell_price": self.sell[i]} for i in self.live()}
+
+
+# --------------------------
+# 配置量比較：python records.py
+# --------------------------
+def _bench(venues: int = 200, cycles: int = 50):
+    import tracemalloc
+    import random
+
+    names = [f"dex{i}" for i in range(venues)]
+    rows: List[tuple] = [(random.uniform(600, 610), random.uniform(600, 610)) for _ in range(venues)]
+
+    def dict_cycle():
+        cache = {n: {"buy_price": b, "sell_price": s} for n, (b, s) in zip(names, rows)}
+        best = None
+        for bn, bd in cache.items():
+            for sn, sd in cache.items():
+                spread = sd["sell_price"] - bd["buy_price"]
+                if bn != sn and (best is None or spread > best["spread"]):
+                    best = {"buy_dex": bn, "sell_dex": sn, "spread": spread,
+                            "buy_price": bd["buy_price"], "sell_price": sd["sell_price"]}
+        pairs = {n: {"WBNB": {"exchange": n, "pair": "WBNB", "buy_price": b, "sell_price": s, "spread": s - b,
+                               "net_profit": s - b, "status": "🟢 盈利" if s > b else "🔴 亏损"}} for n, (b, s) in zip(names, rows)}
+        return cache, best, pairs
+
+    def record_cycle():
+        table = QuoteTable(names, array("d", (b for b, _ in rows)), array("d", (s for _, s in rows)))
+        best = table.best_opportunity(-math.inf)
+        pairs = {n: {"WBNB": PairQuote(n, "WBNB", b, s, s - b, STATUS_PROFIT if s > b else STATUS_LOSS)}
+                 for n, (b, s) in zip(names, rows)}
+        return table, best, pairs
+
+    for label, fn in (("dict", dict_cycle), ("records", record_cycle)):
+        tracemalloc.start()
+        keep = [fn() for _ in range(cycles)]
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(st.count for st in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+        print(f"{label:<8} | {venues} 個場所 × {cycles} 輪 | 每輪 {current / cycles / 1024:8.1f} KiB"
+              f" / {blocks // cycles:6d} 個配置 | 峰值 {peak / 1024:8.1f} KiB")
+        del keep
+
+
+if __name__ == "__main__":
+    _bench()
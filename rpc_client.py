@@ -0,0 +1,164 @@
+import time
+import itertools
+import threading
+import concurrent.futures
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+
+import requests
+
+from transport import get_session, get_rate_limiter
+from rate_limiter import current_priority, priority
+
+# --------------------------
+# JSON-RPC 批次請求
+# --------------------------
+_rpc_ids = itertools.count(1)
+
+
+class RPCError(Exception):
+    """節點回傳的 JSON-RPC 錯誤"""
+    def __init__(self, error: dict):
+        self.code = error.get("code")
+        self.message = error.get("message", "")
+        super().__init__(f"RPC錯誤 {self.code}: {self.message}")
+
+
+def rpc_batch(session: requests.Session, url: str, calls: List[tuple], timeout: float = 10) -> list:
+    """以單一 HTTP POST 送出多個 (method, params)，依序回傳結果或 RPCError"""
+    if not calls:
+        return []
+    payload = []
+    for method, params in calls:
+        payload.append({"jsonrpc": "2.0", "id": next(_rpc_ids), "method": method, "params": params})
+    resp = session.post(url, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    body = resp.json()
+    if isinstance(body, dict):
+        # 部分節點對整批錯誤只回傳單一物件
+        raise RPCError(body.get("error", {"message": str(body)}))
+    by_id = {item.get("id"): item for item in body}
+    results = []
+    for req in payload:
+        item = by_id.get(req["id"])
+        if item is None:
+            results.append(RPCError({"message": "批次回應缺少項目"}))
+        elif "error" in item:
+            results.append(RPCError(item["error"]))
+        else:
+            results.append(item.get("result"))
+    return results
+
+
+def _to_int(v):
+    return int(v, 16) if isinstance(v, str) else v
+
+
+def _block(b):
+    return hex(b) if isinstance(b, int) else b
+
+
+# --------------------------
+# 自動合併的批次 RPC 客戶端
+# --------------------------
+class BatchRPCClient:
+    """短時間窗內各執行緒送出的讀取請求合併成一個批次 POST，再分發結果
+
+    設定限流器時，高優先等級（交易執行）的請求優先進入批次；給定 urls 時，
+    目前節點令牌不足就把批次送往最快可送出的其他節點
+    """
+
+    def __init__(self, url: str, window: float = 0.002, max_batch: int = 100,
+                 session: Optional[requests.Session] = None, timeout: float = 10,
+                 max_inflight: int = 4, urls: Optional[Sequence[str]] = None):
+        self.url = url
+        self.urls = list(urls) if urls else None
+        self.window = window
+        self.max_batch = max_batch
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.batches = 0
+        self.requests = 0
+        self._queue = []
+        self._cond = threading.Condition()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_inflight)
+        self._thread = threading.Thread(target=self._run, name="rpc-batch", daemon=True)
+        self._thread.start()
+
+    def set_url(self, url: str):
+        """切換節點（之後的批次改送新節點）"""
+        self.url = url
+
+    def _target(self, cost: int) -> str:
+        limiter = get_rate_limiter()
+        if self.urls and limiter is not None:
+            return limiter.pick(self.urls, self.url, cost)
+        return self.url
+
+    def submit(self, method: str, params: list, level: Optional[int] = None) -> Future:
+        """level 省略時沿用目前執行緒的優先等級"""
+        fut = Future()
+        level = current_priority() if level is None else level
+        with self._cond:
+            self._queue.append((level, method, params, fut))
+            self._cond.notify()
+        return fut
+
+    def call(self, method: str, params: list, timeout: Optional[float] = None):
+        """阻塞取得單一結果；錯誤以 RPCError 拋出"""
+        return self.submit(method, params).result(timeout or self.timeout * 2)
+
+    def call_many(self, calls: List[tuple]) -> list:
+        """明確的一次性批次，直接送出不等待時間窗"""
+        return rpc_batch(self.session, self._target(len(calls)), calls, self.timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+            # 等待時間窗，讓同時間的其他請求一起進入批次
+            time.sleep(self.window)
+            with self._cond:
+                # 依優先等級取出（同等級維持送出順序）
+                self._queue.sort(key=lambda item: item[0])
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+            self._pool.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        url = self._target(len(batch))
+        try:
+            # 整批以其中最高的優先等級排隊
+            with priority(batch[0][0]):
+                results = rpc_batch(self.session, url, [(m, p) for _, m, p, _ in batch], self.timeout)
+        except Exception as e:
+            for _, _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        for (_, _, _, fut), res in zip(batch, results):
+            if isinstance(res, RPCError):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+    # 常用讀取
+    def block_number(self) -> int:
+        return _to_int(self.call("eth_blockNumber", []))
+
+    def gas_price(self) -> int:
+        return _to_int(self.call("eth_gasPrice", []))
+
+    def get_balance(self, address: str, block="latest") -> int:
+        return _to_int(self.call("eth_getBalance", [address, _block(block)]))
+
+    def get_transaction_count(self, address: str, block="pending") -> int:
+        return _to_int(self.call("eth_getTransactionCount", [address, _block(block)]))
+
+    def get_transaction_receipt(self, tx_hash: str) -> Optional[dict]:
+        return self.call("eth_getTransactionReceipt", [tx_hash])
+
+    def eth_call(self, tx: dict, block="latest") -> str:
+        return self.call("eth_call", [tx, _block(block)])
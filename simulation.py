@@ -0,0 +1,151 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import requests
+from eth_abi import encode
+from eth_utils import keccak
+
+from abi_codec import encode_swap_exact_tokens, decode_uint_array
+from rpc_client import rpc_batch, RPCError
+
+# --------------------------
+# 交易前整體模擬（eth_call + state override，批次送出）
+# --------------------------
+# 整條多腿路徑以 eth_call 模擬，全部釘選在偵測到機會的區塊；
+# 每一腿的輸入代幣餘額與授權以 state override 注入，
+# 因此賣出腿不必等買入腿真的上鏈即可驗證。
+# 模擬的是實際送出的 swapExactTokensForTokens（回傳 amounts[]），各腿輸出取自模擬執行結果；
+# 未指定 amount_in 的腿以前面各腿模擬出的輸入代幣總量接續，在下一個批次模擬
+
+# ERC20 儲存槽位置：(balances 槽, allowances 槽)
+# BSC-USD / BUSD 為 BEP20Token（_owner 佔 slot 0），WBNB 為 WETH9
+TOKEN_STORAGE_SLOTS = {
+    "0x55d398326f99059ff775485246999027b3197955": (1, 2),   # USDT
+    "0xe9e7cea3dedca5984780bafc599bd69add087d56": (1, 2),   # BUSD
+    "0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c": (3, 4),   # WBNB
+}
+
+MAX_UINT256 = 2**256 - 1
+
+
+def _slot_hex(b: bytes) -> str:
+    return "0x" + b.hex()
+
+
+def _word(v: int) -> str:
+    return "0x" + v.to_bytes(32, "big").hex()
+
+
+def balance_slot(owner: str, slot: int) -> str:
+    """mapping(address => uint) 的儲存位置"""
+    return _slot_hex(keccak(encode(["address", "uint256"], [owner, slot])))
+
+
+def allowance_slot(owner: str, spender: str, slot: int) -> str:
+    """mapping(address => mapping(address => uint)) 的儲存位置"""
+    inner = keccak(encode(["address", "uint256"], [owner, slot]))
+    return _slot_hex(keccak(encode(["address"], [spender]) + inner))
+
+
+def token_overrides(token: str, owner: str, spender: str, amount: int,
+                    slots: Dict[str, tuple] = TOKEN_STORAGE_SLOTS) -> dict:
+    """注入 owner 的代幣餘額與對 spender 的授權；未知槽位的代幣不覆寫"""
+    layout = slots.get(token.lower())
+    if layout is None:
+        return {}
+    bal_slot, allow_slot = layout
+    return {token: {"stateDiff": {
+        balance_slot(owner, bal_slot): _word(amount),
+        allowance_slot(owner, spender, allow_slot): _word(MAX_UINT256),
+    }}}
+
+
+class SimResult:
+    """單腿模擬結果"""
+    __slots__ = ("router", "path", "amount_in", "amounts", "ok", "error")
+
+    def __init__(self, router, path, amount_in, amounts, ok, error):
+        self.router = router
+        self.path = path
+        self.amount_in = amount_in
+        self.amounts = amounts
+        self.ok = ok
+        self.error = error
+
+    @property
+    def amount_out(self) -> int:
+        return self.amounts[-1] if self.amounts else 0
+
+
+class PlanSimulation:
+    """整體路徑模擬結果"""
+
+    def __init__(self, block, legs: List[SimResult]):
+        self.block = block
+        self.legs = legs
+
+    @property
+    def ok(self) -> bool:
+        return all(leg.ok for leg in self.legs)
+
+    @property
+    def amount_out(self) -> int:
+        return self.legs[-1].amount_out if self.legs else 0
+
+    @property
+    def errors(self) -> List[str]:
+        return [leg.error for leg in self.legs if leg.error]
+
+
+def _simulate_batch(session: requests.Session, rpc_url: str, owner: str, batch: List[Tuple[dict, int]],
+                    block_id: str, deadline: int) -> List[SimResult]:
+    calls = []
+    for leg, amount_in in batch:
+        router, path = leg["router"], leg["path"]
+        swap = encode_swap_exact_tokens(amount_in, leg.get("min_out", 0), path, owner, deadline)
+        tx = {"from": owner, "to": router, "data": swap}
+        overrides = token_overrides(path[0], owner, router, amount_in)
+        calls.append(("eth_call", [tx, block_id, overrides] if overrides else [tx, block_id]))
+    results = rpc_batch(session, rpc_url, calls)
+    sims = []
+    for (leg, amount_in), res in zip(batch, results):
+        amounts, error = [], None
+        if isinstance(res, RPCError):
+            error = f"交易模擬失敗: {res.message}"
+        else:
+            amounts = decode_uint_array(res)
+            if amounts[-1] < leg.get("min_out", 0):
+                error = f"輸出 {amounts[-1]} 低於最低要求 {leg['min_out']}"
+        sims.append(SimResult(leg["router"], leg["path"], amount_in, amounts, error is None, error))
+    return sims
+
+
+def simulate_plan(session: requests.Session, rpc_url: str, owner: str, legs: List[dict],
+                  block: Optional[Union[int, str]] = None, deadline: Optional[int] = None) -> PlanSimulation:
+    """模擬整條路徑；指定了 amount_in 的連續各腿一次批次送出
+
+    legs 依序為 {"router", "path", "amount_in", "min_out"}；amount_in 為 None 的腿
+    以前面各腿模擬輸出中、等於本腿輸入代幣的總量為輸入（例如拆單買入後的整筆賣出）。
+    """
+    block_id = hex(block) if isinstance(block, int) else (block or "latest")
+    deadline = deadline or int(time.time() + 300)
+    sims: List[SimResult] = []
+    i = 0
+    while i < len(legs):
+        batch = []
+        while i < len(legs):
+            leg = legs[i]
+            amount_in = leg.get("amount_in")
+            if amount_in is None:
+                # 需要前面各腿的模擬結果：先送出目前的批次
+                if batch:
+                    break
+                token_in = leg["path"][0].lower()
+                amount_in = sum(s.amount_out for s in sims if s.path[-1].lower() == token_in)
+            batch.append((leg, amount_in))
+            i += 1
+        sims += _simulate_batch(session, rpc_url, owner, batch, block_id, deadline)
+        if not all(s.ok for s in sims):
+            # 前面的腿已失敗，後續接續的腿沒有意義
+            break
+    return PlanSimulation(block, sims)
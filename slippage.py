@@ -0,0 +1,77 @@
+import math
+import time
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+# --------------------------
+# 動態滑點：依池深度、交易規模與近期波動計算 amountOutMin
+# --------------------------
+# 容忍度（bps）= 基本值
+#              + z × 價格在等待上鏈期間的波動（σ × √等待秒數）
+#              + 權重 × 本筆交易的價格衝擊（儲備可能落後一個區塊，衝擊越大誤差越大）
+# 上下限夾住後套用到預估輸出；全部是浮點運算，可對每個候選機會即時計算
+BSC_BLOCK_TIME = 3.0
+
+
+class VolatilityTracker:
+    """各價格來源（路徑、交易所）的指數加權波動率，單位：每秒對數報酬變異數"""
+
+    def __init__(self, half_life: float = 60.0, prior_bps_per_block: float = 20.0,
+                 block_time: float = BSC_BLOCK_TIME):
+        self.half_life = half_life
+        # 尚無觀測時的預設波動：每區塊 prior_bps_per_block
+        self.prior_var = (prior_bps_per_block / 10000) ** 2 / block_time
+        self._state: Dict[Hashable, Tuple[float, float, float]] = {}   # key -> (上次價格, 上次時間, 變異數)
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, price: float, now: Optional[float] = None):
+        if price <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._state.get(key)
+            if last is None:
+                self._state[key] = (price, now, self.prior_var)
+                return
+            last_price, last_time, var = last
+            dt = now - last_time
+            if dt <= 1e-3:
+                # 同一時間的重複觀測只更新價格
+                self._state[key] = (price, last_time, var)
+                return
+            r = math.log(price / last_price)
+            alpha = 1.0 - 0.5 ** (dt / self.half_life)
+            var = (1.0 - alpha) * var + alpha * (r * r / dt)
+            self._state[key] = (price, now, var)
+
+    def sigma(self, key: Hashable, horizon: float) -> float:
+        """horizon 秒內價格變動的標準差（比例）"""
+        state = self._state.get(key)
+        var = state[2] if state else self.prior_var
+        return math.sqrt(var * max(horizon, 0.0))
+
+
+class SlippageModel:
+    def __init__(self, tracker: Optional[VolatilityTracker] = None, block_delay: int = 1,
+                 z: float = 2.0, impact_weight: float = 0.5, min_bps: float = 5.0,
+                 max_bps: float = 300.0, block_time: float = BSC_BLOCK_TIME):
+        self.tracker = tracker or VolatilityTracker(block_time=block_time)
+        self.block_delay = block_delay
+        self.z = z
+        self.impact_weight = impact_weight
+        self.min_bps = min_bps
+        self.max_bps = max_bps
+        self.block_time = block_time
+
+    def tolerance_bps(self, key: Hashable, impact: float = 0.0, block_delay: Optional[int] = None) -> float:
+        delay = self.block_delay if block_delay is None else block_delay
+        horizon = max(delay, 1) * self.block_time
+        bps = (self.min_bps
+               + self.z * self.tracker.sigma(key, horizon) * 10000
+               + self.impact_weight * impact * 10000)
+        return min(max(bps, self.min_bps), self.max_bps)
+
+    def min_amount_out(self, expected_out: int, key: Hashable, impact: float = 0.0,
+                       block_delay: Optional[int] = None) -> int:
+        bps = self.tolerance_bps(key, impact, block_delay)
+        return expected_out * int(10000 - bps) // 10000
@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# --------------------------
+# 價格快照（雙緩衝 + 序號，讀取端不加鎖）
+# --------------------------
+# 報價執行緒池寫入、主迴圈與其他執行緒讀取同一份價格表。原本 price_cache 與
+# last_update 是兩次獨立的賦值，讀取端可能拿到新價格配舊時間戳（或相反）。
+# 快照以一段固定大小的記憶體存放兩份緩衝（各含區塊、時間戳與 key × 欄位的 float64 陣列）：
+# 寫入端填好背面緩衝後把序號加一完成發布；讀取端讀序號 → 複製對應緩衝 → 再讀序號，
+# 序號有任何變動就重讀：寫入端要回頭覆寫同一份緩衝，必須先完成下一次發布（序號 +1），
+# 所以複製前後序號相同即保證這份緩衝在複製期間沒有被動過。
+# 給 name 時放在 multiprocessing.shared_memory，其他行程以 attach 讀同一份快照
+PRICE_FIELDS = ("buy_price", "sell_price")
+MISSING = float("nan")
+_META = 2            # 每份緩衝前的區塊高度（int64）與時間戳（float64）
+_RETRIES = 100
+
+
+class Snapshot:
+    """某一次發布的唯讀內容；缺值為 None"""
+    __slots__ = ("seq", "block", "timestamp", "keys", "fields", "values")
+
+    def __init__(self, seq: int, block: Optional[int], timestamp: float, keys, fields, values: List[float]):
+        self.seq = seq
+        self.block = block
+        self.timestamp = timestamp
+        self.keys = keys
+        self.fields = fields
+        self.values = values
+
+    def __bool__(self):
+        return self.seq > 0 and any(not math.isnan(v) for v in self.values)
+
+    def value(self, key, field: str) -> Optional[float]:
+        if key not in self.keys:
+            return None
+        v = self.values[self.keys.index(key) * len(self.fields) + self.fields.index(field)]
+        return None if math.isnan(v) else v
+
+    def get(self, key) -> Optional[Dict[str, Optional[float]]]:
+        if key not in self.keys:
+            return None
+        base = self.keys.index(key) * len(self.fields)
+        row = self.values[base:base + len(self.fields)]
+        if all(math.isnan(v) for v in row):
+            return None
+        return {f: (None if math.isnan(v) else v) for f, v in zip(self.fields, row)}
+
+    def as_dict(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """與舊 price_cache 相同的形狀：{key: {欄位: 值}}，沒有資料的 key 不列出"""
+        out = {}
+        for key in self.keys:
+            row = self.get(key)
+            if row is not None:
+                out[key] = row
+        return out
+
+    def age(self) -> float:
+        return time.time() - self.timestamp if self.seq else float("inf")
+
+
+class SnapshotBuffer:
+    """單一寫入端、多讀取端（可跨行程）的價格快照"""
+
+    def __init__(self, keys: Iterable, fields: Sequence[str] = PRICE_FIELDS, name: Optional[str] = None,
+                 create: bool = True):
+        self.keys = list(keys)
+        self.fields = list(fields)
+        self.width = len(self.keys) * len(self.fields)
+        size = 8 * (1 + 2 * (_META + self.width))
+        self._shm = None
+        if name is None:
+            buf = bytearray(size)
+        else:
+            from multiprocessing import shared_memory
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+            except FileExistsError:
+                # 上次異常結束留下的同名區段：直接沿用
+                self._shm = shared_memory.SharedMemory(name=name)
+            if self._shm.size < size:
+                raise ValueError(f"共享快照 {name} 大小不符（{self._shm.size} < {size}）")
+            buf = self._shm.buf
+        self.name = name
+        # 同一段記憶體以 int64 / float64 兩種視角存取，位置以 8 位元組為單位
+        self._q = memoryview(buf).cast("B").cast("q")
+        self._d = memoryview(buf).cast("B").cast("d")
+        self._write_lock = threading.Lock()
+        self.retries = 0
+
+    @classmethod
+    def attach(cls, name: str, keys: Iterable, fields: Sequence[str] = PRICE_FIELDS) -> "SnapshotBuffer":
+        """其他行程以相同 keys / fields 讀取既有的共享快照"""
+        return cls(keys, fields, name=name, create=False)
+
+    def _base(self, index: int) -> int:
+        return 1 + index * (_META + self.width)
+
+    @property
+    def seq(self) -> int:
+        return self._q[0]
+
+    def publish(self, rows: Dict, block: Optional[int] = None, timestamp: Optional[float] = None) -> int:
+        """rows 形如 {key: {欄位: 值}}，未列出的 key / 欄位記為缺值；回傳新序號"""
+        with self._write_lock:
+            seq = self._q[0]
+            base = self._base((seq + 1) & 1)
+            self._q[base] = -1 if block is None else block
+            self._d[base + 1] = time.time() if timestamp is None else timestamp
+            i = base + _META
+            for key in self.keys:
+                row = rows.get(key) or {}
+                for field in self.fields:
+                    v = row.get(field)
+                    self._d[i] = MISSING if v is None else float(v)
+                    i += 1
+            # 背面緩衝寫完才推進序號：讀取端只會看到完整的一份
+            self._q[0] = seq + 1
+            return seq + 1
+
+    def read(self) -> Snapshot:
+        """無鎖讀取最新一次發布的內容；與寫入端衝突時重讀"""
+        for _ in range(_RETRIES):
+            seq = self._q[0]
+            if seq == 0:
+                return Snapshot(0, None, 0.0, self.keys, self.fields, [MISSING] * self.width)
+            base = self._base(seq & 1)
+            block = self._q[base]
+            timestamp = self._d[base + 1]
+            values = self._d[base + _META:base + _META + self.width].tolist()
+            if self._q[0] == seq:
+                return Snapshot(seq, None if block < 0 else block, timestamp, self.keys, self.fields, values)
+            self.retries += 1
+        raise RuntimeError("快照讀取重試過多（寫入過於頻繁）")
+
+    def close(self, unlink: bool = False):
+        if self._shm is None:
+            return
+        self._q.release()
+        self._d.release()
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,138 @@
+from typing import Hashable, List, Optional, Sequence
+
+from amm import Hop, get_amounts_out
+
+# --------------------------
+# 跨路由 / 跨路徑拆單
+# --------------------------
+# 整筆金額壓在單一池上，價格衝擊隨金額平方成長；拆到多個互不重疊的池，
+# 讓各路徑「下一單位輸入的邊際輸出」相等時總輸出最大（各路徑輸出皆為凹函數）。
+# 以本地儲備模型（x*y=k）計算：外層對邊際價格 λ 二分，內層求各路徑邊際輸出
+# 等於 λ 的輸入量，直到分配總額等於訂單金額。每多一腿多一筆交易的 Gas，
+# 增益不足 leg_cost 的小腿會被剔除
+
+
+class Route:
+    """一條候選路徑；pools 用來排除共用同一個池的路徑（拆單假設各路徑互不影響）"""
+    __slots__ = ("key", "path", "hops", "pools")
+
+    def __init__(self, key: Hashable, path: Sequence[str], hops: Sequence[Hop], pools: Sequence[str] = ()):
+        self.key = key
+        self.path = list(path)
+        self.hops = list(hops)
+        self.pools = tuple(p.lower() for p in pools if p)
+
+    def amount_out(self, amount_in: int) -> int:
+        return get_amounts_out(amount_in, self.hops)[-1] if amount_in > 0 else 0
+
+    def marginal(self, amount_in: float) -> float:
+        """在 amount_in 處再多投入一單位的輸出（逐跳連鎖微分）"""
+        d, a = 1.0, float(amount_in)
+        for reserve_in, reserve_out, fee_bps in self.hops:
+            f = 10000 - fee_bps
+            base = reserve_in * 10000 + a * f
+            d *= f * reserve_out * reserve_in * 10000 / (base * base)
+            a = a * f * reserve_out / base
+        return d
+
+
+class SplitLeg:
+    __slots__ = ("key", "path", "amount_in", "amount_out")
+
+    def __init__(self, key, path, amount_in, amount_out):
+        self.key = key
+        self.path = path
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+
+
+class SplitPlan:
+    def __init__(self, legs: List[SplitLeg], single_out: int):
+        self.legs = legs
+        self.single_out = single_out     # 全部走最佳單一路徑的輸出
+
+    @property
+    def amount_out(self) -> int:
+        return sum(leg.amount_out for leg in self.legs)
+
+    @property
+    def gain(self) -> int:
+        return self.amount_out - self.single_out
+
+    def __len__(self):
+        return len(self.legs)
+
+
+def _amount_at(route: Route, lam: float, total: int, iters: int = 48) -> float:
+    """邊際輸出等於 lam 的投入量（邊際輸出隨投入遞減）"""
+    if route.marginal(0) <= lam:
+        return 0.0
+    if route.marginal(total) >= lam:
+        return float(total)
+    lo, hi = 0.0, float(total)
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        if route.marginal(mid) > lam:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def _equalize(routes: Sequence[Route], total: int, iters: int = 48) -> List[int]:
+    """對 λ 二分，使各路徑投入總和等於 total；回傳各路徑的整數投入量"""
+    lo, hi = 0.0, max(r.marginal(0) for r in routes)
+    for _ in range(iters):
+        lam = (lo + hi) / 2
+        if sum(_amount_at(r, lam, total) for r in routes) > total:
+            lo = lam
+        else:
+            hi = lam
+    alloc = [int(_amount_at(r, hi, total)) for r in routes]
+    # 捨入誤差補給分配最多的路徑，確保總額不變
+    alloc[alloc.index(max(alloc))] += total - sum(alloc)
+    return alloc
+
+
+def _solve(routes: Sequence[Route], total: int):
+    """分配後剔除分不到金額的路徑；回傳對齊的 (路徑, 各腿)"""
+    alloc = _equalize(routes, total)
+    kept = [(r, a) for r, a in zip(routes, alloc) if a > 0]
+    return [r for r, _ in kept], [SplitLeg(r.key, r.path, a, r.amount_out(a)) for r, a in kept]
+
+
+def optimize_split(amount_in: int, routes: Sequence[Route], leg_cost: int = 0,
+                   min_share: float = 0.01) -> Optional[SplitPlan]:
+    """把 amount_in 拆到各路徑使總輸出最大
+
+    leg_cost：每多一腿的成本（以輸出代幣計，通常是一筆 swap 的 Gas）；
+    min_share：低於總額此比例的腿直接剔除。沒有可用路徑時回傳 None
+    """
+    if amount_in <= 0:
+        return None
+    ranked = sorted((r for r in routes if r.hops), key=lambda r: r.amount_out(amount_in), reverse=True)
+    if not ranked or ranked[0].amount_out(amount_in) <= 0:
+        return None
+    single_out = ranked[0].amount_out(amount_in)
+    # 共用同一個池的路徑只保留單獨報價較好的一條
+    active, used = [], set()
+    for r in ranked:
+        if used.isdisjoint(r.pools):
+            active.append(r)
+            used.update(r.pools)
+
+    active, legs = _solve(active, amount_in)
+    while len(legs) > 1:
+        keep = [r for r, leg in zip(active, legs) if leg.amount_in >= amount_in * min_share]
+        if len(keep) < len(active):
+            active, legs = _solve(keep, amount_in)
+            continue
+        # 剔除最小腿後重算，輸出損失小於一腿成本就不值得多送一筆交易
+        smallest = min(range(len(legs)), key=lambda i: legs[i].amount_in)
+        fewer_routes, fewer = _solve(active[:smallest] + active[smallest + 1:], amount_in)
+        if sum(l.amount_out for l in legs) - sum(l.amount_out for l in fewer) > leg_cost:
+            break
+        active, legs = fewer_routes, fewer
+    if len(legs) == 1 or sum(l.amount_out for l in legs) - leg_cost * (len(legs) - 1) <= single_out:
+        legs = [SplitLeg(ranked[0].key, ranked[0].path, amount_in, single_out)]
+    return SplitPlan(legs, single_out)
@@ -0,0 +1,150 @@
+import threading
+from typing import List, Optional, Sequence
+
+from abi_codec import decode_address, decode_uint, uint_word
+
+# --------------------------
+# StableSwap（Curve 型）穩定幣池本地鏡像
+# --------------------------
+# 與 Curve / Ellipsis 3pool 合約相同的整數牛頓迭代（get_D / get_y），
+# 每個區塊以一個批次刷新 balances、A 與 fee，之後任意規模的穩定幣互換
+# 都在本地計算。穩定幣之間走 StableSwap 曲線，大額的滑價遠小於 V2 的 x*y=k
+SEL_COINS = "0xc6610657"            # coins(uint256)
+SEL_BALANCES = "0x4903b0d1"         # balances(uint256)
+SEL_A = "0xf446c1d0"                # A()
+SEL_FEE = "0xddca3f43"              # fee()
+SEL_GET_DY = "0x5e0d443f"           # get_dy(int128,int128,uint256)
+SEL_EXCHANGE = "0x3df02124"         # exchange(int128,int128,uint256,uint256)
+
+ELLIPSIS_3POOL = "0x160CAed03795365F3A589f10C379FfA7d75d4E76"     # BUSD / USDC / USDT
+FEE_DENOMINATOR = 10**10
+PRECISION = 10**18
+
+
+def get_D(xp: Sequence[int], amp: int, a_precision: int = 1) -> int:
+    n = len(xp)
+    s = sum(xp)
+    if s == 0:
+        return 0
+    d = s
+    ann = amp * n
+    for _ in range(255):
+        d_p = d
+        for x in xp:
+            d_p = d_p * d // (x * n)
+        d_prev = d
+        d = (ann * s // a_precision + d_p * n) * d // ((ann - a_precision) * d // a_precision + (n + 1) * d_p)
+        if abs(d - d_prev) <= 1:
+            return d
+    raise ValueError("get_D 未收斂")
+
+
+def get_y(i: int, j: int, x: int, xp: Sequence[int], amp: int, a_precision: int = 1) -> int:
+    """池中第 i 個幣餘額變成 x 時，維持不變量所需的第 j 個幣餘額"""
+    n = len(xp)
+    d = get_D(xp, amp, a_precision)
+    ann = amp * n
+    c, s = d, 0
+    for k in range(n):
+        if k == i:
+            xk = x
+        elif k != j:
+            xk = xp[k]
+        else:
+            continue
+        s += xk
+        c = c * d // (xk * n)
+    c = c * d * a_precision // (ann * n)
+    b = s + d * a_precision // ann
+    y = d
+    for _ in range(255):
+        y_prev = y
+        y = (y * y + c) // (2 * y + b - d)
+        if abs(y - y_prev) <= 1:
+            return y
+    raise ValueError("get_y 未收斂")
+
+
+def get_dy(i: int, j: int, dx: int, balances: Sequence[int], rates: Sequence[int], amp: int,
+           fee: int, a_precision: int = 1) -> int:
+    """與合約 get_dy 相同：扣除手續費後的輸出"""
+    xp = [b * r // PRECISION for b, r in zip(balances, rates)]
+    x = xp[i] + dx * rates[i] // PRECISION
+    y = get_y(i, j, x, xp, amp, a_precision)
+    dy = (xp[j] - y - 1) * PRECISION // rates[j]
+    return dy - fee * dy // FEE_DENOMINATOR
+
+
+def encode_exchange(i: int, j: int, dx: int, min_dy: int) -> str:
+    return SEL_EXCHANGE + uint_word(i) + uint_word(j) + uint_word(dx) + uint_word(min_dy)
+
+
+class StablePool:
+    """單一 StableSwap 池；coins 只查一次，balances / A / fee 每個區塊一個批次刷新"""
+
+    def __init__(self, rpc, address: str, n_coins: int = 3, decimals: Optional[Sequence[int]] = None,
+                 a_precision: int = 1):
+        self.rpc = rpc
+        self.address = address
+        self.n = n_coins
+        self.a_precision = a_precision
+        # 各幣換算成 18 位精度的倍率（BSC 上的 BUSD/USDC/USDT 都是 18 位）
+        self.rates = [PRECISION * 10**(18 - d) for d in (decimals or [18] * n_coins)]
+        self.coins: List[str] = []
+        self.balances: List[int] = []
+        self.amp = 0
+        self.fee = 0
+        self.block = None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.balances) and all(self.balances)
+
+    def load(self, block="latest") -> "StablePool":
+        """同一區塊只刷新一次（多個偵測執行緒共用）"""
+        with self._lock:
+            if block != "latest" and block == self.block and self:
+                return self
+            tag = hex(block) if isinstance(block, int) else block
+            calls = []
+            if not self.coins:
+                calls += [("eth_call", [{"to": self.address, "data": SEL_COINS + uint_word(i)}, "latest"])
+                          for i in range(self.n)]
+            calls += [("eth_call", [{"to": self.address, "data": SEL_BALANCES + uint_word(i)}, tag])
+                      for i in range(self.n)]
+            calls += [("eth_call", [{"to": self.address, "data": SEL_A}, tag]),
+                      ("eth_call", [{"to": self.address, "data": SEL_FEE}, tag])]
+            results = self.rpc.call_many(calls)
+            for r in results:
+                if not isinstance(r, str):
+                    raise ValueError(f"穩定幣池狀態讀取失敗: {r}")
+            if not self.coins:
+                self.coins = [decode_address(r) for r in results[:self.n]]
+                results = results[self.n:]
+            self.balances = [decode_uint(r) for r in results[:self.n]]
+            self.amp = decode_uint(results[self.n])
+            self.fee = decode_uint(results[self.n + 1])
+            self.block = block
+            return self
+
+    def index(self, token: str) -> Optional[int]:
+        token = token.lower()
+        return self.coins.index(token) if token in self.coins else None
+
+    def has(self, token_in: str, token_out: str) -> bool:
+        i, j = self.index(token_in), self.index(token_out)
+        return i is not None and j is not None and i != j
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        if dx <= 0 or not self:
+            return 0
+        return get_dy(i, j, dx, self.balances, self.rates, self.amp, self.fee, self.a_precision)
+
+    def amount_out(self, token_in: str, token_out: str, amount_in: int) -> int:
+        """池中沒有其中一個幣時回傳 0"""
+        if not self.has(token_in, token_out):
+            return 0
+        return self.get_dy(self.index(token_in), self.index(token_out), amount_in)
+
+    def exchange_data(self, token_in: str, token_out: str, amount_in: int, min_out: int) -> str:
+        return encode_exchange(self.index(token_in), self.index(token_out), amount_in, min_out)
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+import requests
+from eth_utils import keccak
+
+import broadcaster
+from broadcaster import Broadcaster
+from rpc_client import RPCError
+
+RAW = "0x02f86b3880843b9aca00"
+TX_HASH = keccak(hexstr=RAW)
+
+
+def fake_batch(behaviour):
+    """behaviour: url -> 回傳值（RPCError / 結果）或要拋出的例外；可以是 (threading.Event, 值) 表示等事件再回覆"""
+    calls = []
+
+    def rpc_batch(session, url, calls_, timeout=10):
+        calls.append(url)
+        reply = behaviour[url]
+        if isinstance(reply, tuple):
+            event, reply = reply
+            event.wait(2)
+        if isinstance(reply, BaseException) and not isinstance(reply, RPCError):
+            raise reply
+        return [reply]
+
+    return rpc_batch, calls
+
+
+def test_first_ack_wins(monkeypatch):
+    release = threading.Event()
+    rpc_batch, calls = fake_batch({"http://slow": (release, "0x" + TX_HASH.hex()),
+                                   "http://fast": "0x" + TX_HASH.hex()})
+    monkeypatch.setattr(broadcaster, "rpc_batch", rpc_batch)
+    b = Broadcaster(["http://slow", "http://fast"], session=object())
+    try:
+        assert bytes(b.send_raw(RAW)) == TX_HASH
+        assert b.stats()["endpoints"]["http://fast"]["wins"] == 1
+        assert b.stats()["endpoints"]["http://slow"]["wins"] == 0
+    finally:
+        release.set()
+    assert sorted(calls) == ["http://fast", "http://slow"]
+
+
+def test_already_known_counts_as_success(monkeypatch):
+    rpc_batch, _ = fake_batch({"http://a": RPCError({"code": -32000, "message": "already known"}),
+                               "http://b": requests.ConnectionError("down")})
+    monkeypatch.setattr(broadcaster, "rpc_batch", rpc_batch)
+    b = Broadcaster(["http://a"], extra=["http://b"], session=object())
+    assert bytes(b.send_raw(bytes.fromhex(RAW[2:]))) == TX_HASH
+    assert b.stats()["endpoints"]["http://a"]["known"] == 1
+
+
+def test_rpc_error_beats_network_error(monkeypatch):
+    nonce = RPCError({"code": -32000, "message": "nonce too low"})
+    rpc_batch, _ = fake_batch({"http://a": requests.ConnectionError("down"), "http://b": nonce,
+                               "http://c": requests.Timeout("slow")})
+    monkeypatch.setattr(broadcaster, "rpc_batch", rpc_batch)
+    b = Broadcaster(["http://a", "http://b", "http://c"], session=object())
+    with pytest.raises(RPCError) as err:
+        b.send_raw(RAW)
+    assert err.value is nonce
+    assert b.stats()["sent"] == 0
+
+
+def test_network_errors_only_are_raised(monkeypatch):
+    rpc_batch, _ = fake_batch({"http://a": requests.ConnectionError("down")})
+    monkeypatch.setattr(broadcaster, "rpc_batch", rpc_batch)
+    b = Broadcaster(["http://a"], session=object())
+    with pytest.raises(requests.ConnectionError):
+        b.send_raw(RAW)
+    assert b.stats()["endpoints"]["http://a"]["errors"] == 1
+
+
+def test_duplicate_urls_are_sent_once():
+    b = Broadcaster(["http://a", "http://b"], extra=["http://a"], session=object())
+    assert b.urls == ["http://a", "http://b"]
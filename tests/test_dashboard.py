@@ -0,0 +1,51 @@
+import io
+import sys
+import time
+
+from dashboard import Dashboard
+
+
+def rows(n):
+    return ["title", "header"] + [f"row {i}" for i in range(n)]
+
+
+def test_rows_that_fit_are_drawn_as_is():
+    dash = Dashboard(lambda d: d, stream=io.StringIO(), header_rows=2)
+    assert dash.frame(rows(3), height=10, now=0) == rows(3)
+
+
+def test_overflow_pages_with_header_and_status_row():
+    dash = Dashboard(lambda d: d, stream=io.StringIO(), header_rows=2, page_interval=3)
+    first = dash.frame(rows(20), height=10, now=0)
+    # 9 列可用：表頭 2 + 內容 6 + 頁碼 1
+    assert len(first) == 9
+    assert first[:2] == ["title", "header"]
+    assert first[2:8] == [f"row {i}" for i in range(6)]
+    assert first[-1].startswith("… 第 1/4 頁（另有 14 列未顯示")
+    last = dash.frame(rows(20), height=10, now=9)
+    assert last[2:4] == ["row 18", "row 19"] and last[-1].startswith("… 第 4/4 頁")
+
+
+def test_logs_are_drawn_below_the_table():
+    dash = Dashboard(lambda d: d, stream=io.StringIO(), log_rows=2)
+    for i in range(3):
+        dash.log(f"log {i}")
+    frame = dash.frame(rows(1), height=10, now=0)
+    assert frame[:3] == rows(1)
+    assert frame[-2:] == ["log 1", "log 2"]
+
+
+def test_print_is_routed_through_the_dashboard():
+    stream = io.StringIO()
+    dash = Dashboard(lambda d: d, stream=stream, fps=50).start()
+    try:
+        dash.publish(rows(1))
+        print("⚠️ 系統異常: boom")
+        deadline = time.time() + 2
+        while "boom" not in stream.getvalue() and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        dash.close()
+    assert sys.stdout is not None and not hasattr(sys.stdout, "_dashboard")
+    # 日誌行以游標定位寫成表格下方的一列，不是直接混進輸出流
+    assert "\x1b[5;1H⚠️ 系統異常: boom\x1b[K" in stream.getvalue()
@@ -0,0 +1,71 @@
+from gas_model import GasModel, prior_gas
+
+ROUTER = "0x10ED43C718714eb63d5aA57B78B54704E256024E"
+OTHER = "0x3a6d8cA21D1CF76F653A67577FA0D27453350dD8"
+USDT = "0x55d398326f99059fF775485246999027B3197955"
+WBNB = "0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"
+BUSD = "0xe9e7CEA3DcaE8f9c2b1D3F5C0bB09CF4c6aC1bE5"
+CAKE = "0x0E09FaBB73Bd3Ade0a17ECC321fD13a19e81cE82"
+
+
+class FakeRPC:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def call_many(self, calls):
+        self.calls.append(calls)
+        return self.results
+
+
+def test_exact_key_wins():
+    model = GasModel()
+    model.record(ROUTER, [USDT, WBNB], 100000)
+    model.record(ROUTER, [USDT, CAKE], 200000)
+    # 代幣順序不影響鍵；地址不分大小寫
+    assert model.estimate(ROUTER.lower(), [WBNB, USDT]) == 100000
+    assert model.stats()["hits"] == 1
+
+
+def test_falls_back_to_same_router_and_hops():
+    model = GasModel()
+    model.record(ROUTER, [USDT, WBNB], 100000)
+    model.record(ROUTER, [USDT, CAKE], 120000)
+    model.record(ROUTER, [USDT, WBNB, CAKE], 400000)     # 跳數不同，不參與平均
+    model.record(OTHER, [USDT, BUSD], 500000)            # 合約不同，不參與平均
+    assert model.estimate(ROUTER, [BUSD, WBNB]) == 110000
+    assert model.stats()["fallbacks"] == 1
+
+
+def test_prior_when_nothing_is_known():
+    model = GasModel()
+    model.record(OTHER, [USDT, WBNB], 90000)
+    assert model.estimate(ROUTER, [USDT, WBNB]) == prior_gas(1)
+    assert model.estimate(ROUTER, [USDT, BUSD, WBNB]) == prior_gas(2)
+
+
+def test_limit_adds_margin_and_covers_recent_peak():
+    model = GasModel(margin=1.2)
+    assert model.limit(ROUTER, [USDT]) == int(prior_gas(1) * 1.2)
+    model = GasModel(margin=1.1, alpha=0.1)
+    model.record(ROUTER, [USDT, WBNB], 100000)
+    model.record(ROUTER, [USDT, WBNB], 200000)          # 平均 110000，峰值 200000
+    assert model.estimate(ROUTER, [USDT, WBNB]) == 110000
+    assert model.limit(ROUTER, [USDT, WBNB]) == 210000
+
+
+def test_only_successful_receipts_are_learned():
+    model = GasModel()
+    model.record_receipt(ROUTER, [USDT, WBNB], {"status": 0, "gasUsed": 30000})
+    assert model.stats()["routes"] == 0
+    model.record_receipt(ROUTER, [USDT, WBNB], {"status": 1, "gasUsed": 130000})
+    assert model.estimate(ROUTER, [USDT, WBNB]) == 130000
+
+
+def test_warm_skips_reverted_estimates():
+    rpc = FakeRPC([hex(95000), Exception("execution reverted")])
+    model = GasModel()
+    learned = model.warm(rpc, "0xabc", [(ROUTER, [USDT, WBNB], "0x01"), (ROUTER, [USDT, CAKE], "0x02")])
+    assert learned == 1
+    assert len(rpc.calls) == 1 and len(rpc.calls[0]) == 2
+    assert model.estimate(ROUTER, [USDT, WBNB]) == 95000
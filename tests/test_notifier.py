@@ -0,0 +1,70 @@
+import time
+
+from notifier import Notifier
+
+
+class StubSender:
+    def __init__(self, fail=False):
+        self.messages = []
+        self.fail = fail
+
+    def __call__(self, text):
+        if self.fail:
+            raise ConnectionError("telegram down")
+        self.messages.append(text)
+
+    def wait_for(self, count, timeout=2):
+        deadline = time.time() + timeout
+        while len(self.messages) < count and time.time() < deadline:
+            time.sleep(0.01)
+        return self.messages
+
+
+def test_messages_queued_during_interval_go_out_as_one_batch():
+    sender = StubSender()
+    notifier = Notifier(sender, batch_interval=0.2)
+    notifier.send("first")
+    assert sender.wait_for(1) == ["first"]
+    notifier.send("b")
+    notifier.send("c")
+    notifier.send("b")
+    notifier.close()
+    assert sender.messages[1] == "b\n（另有 1 則相同訊息已合併）\n\nc"
+    assert notifier.sent == 3
+
+
+def test_repeat_inside_window_is_suppressed_then_summarised():
+    sender = StubSender()
+    notifier = Notifier(sender, batch_interval=0.01, dedupe_window=0.3)
+    notifier.send("gas spike", key="gas")
+    sender.wait_for(1)
+    notifier.send("gas spike again", key="gas")
+    notifier.send("gas spike again", key="gas")
+    time.sleep(0.1)
+    assert sender.messages == ["gas spike"]
+    # 時間窗結束後補送一則摘要（沿用第一則的內容）
+    assert sender.wait_for(2)[1] == "gas spike\n（另有 2 則相同訊息已合併）"
+    notifier.close()
+
+
+def test_batch_respects_max_chars():
+    sender = StubSender()
+    notifier = Notifier(sender, batch_interval=0.2, max_batch_chars=25)
+    notifier.send("warmup")
+    sender.wait_for(1)
+    notifier.send("x" * 15)
+    notifier.send("y" * 15)
+    notifier.close()
+    assert sender.messages[1:] == ["x" * 15, "y" * 15]
+
+
+def test_full_queue_drops_and_failed_send_is_counted():
+    sender = StubSender(fail=True)
+    notifier = Notifier(sender, maxsize=1, batch_interval=0.2)
+    notifier.send("one")
+    time.sleep(0.05)
+    notifier.send("two")
+    notifier.send("three")
+    notifier.close()
+    assert notifier.dropped == 1
+    assert notifier.failed == 2 and notifier.sent == 0
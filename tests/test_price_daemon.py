@@ -0,0 +1,35 @@
+from price_daemon import PriceDaemon
+
+CALL = {"to": "0xAbC", "data": "0x1234"}
+
+
+class FakeRPC:
+    def __init__(self):
+        self.batches = []
+
+    def call_many(self, calls):
+        self.batches.append(calls)
+        return [f"0x{len(self.batches):x}"] * len(calls)
+
+
+def test_latest_and_hex_tags_share_the_block_cache():
+    rpc = FakeRPC()
+    daemon = PriceDaemon(rpc)
+    daemon.block = 100
+    first = daemon.call_many([("eth_call", [CALL, "latest"])])
+    again = daemon.call_many([("eth_call", [CALL, hex(100)]), ("eth_call", [CALL, 100])])
+    assert again == first * 2
+    assert len(rpc.batches) == 1
+    assert daemon.stats()["hits"] == 2
+
+
+def test_named_block_tags_pass_through_uncached():
+    rpc = FakeRPC()
+    daemon = PriceDaemon(rpc)
+    daemon.block = 100
+    tags = ["pending", "earliest", "safe", "finalized"]
+    daemon.call_many([("eth_call", [CALL, tag]) for tag in tags])
+    daemon.call_many([("eth_call", [CALL, tag]) for tag in tags])
+    assert len(rpc.batches) == 2
+    assert [params[1] for _, params in rpc.batches[0]] == tags
+    assert daemon.stats()["hits"] == 0
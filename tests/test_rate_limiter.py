@@ -0,0 +1,97 @@
+import io
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import transport
+from rate_limiter import EXECUTION, MONITOR, RateLimiter, priority
+from transport import MeteredAdapter
+
+HOST = "node-a"
+URL = "http://node-a/"
+
+
+def test_execution_preempts_waiting_monitor():
+    limiter = RateLimiter({HOST: (10.0, 1)})
+    limiter.acquire(HOST)          # 桶清空，之後每 0.1 秒才有一個令牌
+    order = []
+
+    def worker(level, name):
+        with priority(level):
+            limiter.acquire(HOST)
+        order.append(name)
+
+    monitor = threading.Thread(target=worker, args=(MONITOR, "monitor"))
+    monitor.start()
+    time.sleep(0.02)
+    execution = threading.Thread(target=worker, args=(EXECUTION, "execution"))
+    execution.start()
+    monitor.join(2)
+    execution.join(2)
+    # 監控先排隊，但交易執行等級在等待時監控讓路
+    assert order == ["execution", "monitor"]
+
+
+def test_batch_larger_than_burst_goes_into_debt():
+    limiter = RateLimiter({HOST: (20.0, 2)})
+    start = time.monotonic()
+    limiter.acquire(HOST, cost=5)            # 桶滿即可送出，欠 3 個令牌
+    assert time.monotonic() - start < 0.05
+    limiter.acquire(HOST)                    # 需先還清欠款：(1 + 3) / 20 = 0.2 秒
+    assert time.monotonic() - start >= 0.18
+    assert limiter.throttled == 1
+
+
+def test_penalize_pauses_host_and_pick_avoids_it():
+    limiter = RateLimiter.for_urls(["http://node-a", "http://node-b"])
+    limiter.penalize("node-a", 0.2)
+    assert limiter.pick(["http://node-a", "http://node-b"], preferred="http://node-a") == "http://node-b"
+    start = time.monotonic()
+    limiter.acquire("node-a")
+    assert time.monotonic() - start >= 0.18
+    assert limiter.rate_limited == 1
+
+
+def _response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = b"{}"
+    resp.raw = io.BytesIO(b"{}")
+    return resp
+
+
+def test_adapter_retries_after_429(monkeypatch):
+    replies = [_response(429, {"Retry-After": "0.2"}), _response(200)]
+    sent = []
+
+    def fake_send(self, request, **kwargs):
+        sent.append(time.monotonic())
+        return replies.pop(0)
+
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+    limiter = RateLimiter({HOST: (100.0, 10)})
+    monkeypatch.setattr(transport, "_limiter", limiter)
+    body = '[{"jsonrpc":"2.0","id":0,"method":"eth_blockNumber"},{"jsonrpc":"2.0","id":1,"method":"eth_chainId"}]'
+    request = requests.Request("POST", URL, data=body).prepare()
+    resp = MeteredAdapter().send(request)
+    # 429 不丟給呼叫端：節點暫停 Retry-After 秒後重新排隊送出
+    assert resp.status_code == 200
+    assert len(sent) == 2 and sent[1] - sent[0] >= 0.18
+    assert limiter.rate_limited == 1
+
+
+def test_adapter_gives_up_after_max_retries(monkeypatch):
+    sent = []
+
+    def fake_send(self, request, **kwargs):
+        sent.append(request)
+        return _response(429, {"Retry-After": "0.01"})
+
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+    monkeypatch.setattr(transport, "_limiter", RateLimiter({HOST: (100.0, 10)}))
+    request = requests.Request("POST", URL, data="{}").prepare()
+    assert MeteredAdapter().send(request).status_code == 429
+    assert len(sent) == transport.MAX_RATE_RETRIES + 1
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from receipts import ReceiptTracker
+
+TX = "0x" + "ab" * 32
+
+
+class FakeClock:
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, fn):
+        self.subscribers.append(fn)
+
+    def tick(self, block):
+        for fn in self.subscribers:
+            fn(block)
+
+
+class SlowTracker(ReceiptTracker):
+    """以假收據取代 HTTP 批次查詢；每次查詢固定耗時"""
+
+    def __init__(self, delay):
+        super().__init__("http://node-a")
+        self.delay = delay
+        self.queried = []
+
+    def fetch_many(self, tx_hashes):
+        self.queried.append(self.rpc_url)
+        time.sleep(self.delay)
+        return {h: {"status": 1, "transactionHash": h} for h in tx_hashes}
+
+
+def test_clock_callback_does_not_block_on_receipt_poll():
+    clock, tracker = FakeClock(), SlowTracker(delay=0.3)
+    tracker.attach(clock)
+    seen = []
+    future = tracker.track(TX, callback=lambda r: seen.append(threading.current_thread().name))
+    start = time.perf_counter()
+    clock.tick(10)
+    assert time.perf_counter() - start < 0.05
+    assert future.result(2)["status"] == 1
+    # 交易回呼在收據執行緒上執行，不在區塊時鐘的執行緒
+    assert seen == ["receipts"]
+
+
+def test_set_url_switches_receipt_node():
+    clock, tracker = FakeClock(), SlowTracker(delay=0)
+    tracker.attach(clock)
+    tracker.set_url("http://node-b")
+    tracker.track(TX)
+    clock.tick(11)
+    tracker.wait(TX, timeout=2)
+    assert tracker.queried == ["http://node-b"]
@@ -0,0 +1,28 @@
+from array import array
+
+from records import QuoteTable
+
+
+def make_table():
+    return QuoteTable(["pancake", "Biswap", "pancakeV3"],
+                      array("d", [600.0, 601.0, 590.0]),
+                      array("d", [602.0, 603.0, 620.0]))
+
+
+def test_best_opportunity_picks_widest_spread():
+    opp = make_table().best_opportunity()
+    assert (opp.buy_dex, opp.sell_dex) == ("pancake", "pancakeV3")
+    assert opp.spread == 20.0
+
+
+def test_best_opportunity_limited_to_executable_venues():
+    opp = make_table().best_opportunity(venues=["pancake", "Biswap"])
+    assert (opp.buy_dex, opp.sell_dex) == ("pancake", "Biswap")
+    assert make_table().best_opportunity(5.0, venues=["pancake", "Biswap"]) is None
+
+
+def test_missing_quotes_are_skipped():
+    table = make_table()
+    table.set(2, float("nan"), float("nan"))
+    assert len(table) == 2
+    assert "pancakeV3" not in table.as_dict()
@@ -0,0 +1,69 @@
+from eth_abi import decode, encode
+
+import simulation
+from abi_codec import SEL_SWAP_EXACT_TOKENS
+from rpc_client import RPCError
+from simulation import simulate_plan
+
+OWNER = "0x" + "1" * 40
+USDT = "0x55d398326f99059fF775485246999027B3197955"
+WBNB = "0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"
+ROUTER_A, ROUTER_B = "0x" + "a" * 40, "0x" + "b" * 40
+
+
+def fake_batch(rates, fail=()):
+    """依 (路由, 輸入代幣) 的固定匯率回傳 swapExactTokensForTokens 的 amounts[]"""
+    batches = []
+
+    def rpc_batch(session, url, calls):
+        batches.append(calls)
+        out = []
+        for _, params in calls:
+            tx = params[0]
+            assert tx["data"].startswith(SEL_SWAP_EXACT_TOKENS)
+            amount_in, _, path, _, _ = decode(["uint256", "uint256", "address[]", "address", "uint256"],
+                                              bytes.fromhex(tx["data"][10:]))
+            if tx["to"] in fail:
+                out.append(RPCError({"code": 3, "message": "execution reverted"}))
+                continue
+            amount_out = amount_in * rates[(tx["to"], path[0].lower())] // 100
+            out.append("0x" + encode(["uint256[]"], [[amount_in, amount_out]]).hex())
+        return out
+
+    return rpc_batch, batches
+
+
+def plan():
+    return [
+        {"router": ROUTER_A, "path": [USDT, WBNB], "amount_in": 600, "min_out": 1},
+        {"router": ROUTER_B, "path": [USDT, WBNB], "amount_in": 400, "min_out": 1},
+        {"router": ROUTER_A, "path": [WBNB, USDT], "amount_in": None, "min_out": 0},
+    ]
+
+
+def test_sell_leg_chains_simulated_buy_outputs(monkeypatch):
+    rpc_batch, batches = fake_batch({(ROUTER_A, USDT.lower()): 50, (ROUTER_B, USDT.lower()): 25,
+                                     (ROUTER_A, WBNB.lower()): 210})
+    monkeypatch.setattr(simulation, "rpc_batch", rpc_batch)
+    sim = simulate_plan(None, "http://node", OWNER, plan(), block=100)
+    assert sim.ok
+    assert [len(b) for b in batches] == [2, 1]
+    assert sim.legs[2].amount_in == 300 + 100
+    assert sim.amount_out == 400 * 210 // 100
+
+
+def test_failed_buy_leg_stops_the_plan(monkeypatch):
+    rpc_batch, batches = fake_batch({(ROUTER_A, USDT.lower()): 50}, fail=(ROUTER_B,))
+    monkeypatch.setattr(simulation, "rpc_batch", rpc_batch)
+    sim = simulate_plan(None, "http://node", OWNER, plan())
+    assert not sim.ok
+    assert len(batches) == 1
+    assert sim.errors == ["交易模擬失敗: execution reverted"]
+
+
+def test_output_below_min_out_is_an_error(monkeypatch):
+    rpc_batch, _ = fake_batch({(ROUTER_A, USDT.lower()): 50})
+    monkeypatch.setattr(simulation, "rpc_batch", rpc_batch)
+    legs = [{"router": ROUTER_A, "path": [USDT, WBNB], "amount_in": 600, "min_out": 301}]
+    sim = simulate_plan(None, "http://node", OWNER, legs)
+    assert not sim.ok and sim.amount_out == 300
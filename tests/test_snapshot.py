@@ -0,0 +1,83 @@
+import math
+
+from snapshot import SnapshotBuffer
+
+KEYS = ["pancake", "Biswap"]
+
+
+class InterleavedView:
+    """包住 float64 視角：讀取端第一次複製緩衝時，讓寫入端插隊完成一次發布並寫到一半"""
+
+    def __init__(self, buf: SnapshotBuffer, on_copy):
+        self.view = buf._d
+        self.on_copy = on_copy
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and self.on_copy is not None:
+            hook, self.on_copy = self.on_copy, None
+            hook()
+        return self.view[index]
+
+    def __setitem__(self, index, value):
+        self.view[index] = value
+
+
+def rows(buy, sell):
+    return {k: {"buy_price": buy + i, "sell_price": sell + i} for i, k in enumerate(KEYS)}
+
+
+def test_empty_buffer_reads_all_missing():
+    snap = SnapshotBuffer(KEYS).read()
+    assert snap.seq == 0 and not snap
+    assert all(math.isnan(v) for v in snap.values)
+
+
+def test_publish_then_read_round_trip():
+    buf = SnapshotBuffer(KEYS)
+    assert buf.publish(rows(600.0, 601.0), block=7, timestamp=1.5) == 1
+    snap = buf.read()
+    assert (snap.seq, snap.block, snap.timestamp) == (1, 7, 1.5)
+    assert snap.get("Biswap") == {"buy_price": 601.0, "sell_price": 602.0}
+    assert snap.as_dict() == rows(600.0, 601.0)
+
+
+def test_missing_fields_are_none():
+    buf = SnapshotBuffer(KEYS)
+    buf.publish({"pancake": {"buy_price": 1.0}})
+    snap = buf.read()
+    assert snap.get("pancake") == {"buy_price": 1.0, "sell_price": None}
+    assert snap.get("Biswap") is None
+
+
+def test_read_rejects_buffer_overwritten_during_copy():
+    """讀取端複製 seq 1 的緩衝時，寫入端完成 seq 2、又開始覆寫同一份緩衝（seq 3 寫到一半）"""
+    buf = SnapshotBuffer(KEYS)
+    buf.publish(rows(100.0, 101.0), block=1)
+
+    def writer_laps_reader():
+        buf._d = view.view
+        buf.publish(rows(200.0, 201.0), block=2)
+        # seq 3 會寫回 seq 1 用過的緩衝：只寫了第一個值就被打斷
+        base = buf._base(3 & 1)
+        buf._d[base + 2] = 300.0
+        buf._d = view
+
+    view = InterleavedView(buf, writer_laps_reader)
+    buf._d = view
+    snap = buf.read()
+    buf._d = view.view
+    assert buf.retries == 1
+    assert snap.seq == 2 and snap.block == 2
+    assert snap.as_dict() == rows(200.0, 201.0)
+
+
+def test_shared_memory_attach():
+    name = "test_snapshot_shm"
+    writer = SnapshotBuffer(KEYS, name=name)
+    try:
+        writer.publish(rows(10.0, 11.0), block=3)
+        reader = SnapshotBuffer.attach(name, KEYS)
+        assert reader.read().as_dict() == rows(10.0, 11.0)
+        reader.close()
+    finally:
+        writer.close(unlink=True)
@@ -0,0 +1,70 @@
+import pytest
+
+from amm import get_amount_out
+from split_optimizer import Route, optimize_split
+
+R = 10**24                          # 每個池一百萬（18 位精度）
+FEE = 25
+
+
+def route(key, reserve_in=R, reserve_out=R, pool=None, fee=FEE):
+    return Route(key, ["A", "B"], [(reserve_in, reserve_out, fee)], [pool or f"0x{key}"])
+
+
+def test_marginal_matches_finite_difference():
+    r = Route("r", ["A", "B", "C"], [(R, 2 * R, 25), (3 * R, R, 30)])
+    x, h = 10**22, 10**15
+    numeric = (r.amount_out(x + h) - r.amount_out(x)) / h
+    assert r.marginal(x) == pytest.approx(numeric, rel=1e-6)
+
+
+def test_identical_pools_split_evenly():
+    amount = 10**23
+    plan = optimize_split(amount, [route("a"), route("b")])
+    assert len(plan) == 2
+    assert sum(leg.amount_in for leg in plan.legs) == amount
+    for leg in plan.legs:
+        assert leg.amount_in == pytest.approx(amount / 2, rel=1e-6)
+    assert plan.amount_out == pytest.approx(2 * get_amount_out(amount // 2, R, R, FEE), rel=1e-9)
+    assert plan.gain > 0
+
+
+def test_split_never_worse_than_single_route():
+    routes = [route("a"), route("b", R // 4, R // 4), route("c", 2 * R, 2 * R, fee=30)]
+    for amount in (10**18, 10**21, 10**23, 5 * 10**23):
+        plan = optimize_split(amount, routes)
+        assert sum(leg.amount_in for leg in plan.legs) == amount
+        assert plan.amount_out >= plan.single_out
+        # 各腿輸出就是該路徑在分配量下的實際輸出
+        by_key = {r.key: r for r in routes}
+        for leg in plan.legs:
+            assert leg.amount_out == by_key[leg.key].amount_out(leg.amount_in)
+
+
+def test_deeper_pool_gets_larger_share():
+    plan = optimize_split(10**23, [route("shallow", R // 2, R // 2), route("deep", 4 * R, 4 * R)])
+    legs = {leg.key: leg.amount_in for leg in plan.legs}
+    assert legs["deep"] > legs["shallow"]
+
+
+def test_leg_cost_keeps_single_route():
+    plan = optimize_split(10**23, [route("a"), route("b")], leg_cost=10**30)
+    assert len(plan) == 1
+    assert plan.gain == 0
+
+
+def test_small_order_is_not_split():
+    # 金額極小時拆單增益低於一腿成本
+    plan = optimize_split(10**15, [route("a"), route("b")], leg_cost=10**12)
+    assert len(plan) == 1
+
+
+def test_routes_sharing_a_pool_are_not_split():
+    plan = optimize_split(10**23, [route("a", pool="0xsame"), route("b", pool="0xSAME")])
+    assert len(plan) == 1
+
+
+def test_no_usable_route():
+    assert optimize_split(0, [route("a")]) is None
+    assert optimize_split(10**18, []) is None
+    assert optimize_split(10**18, [Route("empty", ["A", "B"], [])]) is None
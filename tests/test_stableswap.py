@@ -0,0 +1,93 @@
+from abi_codec import address_word, uint_word
+from stableswap import (PRECISION, SEL_A, SEL_BALANCES, SEL_COINS, SEL_EXCHANGE, SEL_FEE, StablePool,
+                        get_D, get_dy, get_y)
+
+AMP = 1000
+FEE = 4000000                      # 0.04%（FEE_DENOMINATOR = 10**10）
+RATES = [PRECISION] * 3
+BALANCED = [10**24] * 3            # 每幣一百萬
+
+
+def test_get_D_balanced_pool_equals_sum():
+    assert abs(get_D(BALANCED, AMP) - sum(BALANCED)) <= 1
+    assert get_D([0, 0, 0], AMP) == 0
+
+
+def test_get_y_keeps_invariant():
+    x = BALANCED[0] + 10**22
+    y = get_y(0, 1, x, BALANCED, AMP)
+    d_before = get_D(BALANCED, AMP)
+    d_after = get_D([x, y, BALANCED[2]], AMP)
+    assert abs(d_after - d_before) <= 2
+
+
+def test_get_dy_below_dx_and_near_par_on_balanced_pool():
+    dx = 10**21
+    dy = get_dy(0, 1, dx, BALANCED, RATES, AMP, FEE)
+    assert dy < dx
+    # 平衡池小額互換幾乎 1:1，只差手續費
+    assert dy > dx * (10**10 - FEE) // 10**10 * 0.9999
+
+
+def test_get_dy_monotonic_and_concave():
+    sizes = [10**21 * k for k in (1, 10, 100, 500)]
+    outs = [get_dy(0, 1, dx, BALANCED, RATES, AMP, FEE) for dx in sizes]
+    assert outs == sorted(outs)
+    rates = [out / dx for out, dx in zip(outs, sizes)]
+    assert rates == sorted(rates, reverse=True)
+
+
+def test_get_dy_prefers_swapping_into_abundant_coin():
+    skewed = [10**24, 3 * 10**23, 10**24]
+    dx = 10**22
+    into_scarce = get_dy(0, 1, dx, skewed, RATES, AMP, FEE)
+    out_of_scarce = get_dy(1, 0, dx, skewed, RATES, AMP, FEE)
+    assert into_scarce < dx < out_of_scarce
+
+
+def test_higher_amp_means_less_slippage():
+    dx = 2 * 10**23
+    assert get_dy(0, 1, dx, BALANCED, RATES, 2000, FEE) > get_dy(0, 1, dx, BALANCED, RATES, 100, FEE)
+
+
+class FakeRPC:
+    coins = ["0x" + c * 40 for c in "abc"]
+
+    def __init__(self):
+        self.batches = 0
+
+    def call_many(self, calls):
+        self.batches += 1
+        out = []
+        for _, (tx, _tag) in calls:
+            data = tx["data"]
+            if data.startswith(SEL_COINS):
+                out.append("0x" + address_word(self.coins[int(data[10:], 16)]))
+            elif data.startswith(SEL_BALANCES):
+                out.append("0x" + uint_word(BALANCED[int(data[10:], 16)]))
+            elif data == SEL_A:
+                out.append("0x" + uint_word(AMP))
+            elif data == SEL_FEE:
+                out.append("0x" + uint_word(FEE))
+        return out
+
+
+def test_stable_pool_load_and_quote():
+    rpc = FakeRPC()
+    pool = StablePool(rpc, "0xpool").load(100)
+    a, b, _ = FakeRPC.coins
+    assert pool.coins == FakeRPC.coins
+    assert pool.amount_out(a.upper().replace("0X", "0x"), b, 10**21) == get_dy(0, 1, 10**21, BALANCED, RATES, AMP, FEE)
+    assert pool.amount_out(a, "0x" + "d" * 40, 10**21) == 0
+    # 同一區塊不重複讀取
+    pool.load(100)
+    assert rpc.batches == 1
+    data = pool.exchange_data(a, b, 5, 4)
+    assert data == SEL_EXCHANGE + uint_word(0) + uint_word(1) + uint_word(5) + uint_word(4)
+
+
+def test_unloaded_pool_quotes_zero():
+    pool = StablePool(FakeRPC(), "0xpool")
+    assert not pool
+    assert pool.get_dy(0, 1, 10**21) == 0
+    assert not pool.has("0x" + "a" * 40, "0x" + "b" * 40)
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from v3_pool import (MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK, Q96, V3Pool,
+                     get_sqrt_ratio_at_tick)
+
+TOKEN0 = "0x" + "0" * 39 + "a"
+TOKEN1 = "0x" + "0" * 39 + "b"
+LIQUIDITY = 10**24
+
+
+def make_pool(fee: int = 500, lower: int = -6000, upper: int = 6000) -> V3Pool:
+    """tick 0（價格 1）附近單一區間 [lower, upper) 的流動性"""
+    pool = V3Pool("0xpool", TOKEN0, TOKEN1, fee)
+    pool.apply_swap(get_sqrt_ratio_at_tick(0), LIQUIDITY, 0)
+    pool.set_ticks({lower: LIQUIDITY, upper: -LIQUIDITY}, lower, upper)
+    return pool
+
+
+def test_sqrt_ratio_at_tick_bounds():
+    assert get_sqrt_ratio_at_tick(0) == Q96
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MAX_TICK + 1)
+
+
+def test_sqrt_ratio_matches_price():
+    for tick in (-50000, -1, 1, 12345, 200000):
+        price = (get_sqrt_ratio_at_tick(tick) / Q96) ** 2
+        assert math.isclose(price, 1.0001 ** tick, rel_tol=1e-9)
+
+
+@pytest.mark.parametrize("token_in", [TOKEN0, TOKEN1])
+def test_single_tick_swap_matches_constant_product(token_in):
+    """區間內的交換與虛擬儲備 x·y = L² 相同（扣除手續費後的輸入）"""
+    pool = make_pool()
+    amount_in = 10**21
+    x = LIQUIDITY * Q96 // pool.sqrt_price
+    y = LIQUIDITY * pool.sqrt_price // Q96
+    reserve_in, reserve_out = (x, y) if token_in == TOKEN0 else (y, x)
+    net_in = amount_in * (10**6 - pool.fee) // 10**6
+    expected = reserve_out - LIQUIDITY**2 // (reserve_in + net_in)
+    out = pool.amount_out(token_in, amount_in)
+    assert out <= expected
+    assert expected - out <= 2
+
+
+def test_amount_out_monotonic_and_below_input():
+    pool = make_pool()
+    outs = [pool.amount_out(TOKEN0, 10**18 * k) for k in (1, 10, 100, 1000, 10000)]
+    assert outs == sorted(outs)
+    # 價格 1 附近：輸出一定少於輸入（手續費與價格衝擊）
+    for k, out in zip((1, 10, 100, 1000, 10000), outs):
+        assert 0 < out < 10**18 * k
+
+
+def test_swap_beyond_loaded_range_raises():
+    pool = make_pool()
+    pool.set_ticks({}, -60, 60)
+    with pytest.raises(ValueError):
+        pool.amount_out(TOKEN1, 10**24)
+
+
+def test_apply_liquidity_inside_range_updates_active_liquidity():
+    pool = make_pool()
+    before = pool.amount_out(TOKEN0, 10**22)
+    pool.apply_liquidity(-600, 600, LIQUIDITY)
+    assert pool.liquidity == 2 * LIQUIDITY
+    assert pool.amount_out(TOKEN0, 10**22) > before
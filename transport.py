@@ -0,0 +1,176 @@
+import time
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+from rate_limiter import RateLimiter
+
+# --------------------------
+# 共用 HTTP 傳輸層（長連線池 + 連線指標）
+# --------------------------
+# 全部模組（Web3 provider、批次 RPC、收據追蹤、Telegram）共用同一個
+# Session，切換節點或新建 provider 都沿用已暖機的 keep-alive 連線，
+# 報價路徑上不再有 TCP/TLS 握手。
+# 註：requests/urllib3 不支援 HTTP/1.1 pipelining，多筆讀取請改用
+# JSON-RPC 批次請求以單一往返送出。
+DEFAULT_POOL_SIZE = 16
+DEFAULT_TIMEOUT = 10
+MAX_RATE_RETRIES = 3     # 收到 429 時排隊重送的次數
+
+
+class _HostStats:
+    __slots__ = ("requests", "errors", "latency", "max_latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+
+def _rpc_cost(body) -> int:
+    """JSON-RPC 請求中的呼叫數（批次依呼叫數扣令牌）"""
+    if not body:
+        return 1
+    if isinstance(body, str):
+        body = body.encode()
+    return max(body.count(b'"jsonrpc"'), 1)
+
+
+def _retry_after(resp) -> float:
+    try:
+        return float(resp.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class MeteredAdapter(HTTPAdapter):
+    """記錄每個主機的請求數、錯誤與延遲；設定限流器時依主機令牌桶排隊送出"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {}
+        self.pools = {}          # 主機 -> urllib3 連線池（用於統計實際建立的連線數）
+        self._stats_lock = threading.Lock()
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        host = urlsplit(request.url).netloc
+        if self.pools.get(host) is not pool:
+            with self._stats_lock:
+                self.pools[host] = pool
+        return pool
+
+    def resize(self, pool_size: int):
+        """調整之後新建的每主機連線池上限（PoolManager 公開的 connection_pool_kw）；
+        已建立的主機池維持原大小繼續使用，不重建、不丟棄已暖機的連線"""
+        self.poolmanager.connection_pool_kw["maxsize"] = pool_size
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).netloc
+        limiter = _limiter
+        if limiter is None or not limiter.limited(host):
+            return self._send(host, request, **kwargs)
+        cost = _rpc_cost(request.body)
+        for attempt in range(MAX_RATE_RETRIES + 1):
+            limiter.acquire(host, cost)
+            resp = self._send(host, request, **kwargs)
+            if resp.status_code != 429 or attempt == MAX_RATE_RETRIES:
+                return resp
+            # 被節點限流：暫停該節點後重新排隊，不直接把錯誤丟給呼叫端
+            limiter.penalize(host, _retry_after(resp))
+            resp.close()
+        return resp
+
+    def _send(self, host, request, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            resp = super().send(request, **kwargs)
+            error = resp.status_code >= 400
+            return resp
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                st = self.stats.setdefault(host, _HostStats())
+                st.requests += 1
+                st.errors += error
+                st.latency += elapsed
+                st.max_latency = max(st.max_latency, elapsed)
+
+
+_lock = threading.Lock()
+_session = None
+_adapter = None
+_pool_size = DEFAULT_POOL_SIZE
+_limiter = None
+
+
+def _build(pool_size: int):
+    session = requests.Session()
+    adapter = MeteredAdapter(pool_connections=8, pool_maxsize=pool_size, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+    return session, adapter
+
+
+def get_session() -> requests.Session:
+    """取得全域共用 Session（首次呼叫時建立）"""
+    global _session, _adapter
+    with _lock:
+        if _session is None:
+            _session, _adapter = _build(_pool_size)
+        return _session
+
+
+def set_pool_size(workers: int):
+    """連線池大小對齊並行工作數；請在首次請求前呼叫，Session 已建立時只影響之後新連線的主機"""
+    global _pool_size
+    with _lock:
+        _pool_size = max(workers, 1)
+        if _adapter is not None:
+            _adapter.resize(_pool_size)
+
+
+def set_rate_limiter(limiter: RateLimiter):
+    """之後經共用 Session 送出的請求都依節點令牌桶排隊"""
+    global _limiter
+    _limiter = limiter
+
+
+def get_rate_limiter():
+    return _limiter
+
+
+def make_provider(url: str, timeout: float = DEFAULT_TIMEOUT) -> Web3.HTTPProvider:
+    """建立使用共用 Session 的 HTTPProvider"""
+    return Web3.HTTPProvider(url, request_kwargs={"timeout": timeout}, session=get_session())
+
+
+def metrics() -> dict:
+    """各主機的請求數、錯誤數、平均/最大延遲與實際建立的連線數"""
+    with _lock:
+        adapter = _adapter
+    if adapter is None:
+        return {}
+    result = {}
+    with adapter._stats_lock:
+        for host, st in adapter.stats.items():
+            pool = adapter.pools.get(host)
+            conns = pool.num_connections if pool is not None else 0
+            result[host] = {
+                "requests": st.requests,
+                "errors": st.errors,
+                "avg_ms": round(st.latency / st.requests * 1000, 2) if st.requests else 0,
+                "max_ms": round(st.max_latency * 1000, 2),
+                "connections": conns,
+                "reused": max(st.requests - conns, 0),
+            }
+    return result
@@ -0,0 +1,369 @@
+from bisect import bisect_right, insort
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from abi_codec import abi_view, address_word, decode_address, read_word, uint_word, ZERO_ADDRESS
+
+# --------------------------
+# 集中流動性（V3）池本地鏡像
+# --------------------------
+# 與 UniswapV3 / PancakeSwap V3 合約相同的整數運算（TickMath、SqrtPriceMath、
+# SwapMath）：載入一次 slot0、liquidity 與目前價格附近已初始化的 tick，之後以
+# Swap/Mint/Burn 事件更新，任意規模的報價（含跨 tick）都在本地算出，不再打節點。
+# 只鏡像目前 tick 前後 words 個 bitmap 字組內的 tick；交易會越過已載入範圍時視為無法報價
+SEL_SLOT0 = "0x3850c7bd"            # slot0()
+SEL_LIQUIDITY = "0x1a686502"        # liquidity()
+SEL_TICK_BITMAP = "0x5339c296"      # tickBitmap(int16)
+SEL_TICKS = "0xf30dba93"            # ticks(int24)
+SEL_GET_POOL = "0x1698ee82"         # getPool(address,address,uint24)
+
+TOPIC_SWAP_PANCAKE = "0x19b47279256b2a23a1665c810c8d55a1758940ee09377d4f8d26497a3577dc83"
+TOPIC_SWAP_UNISWAP = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
+TOPIC_MINT = "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde"
+TOPIC_BURN = "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c"
+
+PANCAKE_V3_FEES = (100, 500, 2500, 10000)                           # 手續費（百萬分之一）
+FEE_TICK_SPACING = {100: 1, 500: 10, 2500: 50, 3000: 60, 10000: 200}
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+Q96 = 1 << 96
+_UINT256 = 1 << 256
+
+
+def _int(v: int, bits: int = 256) -> int:
+    """uint 字轉有號整數"""
+    return v - (1 << bits) if v >= 1 << (bits - 1) else v
+
+
+def _signed_word(v: int) -> str:
+    return uint_word(v % _UINT256)
+
+
+# --------------------------
+# 合約數學（逐行對照 Solidity 版本）
+# --------------------------
+_TICK_RATIOS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"tick 超出範圍: {tick}")
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, mul in _TICK_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * mul) >> 128
+    if tick > 0:
+        ratio = (_UINT256 - 1) // ratio
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def _mul_div_up(a: int, b: int, d: int) -> int:
+    return -(-a * b // d)
+
+
+def _div_up(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def get_amount0_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    num1, num2 = liquidity << 96, sqrt_b - sqrt_a
+    if round_up:
+        return _div_up(_mul_div_up(num1, num2, sqrt_b), sqrt_a)
+    return num1 * num2 // sqrt_b // sqrt_a
+
+
+def get_amount1_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return _mul_div_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return liquidity * (sqrt_b - sqrt_a) // Q96
+
+
+def get_next_sqrt_price_from_input(sqrt_p: int, liquidity: int, amount_in: int, zero_for_one: bool) -> int:
+    if amount_in == 0:
+        return sqrt_p
+    if zero_for_one:
+        num1 = liquidity << 96
+        product = amount_in * sqrt_p
+        if product < _UINT256:
+            return _mul_div_up(num1, sqrt_p, num1 + product)
+        # 合約在乘積溢位時改用的公式（捨入方式不同）
+        return _div_up(num1, num1 // sqrt_p + amount_in)
+    return sqrt_p + (amount_in << 96) // liquidity
+
+
+def compute_swap_step(sqrt_p: int, sqrt_target: int, liquidity: int, amount_remaining: int,
+                      fee_pips: int) -> Tuple[int, int, int, int]:
+    """精確輸入的單步交換：回傳 (新價格, 輸入, 輸出, 手續費)"""
+    zero_for_one = sqrt_p >= sqrt_target
+    remaining_less_fee = amount_remaining * (10**6 - fee_pips) // 10**6
+    if zero_for_one:
+        amount_in = get_amount0_delta(sqrt_target, sqrt_p, liquidity, True)
+    else:
+        amount_in = get_amount1_delta(sqrt_p, sqrt_target, liquidity, True)
+    if remaining_less_fee >= amount_in:
+        sqrt_next = sqrt_target
+    else:
+        sqrt_next = get_next_sqrt_price_from_input(sqrt_p, liquidity, remaining_less_fee, zero_for_one)
+    reached = sqrt_next == sqrt_target
+    if zero_for_one:
+        if not reached:
+            amount_in = get_amount0_delta(sqrt_next, sqrt_p, liquidity, True)
+        amount_out = get_amount1_delta(sqrt_next, sqrt_p, liquidity, False)
+    else:
+        if not reached:
+            amount_in = get_amount1_delta(sqrt_p, sqrt_next, liquidity, True)
+        amount_out = get_amount0_delta(sqrt_p, sqrt_next, liquidity, False)
+    if not reached:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = _mul_div_up(amount_in, fee_pips, 10**6 - fee_pips)
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+
+# --------------------------
+# 單一池鏡像
+# --------------------------
+class V3Pool:
+    __slots__ = ("address", "token0", "token1", "fee", "tick_spacing", "sqrt_price", "tick",
+                 "liquidity", "ticks", "tick_list", "tick_lo", "tick_hi")
+
+    def __init__(self, address: str, token0: str, token1: str, fee: int):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tick_spacing = FEE_TICK_SPACING.get(fee, 1)
+        self.sqrt_price = 0
+        self.tick = 0
+        self.liquidity = 0
+        self.ticks: Dict[int, int] = {}     # 已初始化 tick -> liquidityNet
+        self.tick_list: List[int] = []      # 排序後的已初始化 tick
+        self.tick_lo = MIN_TICK             # 已載入 tick 的範圍
+        self.tick_hi = MAX_TICK
+
+    def __bool__(self):
+        return self.sqrt_price > 0
+
+    def set_ticks(self, ticks: Dict[int, int], lo: int, hi: int):
+        self.ticks = dict(ticks)
+        self.tick_list = sorted(self.ticks)
+        self.tick_lo, self.tick_hi = max(lo, MIN_TICK), min(hi, MAX_TICK)
+
+    def _next_tick(self, tick: int, zero_for_one: bool) -> Tuple[int, bool]:
+        """方向上下一個已初始化 tick；找不到時回傳已載入範圍的邊界（未初始化）"""
+        i = bisect_right(self.tick_list, tick)
+        if zero_for_one:
+            return (self.tick_list[i - 1], True) if i > 0 else (self.tick_lo, False)
+        return (self.tick_list[i], True) if i < len(self.tick_list) else (self.tick_hi, False)
+
+    def amount_out(self, token_in: str, amount_in: int) -> int:
+        """精確輸入報價（與合約 swap 相同的逐 tick 計算）；超出已載入範圍時拋出 ValueError"""
+        if amount_in <= 0 or not self:
+            return 0
+        zero_for_one = token_in.lower() == self.token0
+        sqrt_p, tick, liquidity = self.sqrt_price, self.tick, self.liquidity
+        limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        remaining, out = amount_in, 0
+        while remaining > 0 and sqrt_p != limit:
+            next_tick, initialized = self._next_tick(tick, zero_for_one)
+            sqrt_next = get_sqrt_ratio_at_tick(next_tick)
+            target = max(sqrt_next, limit) if zero_for_one else min(sqrt_next, limit)
+            sqrt_p, step_in, step_out, fee = compute_swap_step(sqrt_p, target, liquidity, remaining, self.fee)
+            remaining -= step_in + fee
+            out += step_out
+            if sqrt_p != sqrt_next:
+                break
+            if not initialized:
+                if remaining > 0:
+                    raise ValueError(f"交易超出已載入的 tick 範圍: {self.address}")
+                break
+            net = self.ticks[next_tick]
+            liquidity += -net if zero_for_one else net
+            tick = next_tick - 1 if zero_for_one else next_tick
+        return out
+
+    # 事件更新
+    def apply_swap(self, sqrt_price: int, liquidity: int, tick: int):
+        self.sqrt_price, self.liquidity, self.tick = sqrt_price, liquidity, tick
+
+    def apply_liquidity(self, tick_lower: int, tick_upper: int, amount: int):
+        """Mint（amount > 0）/ Burn（amount < 0）"""
+        for t, delta in ((tick_lower, amount), (tick_upper, -amount)):
+            if not self.tick_lo <= t <= self.tick_hi:
+                continue
+            if t not in self.ticks:
+                insort(self.tick_list, t)
+                self.ticks[t] = 0
+            self.ticks[t] += delta
+        if tick_lower <= self.tick < tick_upper:
+            self.liquidity += amount
+
+
+def _sort(token_a: str, token_b: str) -> Tuple[str, str]:
+    a, b = token_a.lower(), token_b.lower()
+    return (a, b) if a < b else (b, a)
+
+
+# --------------------------
+# 同一工廠的池集合（批次載入 + 事件同步）
+# --------------------------
+class V3PoolBook:
+    """池地址只查一次；首次載入用 4 個批次（地址、狀態、bitmap、tick），之後每個區塊一次 eth_getLogs"""
+
+    def __init__(self, rpc, factory: str, fees: Sequence[int] = PANCAKE_V3_FEES, words: int = 3,
+                 max_gap: int = 50):
+        self.rpc = rpc
+        self.factory = factory
+        self.fees = tuple(fees)
+        self.words = words
+        self.max_gap = max_gap
+        self.block = None                                        # 鏡像狀態對應的區塊
+        self.events = 0
+        self._pool_addr: Dict[Tuple[str, str, int], str] = {}   # (token0, token1, fee) -> 池地址
+        self.pools: Dict[str, V3Pool] = {}                       # 池地址 -> 鏡像
+
+    def _discover(self, keys: List[Tuple[str, str]]):
+        missing = [(a, b, f) for a, b in keys for f in self.fees if (a, b, f) not in self._pool_addr]
+        if not missing:
+            return []
+        results = self.rpc.call_many([
+            ("eth_call", [{"to": self.factory, "data": SEL_GET_POOL + address_word(a) + address_word(b) + uint_word(f)}, "latest"])
+            for a, b, f in missing])
+        new = []
+        for (a, b, f), res in zip(missing, results):
+            addr = decode_address(res) if isinstance(res, str) and len(res) > 2 else ZERO_ADDRESS
+            self._pool_addr[(a, b, f)] = addr
+            if addr != ZERO_ADDRESS:
+                self.pools[addr] = V3Pool(addr, a, b, f)
+                new.append(addr)
+        return new
+
+    def load(self, pools: Iterable[str], block="latest"):
+        """從鏈上完整載入指定池的狀態與附近的 tick"""
+        pools = [self.pools[p] for p in pools]
+        if not pools:
+            return
+        tag = hex(block) if isinstance(block, int) else block
+        calls = []
+        for p in pools:
+            calls.append(("eth_call", [{"to": p.address, "data": SEL_SLOT0}, tag]))
+            calls.append(("eth_call", [{"to": p.address, "data": SEL_LIQUIDITY}, tag]))
+        results = self.rpc.call_many(calls)
+        live = []
+        for i, p in enumerate(pools):
+            slot0, liq = results[2 * i], results[2 * i + 1]
+            if not (isinstance(slot0, str) and len(slot0) > 2 and isinstance(liq, str) and len(liq) > 2):
+                continue
+            mv = abi_view(slot0)
+            p.sqrt_price, p.tick = read_word(mv, 0), _int(read_word(mv, 1))
+            p.liquidity = read_word(abi_view(liq), 0)
+            live.append(p)
+
+        # 目前 tick 前後各 words 個 bitmap 字組（每字組 256 個 tick 間距）
+        word_calls, word_keys = [], []
+        for p in live:
+            center = (p.tick // p.tick_spacing) >> 8
+            for w in range(center - self.words, center + self.words + 1):
+                word_keys.append((p, w))
+                word_calls.append(("eth_call", [{"to": p.address, "data": SEL_TICK_BITMAP + _signed_word(w)}, tag]))
+        tick_keys = []
+        for (p, w), res in zip(word_keys, self.rpc.call_many(word_calls)):
+            bitmap = read_word(abi_view(res), 0) if isinstance(res, str) and len(res) > 2 else 0
+            while bitmap:
+                bit = (bitmap & -bitmap).bit_length() - 1
+                bitmap &= bitmap - 1
+                tick_keys.append((p, ((w << 8) + bit) * p.tick_spacing))
+        tick_results = self.rpc.call_many([
+            ("eth_call", [{"to": p.address, "data": SEL_TICKS + _signed_word(t)}, tag]) for p, t in tick_keys])
+        loaded: Dict[str, Dict[int, int]] = {p.address: {} for p in live}
+        for (p, t), res in zip(tick_keys, tick_results):
+            if isinstance(res, str) and len(res) > 2:
+                loaded[p.address][t] = _int(read_word(abi_view(res), 1))     # liquidityNet (int128)
+        for p in live:
+            center = (p.tick // p.tick_spacing) >> 8
+            lo = ((center - self.words) << 8) * p.tick_spacing
+            hi = ((center + self.words + 1) << 8) * p.tick_spacing - p.tick_spacing
+            p.set_ticks(loaded[p.address], lo, hi)
+
+    def sync(self, token_pairs: Iterable[Tuple[str, str]], block: int):
+        """把鏡像推進到 block：新交易對先完整載入；差距不大時只套用期間事件，否則重新載入"""
+        new = self._discover(list(dict.fromkeys(_sort(a, b) for a, b in token_pairs)))
+        if self.block is None or block - self.block > self.max_gap:
+            self.load(list(self.pools), block)
+        else:
+            if new:
+                self.load(new, block)
+            if block > self.block:
+                self._apply_logs(self.block + 1, block)
+        self.block = block
+
+    def _apply_logs(self, from_block: int, to_block: int):
+        if not self.pools:
+            return
+        logs = self.rpc.call("eth_getLogs", [{
+            "fromBlock": hex(from_block), "toBlock": hex(to_block), "address": list(self.pools),
+            "topics": [[TOPIC_SWAP_PANCAKE, TOPIC_SWAP_UNISWAP, TOPIC_MINT, TOPIC_BURN]]}])
+        for log in sorted(logs or [], key=lambda l: (int(l["blockNumber"], 16), int(l["logIndex"], 16))):
+            pool = self.pools.get(log["address"].lower())
+            if pool is None or log.get("removed"):
+                continue
+            topic, mv = log["topics"][0], abi_view(log["data"])
+            if topic in (TOPIC_SWAP_PANCAKE, TOPIC_SWAP_UNISWAP):
+                pool.apply_swap(read_word(mv, 2), read_word(mv, 3), _int(read_word(mv, 4)))
+            else:
+                lower, upper = _int(int(log["topics"][2], 16)), _int(int(log["topics"][3], 16))
+                # Mint 的 data 第一個字是 sender
+                amount = read_word(mv, 1) if topic == TOPIC_MINT else -read_word(mv, 0)
+                pool.apply_liquidity(lower, upper, amount)
+            self.events += 1
+
+    def pools_for(self, token_a: str, token_b: str) -> List[V3Pool]:
+        a, b = _sort(token_a, token_b)
+        out = []
+        for f in self.fees:
+            pool = self.pools.get(self._pool_addr.get((a, b, f), ZERO_ADDRESS))
+            if pool:
+                out.append(pool)
+        return out
+
+    def quote(self, amount_in: int, path: Sequence[str]) -> int:
+        """逐跳選輸出最多的手續費層級；任一跳無可用池時回傳 0"""
+        amount = amount_in
+        for token_in, token_out in zip(path, path[1:]):
+            best = 0
+            for pool in self.pools_for(token_in, token_out):
+                try:
+                    best = max(best, pool.amount_out(token_in, amount))
+                except ValueError:
+                    continue
+            if not best:
+                return 0
+            amount = best
+        return amount
@@ -0,0 +1,203 @@
+import threading
+from typing import Iterable, List, Optional, Sequence
+
+from eth_account import Account
+
+from abi_codec import encode_approve, encode_transfer
+from inflight import NonceManager
+from wallet_state import MAX_UINT256, WalletState
+
+# --------------------------
+# 多錢包執行池
+# --------------------------
+# 單一錢包時所有交易共用一條 nonce 序列與一份餘額，一筆卡住的交易會擋住後面全部。
+# 池內每個帳戶各自有 nonce 配發與餘額/授權快取，同一時間只處理一筆交易；
+# 互不衝突的機會分派到不同帳戶，可落在同一個區塊。
+# 帳戶間資金不均時由 rebalance() 從最寬裕的帳戶轉帳補足；
+# 啟動時由 prepare() 為每個帳戶補齊對各路由的無限授權
+CHAIN_ID = 56
+TRANSFER_GAS = 60000
+APPROVE_GAS = 100000
+BNB_TRANSFER_GAS = 21000
+
+
+def _raw(signed) -> str:
+    raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+    return "0x" + bytes(raw).hex()
+
+
+class PooledWallet:
+    __slots__ = ("address", "private_key", "nonces", "state", "busy", "trades", "stale")
+
+    def __init__(self, address, private_key, nonces, state):
+        self.address = address
+        self.private_key = private_key
+        self.nonces = nonces
+        self.state = state
+        self.busy = False
+        self.trades = 0
+        self.stale = False       # 快取已過時（例如再平衡轉帳上鏈），下次取用前重新載入
+
+    def sign(self, tx: dict) -> str:
+        return _raw(Account.sign_transaction(tx, self.private_key))
+
+
+class WalletPool:
+    def __init__(self, rpc, rpc_url: str, private_keys: Sequence[str], tokens: Iterable[str],
+                 spenders: Iterable[str], min_bnb: int = 5 * 10**16, receipts=None, broadcaster=None):
+        self.rpc = rpc
+        self.broadcaster = broadcaster
+        self.min_bnb = min_bnb
+        self.receipts = receipts
+        tokens, spenders = list(tokens), list(spenders)
+        self.wallets: List[PooledWallet] = []
+        for key in private_keys:
+            address = Account.from_key(key).address
+            self.wallets.append(PooledWallet(
+                address, key, NonceManager(rpc, address),
+                WalletState(rpc_url, address, tokens, spenders).load()))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.wallets)
+
+    def _reload(self, wallet: PooledWallet):
+        try:
+            wallet.state.load()
+            wallet.stale = False
+        except Exception as e:
+            print(f"⚠️ 帳戶 {wallet.address[:10]}… 餘額重新載入失敗: {e}")
+
+    def acquire(self, token: Optional[str] = None, amount: int = 0,
+                spender: Optional[str] = None) -> Optional[PooledWallet]:
+        """取出一個閒置、餘額足夠且已授權 spender 的帳戶（餘額最多者優先）；沒有時回傳 None"""
+        for w in [w for w in self.wallets if w.stale and not w.busy]:
+            self._reload(w)
+        with self._lock:
+            candidates = [w for w in self.wallets if not w.busy and w.state.bnb >= self.min_bnb
+                          and (token is None or w.state.balance(token) >= amount)
+                          and (token is None or spender is None or w.state.allowance(token, spender) >= amount)]
+            if not candidates:
+                return None
+            wallet = max(candidates, key=lambda w: w.state.balance(token) if token else w.state.bnb)
+            wallet.busy = True
+            return wallet
+
+    def release(self, wallet: PooledWallet, receipt=None):
+        """交易結束後歸還帳戶，並以收據更新該帳戶的快取；沒有收據時改從鏈上重新載入"""
+        if receipt is not None:
+            wallet.state.apply_receipt(receipt)
+            wallet.trades += 1
+        if receipt is None or wallet.stale:
+            self._reload(wallet)
+        with self._lock:
+            wallet.busy = False
+
+    def total_balance(self, token: str) -> int:
+        return sum(w.state.balance(token) for w in self.wallets)
+
+    def send(self, wallet: PooledWallet, tx: dict):
+        """以指定帳戶簽名送出；未送出就失敗時重新同步該帳戶的 nonce"""
+        try:
+            raw = wallet.sign(tx)
+            if self.broadcaster is not None:
+                # 同時送往所有節點，第一個確認即返回
+                return "0x" + bytes(self.broadcaster.send_raw(raw)).hex()
+            return self.rpc.call("eth_sendRawTransaction", [raw])
+        except Exception:
+            wallet.nonces.resync()
+            raise
+
+    def prepare(self, timeout: float = 180) -> bool:
+        """對每個帳戶缺少的 (代幣, 路由) 送出無限授權並等待上鏈；交易前不再逐筆檢查"""
+        ok = True
+        gas_price = None
+        for wallet in self.wallets:
+            for token, spender in wallet.state.missing_approvals():
+                gas_price = gas_price or self.rpc.gas_price()
+                tx = {
+                    "from": wallet.address,
+                    "to": token,
+                    "value": 0,
+                    "data": encode_approve(spender, MAX_UINT256),
+                    "gas": APPROVE_GAS,
+                    "gasPrice": gas_price,
+                    "nonce": wallet.nonces.next(),
+                    "chainId": CHAIN_ID,
+                }
+                try:
+                    txh = self.send(wallet, tx)
+                    print(f"🔐 帳戶 {wallet.address[:10]}… 授權 {token[:10]}… → {spender[:10]}… | {txh}")
+                    if self.receipts is None:
+                        wallet.stale = True
+                        continue
+                    receipt = self.receipts.wait(txh, timeout)
+                    if receipt["status"] != 1:
+                        raise RuntimeError("授權交易失敗")
+                    wallet.state.apply_receipt(receipt)
+                except Exception as e:
+                    print(f"❌ 帳戶 {wallet.address[:10]}… 授權失敗: {e}")
+                    ok = False
+        return ok
+
+    def rebalance(self, token: str, target: int) -> List[str]:
+        """把代幣（及 Gas 用 BNB）從最寬裕的閒置帳戶補給低於目標的帳戶"""
+        sent = []
+        with self._lock:
+            idle = [w for w in self.wallets if not w.busy]
+            if len(idle) < 2:
+                return sent
+            for w in idle:
+                w.busy = True
+        try:
+            gas_price = self.rpc.gas_price()
+            for need_bnb in (False, True):
+                for dst in idle:
+                    have = dst.state.bnb if need_bnb else dst.state.balance(token)
+                    floor = self.min_bnb * 2 if need_bnb else target
+                    if have >= floor:
+                        continue
+                    src = max(idle, key=lambda w: w.state.bnb if need_bnb else w.state.balance(token))
+                    src_have = src.state.bnb if need_bnb else src.state.balance(token)
+                    amount = floor - have
+                    # 來源帳戶轉出後仍需保有自己的目標額度
+                    if src is dst or src_have - amount < floor:
+                        continue
+                    tx = {
+                        "from": src.address,
+                        "to": dst.address if need_bnb else token,
+                        "value": amount if need_bnb else 0,
+                        "data": "0x" if need_bnb else encode_transfer(dst.address, amount),
+                        "gas": BNB_TRANSFER_GAS if need_bnb else TRANSFER_GAS,
+                        "gasPrice": gas_price,
+                        "nonce": src.nonces.next(),
+                        "chainId": CHAIN_ID,
+                    }
+                    txh = self.send(src, tx)
+                    sent.append(txh)
+                    kind = "BNB" if need_bnb else "代幣"
+                    print(f"🔁 資金再平衡（{kind}）: {src.address[:10]}… → {dst.address[:10]}… {amount} | {txh}")
+                    # 先在本地記帳，避免同一輪重複補給；上鏈後標記過時，
+                    # 由下次 acquire / release 重新載入（不在收據追蹤的區塊時鐘執行緒上讀鏈）
+                    if need_bnb:
+                        src.state.bnb -= amount
+                        dst.state.bnb += amount
+                    else:
+                        src.state.balances[token] = src_have - amount
+                        dst.state.balances[token] = have + amount
+                    if self.receipts is not None:
+                        self.receipts.track(txh, callback=lambda _r, a=src, b=dst: self._mark_stale(a, b))
+        finally:
+            with self._lock:
+                for w in idle:
+                    w.busy = False
+        return sent
+
+    @staticmethod
+    def _mark_stale(*wallets: PooledWallet):
+        for w in wallets:
+            w.stale = True
+
+    def stats(self) -> list:
+        return [{"address": w.address, "busy": w.busy, "trades": w.trades, "bnb": w.state.bnb}
+                for w in self.wallets]
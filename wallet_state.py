@@ -0,0 +1,130 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from abi_codec import encode_balance_of, encode_allowance, hex_str, topic_address
+from rpc_client import rpc_batch, RPCError
+from transport import get_session
+
+# --------------------------
+# 錢包狀態快取（餘額 / 授權額度）
+# --------------------------
+# 啟動時以一次批次請求載入，之後只依自己交易的收據與
+# Transfer / Approval 事件更新，交易前路徑完全不需讀鏈
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+APPROVAL_TOPIC = "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925"
+
+MAX_UINT256 = 2**256 - 1
+
+
+class WalletState:
+    """單一錢包的 BNB / 代幣餘額與授權額度快取"""
+
+    def __init__(self, rpc_url: str, owner: str, tokens: Iterable[str],
+                 spenders: Iterable[str], session: Optional[requests.Session] = None):
+        self.rpc_url = rpc_url
+        self.owner = owner
+        self.tokens = list(tokens)
+        self.spenders = list(spenders)
+        self.session = session or get_session()
+        self.bnb = 0
+        self.balances: Dict[str, int] = {}
+        self.allowances: Dict[Tuple[str, str], int] = {}
+        self._owner_lc = owner.lower()
+        self._lock = threading.Lock()
+
+    def load(self) -> "WalletState":
+        """一次批次請求讀取全部餘額與授權額度"""
+        owner = self.owner
+        calls = [("eth_getBalance", [owner, "latest"])]
+        for token in self.tokens:
+            calls.append(("eth_call", [{"to": token, "data": encode_balance_of(owner)}, "latest"]))
+        pairs = [(t, s) for t in self.tokens for s in self.spenders]
+        for token, spender in pairs:
+            calls.append(("eth_call", [{"to": token, "data": encode_allowance(owner, spender)}, "latest"]))
+        results = rpc_batch(self.session, self.rpc_url, calls)
+        for r in results:
+            if isinstance(r, RPCError):
+                raise r
+        with self._lock:
+            self.bnb = int(results[0], 16)
+            n = len(self.tokens)
+            for token, r in zip(self.tokens, results[1:1 + n]):
+                self.balances[token] = int(r, 16)
+            for key, r in zip(pairs, results[1 + n:]):
+                self.allowances[key] = int(r, 16)
+        return self
+
+    def balance(self, token: str) -> int:
+        return self.balances.get(token, 0)
+
+    def allowance(self, token: str, spender: str) -> int:
+        return self.allowances.get((token, spender), 0)
+
+    def missing_approvals(self, threshold: int = MAX_UINT256 // 2) -> List[Tuple[str, str]]:
+        """列出授權額度低於門檻、需要預先無限授權的 (代幣, 路由)"""
+        return [key for key in ((t, s) for t in self.tokens for s in self.spenders)
+                if self.allowance(*key) < threshold]
+
+    def apply_receipt(self, receipt):
+        """依自己交易的收據更新快取：Gas 費用、Transfer 與 Approval 事件"""
+        tx_from = hex_str(receipt.get("from") or "")
+        tx_to = receipt.get("to")
+        with self._lock:
+            if tx_from == self._owner_lc:
+                self.bnb -= receipt["gasUsed"] * receipt.get("effectiveGasPrice", 0)
+            for log in receipt.get("logs", []):
+                self._apply_log(log, tx_to)
+
+    def apply_logs(self, logs: Iterable[dict]):
+        """套用外部取得的 Transfer / Approval 事件（例如轉入資金）"""
+        with self._lock:
+            for log in logs:
+                self._apply_log(log, None)
+
+    def _apply_log(self, log: dict, tx_to: Optional[str]):
+        topics = log.get("topics") or []
+        if not topics:
+            return
+        token = self._token_key(log.get("address"))
+        if token is None:
+            return
+        sig = hex_str(topics[0])
+        data = hex_str(log.get("data") or "0x")
+        value = int(data, 16) if data != "0x" else 0
+        if sig == TRANSFER_TOPIC and len(topics) >= 3:
+            src, dst = topic_address(topics[1]), topic_address(topics[2])
+            if src == self._owner_lc:
+                self.balances[token] = self.balances.get(token, 0) - value
+                # 路由以 transferFrom 扣款，非無限額度時同步扣減授權
+                spender = self._spender_key(tx_to)
+                if spender is not None:
+                    key = (token, spender)
+                    if self.allowances.get(key, 0) < MAX_UINT256:
+                        self.allowances[key] = max(self.allowances.get(key, 0) - value, 0)
+            if dst == self._owner_lc:
+                self.balances[token] = self.balances.get(token, 0) + value
+        elif sig == APPROVAL_TOPIC and len(topics) >= 3:
+            if topic_address(topics[1]) == self._owner_lc:
+                spender = self._spender_key(topic_address(topics[2]))
+                if spender is not None:
+                    self.allowances[(token, spender)] = value
+
+    def _token_key(self, addr) -> Optional[str]:
+        if not addr:
+            return None
+        addr = hex_str(addr)
+        for token in self.tokens:
+            if token.lower() == addr:
+                return token
+        return None
+
+    def _spender_key(self, addr) -> Optional[str]:
+        if not addr:
+            return None
+        addr = hex_str(addr)
+        for spender in self.spenders:
+            if spender.lower() == addr:
+                return spender
+        return None
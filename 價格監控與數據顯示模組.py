@@ -1,10 +1,16 @@
 import json
-import time
 import os
 import concurrent.futures
 from web3 import Web3
-from web3.exceptions import ContractLogicError
 from dotenv import load_dotenv
+from dashboard import Dashboard
+from transport import make_provider, set_rate_limiter
+from rate_limiter import RateLimiter
+from rpc_client import BatchRPCClient
+from block_clock import BlockClock
+from abi_codec import FastRouter
+from quote_curve import curves_from_router
+from price_daemon import price_source
 
 # --------------------------
 # 初始化配置
@@ -17,6 +23,8 @@ BSC_RPC_URLS = [
     "https://bsc-dataseed2.binance.org",
     "https://bsc-dataseed3.binance.org"
 ]
+# 各節點令牌桶限流：超速時排隊等待，不再因 429 頻繁切換節點
+set_rate_limiter(RateLimiter.for_urls(BSC_RPC_URLS))
 
 # --------------------------
 # 完整合約 ABI 配置
@@ -47,12 +55,12 @@ class EnhancedWeb3:
         self.current_provider = 0
         self.w3 = self._connect()
         self._verify_connection()
+        # 零散讀取（區塊高度、Gas、餘額、nonce、收據）自動合併成批次請求
+        self.batch = BatchRPCClient(self.rpc_urls[self.current_provider], urls=self.rpc_urls)
 
     def _connect(self):
-        return Web3(Web3.HTTPProvider(
-            self.rpc_urls[self.current_provider],
-            request_kwargs={'timeout': 10}
-        ))
+        # 共用長連線池：切換節點時沿用已暖機的連線
+        return Web3(make_provider(self.rpc_urls[self.current_provider], timeout=10))
 
     def _verify_connection(self):
         if not self.w3.is_connected():
@@ -63,6 +71,7 @@ class EnhancedWeb3:
         print(f"切換到節點: {self.rpc_urls[self.current_provider]}")
         self.w3 = self._connect()
         self._verify_connection()
+        self.batch.set_url(self.rpc_urls[self.current_provider])
 
     def __getattr__(self, name):
         return getattr(self.w3, name)
@@ -91,6 +100,11 @@ class USDTPriceMonitor:
             'WBNB': [CONTRACT_ADDRESSES['usdt'], CONTRACT_ADDRESSES['wbnb']],
             'BUSD': [CONTRACT_ADDRESSES['usdt'], CONTRACT_ADDRESSES['busd']]
         }
+        # 每個交易所所有交易對 × 規模階梯一次批次報價（1 / 100 / 1000 單位）
+        # 設定 PRICE_DAEMON_SOCKET 時報價經本機報價服務（與其他機器人共用節點連線）
+        quotes = price_source(self.w3.batch)
+        self.routers = {name: FastRouter(quotes, c.address) for name, c in self.exchanges.items()}
+        self.size_units = (1, 100, 1000)
 
     def _init_exchanges(self):
         return {
@@ -101,63 +115,72 @@ class USDTPriceMonitor:
     def get_all(self):
         results = {}
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {}
-            # 為每個交易所與交易對提交查詢任務
-            for name, contract in self.exchanges.items():
-                for pair_name, path in self.paths.items():
-                    fut = executor.submit(self._get_pair_price, contract, path)
-                    futures[fut] = (name, pair_name)
+            # 為每個交易所提交一個批次報價任務
+            futures = {executor.submit(self._get_curves, name): name for name in self.exchanges}
 
             # 處理完成的任務
             for fut in concurrent.futures.as_completed(futures):
-                name, pair_name = futures[fut]
-                data = fut.result()
-                if data['buy'] > 0 or data['sell'] > 0:
-                    results.setdefault(name, {})[pair_name] = data
+                name = futures[fut]
+                for pair_name, curve in fut.result().items():
+                    data = self._get_pair_price(curve, self.paths[pair_name])
+                    if data['buy'] > 0 or data['sell'] > 0:
+                        results.setdefault(name, {})[pair_name] = data
 
         return results
 
-    def _get_pair_price(self, contract, path):
+    def _get_curves(self, name):
         try:
-            input_amount = 10 ** TOKEN_DECIMALS[path[0]]
-            amounts = contract.functions.getAmountsOut(input_amount, path).call()
-            if len(amounts) < 2:
-                return {'buy': 0, 'sell': 0, 'spread': 0}
-
-            # 計算買入與賣出價格
-            buy_price = amounts[-1] / 10 ** TOKEN_DECIMALS[path[-1]]
-            sell_price = 1 / buy_price if buy_price != 0 else 0
-            return {
-                'buy': buy_price,
-                'sell': sell_price,
-                'spread': sell_price - buy_price
-            }
-        except ContractLogicError:
-            return {'buy': 0, 'sell': 0, 'spread': 0}
+            plans = [(path, [u * 10 ** TOKEN_DECIMALS[path[0]] for u in self.size_units])
+                     for path in self.paths.values()]
+            return dict(zip(self.paths, curves_from_router(self.routers[name], plans)))
         except Exception:
-            # 發生其他錯誤時切換 RPC 節點
+            # 發生錯誤時切換 RPC 節點
             self.w3.switch_provider()
-            return {'buy': 0, 'sell': 0, 'spread': 0}
+            return {}
+
+    def _get_pair_price(self, curve, path):
+        if not curve:
+            return {'buy': 0, 'sell': 0, 'spread': 0, 'impact': 0}
+        input_amount = 10 ** TOKEN_DECIMALS[path[0]]
+
+        # 計算買入與賣出價格
+        buy_price = curve.amount_out(input_amount) / 10 ** TOKEN_DECIMALS[path[-1]]
+        sell_price = 1 / buy_price if buy_price != 0 else 0
+        return {
+            'buy': buy_price,
+            'sell': sell_price,
+            'spread': sell_price - buy_price,
+            # 最大規模相對 1 單位的價格衝擊（池深度）
+            'impact': curve.impact(self.size_units[-1] * input_amount)
+        }
 
 # --------------------------
 # 終端顯示模組
 # --------------------------
 class AdvancedDisplay:
-    @staticmethod
-    def clear():
-        os.system('cls' if os.name == 'nt' else 'clear')
+    def __init__(self):
+        # 繪製在背景執行緒進行，監控迴圈只送出快照
+        self.dashboard = Dashboard(self.render, header_rows=2).start()
 
     @staticmethod
-    def show(data):
-        AdvancedDisplay.clear()
-        print("\n🔥 BSC 交易所 USDT 交易對即時監控")
+    def render(data) -> list:
+        lines = ["", "🔥 BSC 交易所 USDT 交易對即時監控"]
         for exchange, pairs in data.items():
-            print(f"\n🔷 {exchange.upper()} 交易所")
-            print(f"{'交易對':<10}{'買入(USDT)':<15}{'賣出(USDT)':<15}{'價差':<10}")
-            print('-' * 50)
+            lines.append("")
+            lines.append(f"🔷 {exchange.upper()} 交易所")
+            lines.append(f"{'交易對':<10}{'買入(USDT)':<15}{'賣出(USDT)':<15}{'價差':<12}{'千U衝擊':<10}")
+            lines.append('-' * 62)
             for pair_name, values in pairs.items():
-                print(f"{pair_name:<10}{values['buy']:<15.6f}{values['sell']:<15.6f}{values['spread']:+.6f}")
-        print("\n🔄 資料每 3 秒更新｜CTRL+C 退出")
+                lines.append(f"{pair_name:<10}{values['buy']:<15.6f}{values['sell']:<15.6f}{values['spread']:<+12.6f}{values['impact']:.3%}")
+        lines.append("")
+        lines.append("🔄 資料每個新區塊更新｜CTRL+C 退出")
+        return lines
+
+    def show(self, data):
+        self.dashboard.publish(data)
+
+    def close(self):
+        self.dashboard.close()
 
 # --------------------------
 # 主程式入口
@@ -166,12 +189,15 @@ def main():
     w3 = EnhancedWeb3(BSC_RPC_URLS)
     monitor = USDTPriceMonitor(w3)
     display = AdvancedDisplay()
+    # 每個新區塊刷新一次，區塊之間不再重複查詢
+    clock = BlockClock(w3.batch, ws_url=os.getenv("BSC_WS_URL")).start()
 
     try:
-        while True:
+        for block in clock.ticks():
             display.show(monitor.get_all())
-            time.sleep(3)
     except KeyboardInterrupt:
+        clock.stop()
+        display.close()
         print("\n🛑 監控已停止")
 
 if __name__ == '__main__':
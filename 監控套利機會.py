@@ -1,10 +1,17 @@
 import json
-import time
 import os
 import concurrent.futures
 from web3 import Web3
 from web3.exceptions import ContractLogicError
 from dotenv import load_dotenv
+from dashboard import Dashboard
+from transport import make_provider, set_rate_limiter
+from rate_limiter import RateLimiter
+from rpc_client import BatchRPCClient
+from block_clock import BlockClock
+from abi_codec import FastRouter
+from price_daemon import price_source
+from records import PairQuote, STATUS_LABELS, STATUS_PROFIT, STATUS_LOSS, STATUS_FLAT
 
 # --------------------------
 # 初始化配置
@@ -17,6 +24,8 @@ BSC_RPC_URLS = [
     "https://bsc-dataseed2.binance.org",
     "https://bsc-dataseed3.binance.org"
 ]
+# 各節點令牌桶限流：超速時排隊等待，不再因 429 頻繁切換節點
+set_rate_limiter(RateLimiter.for_urls(BSC_RPC_URLS))
 
 # --------------------------
 # 完整合約ABI配置
@@ -112,12 +121,12 @@ class EnhancedWeb3:
         self.current_provider = 0
         self.w3 = self._connect()
         self._verify_connection()
+        # 零散讀取（區塊高度、Gas、餘額、nonce、收據）自動合併成批次請求
+        self.batch = BatchRPCClient(self.rpc_urls[self.current_provider], urls=self.rpc_urls)
 
     def _connect(self):
-        return Web3(Web3.HTTPProvider(
-            self.rpc_urls[self.current_provider],
-            request_kwargs={'timeout': 10}
-        ))
+        # 共用長連線池：切換節點時沿用已暖機的連線
+        return Web3(make_provider(self.rpc_urls[self.current_provider], timeout=10))
 
     def _verify_connection(self):
         if not self.w3.is_connected():
@@ -129,6 +138,7 @@ class EnhancedWeb3:
         print(f"🔄 切換到節點: {self.rpc_urls[self.current_provider]}")
         self.w3 = self._connect()
         self._verify_connection()
+        self.batch.set_url(self.rpc_urls[self.current_provider])
 
     def __getattr__(self, name):
         return getattr(self.w3, name)
@@ -164,6 +174,9 @@ class USDTPriceMonitor:
     def __init__(self, w3):
         self.w3 = w3
         self.exchanges = self._init_exchanges()  # 需要补充这个方法
+        # 报价走精简编解码；设定 PRICE_DAEMON_SOCKET 时经本机报价服务（与其他机器人共用节点连线）
+        quotes = price_source(self.w3.batch)
+        self.routers = {name: FastRouter(quotes, c.address) for name, c in self.exchanges.items()}
         self.base_token = CONTRACT_ADDRESSES["usdt"]
         
         # 明确定义交易路径（最终修正）
@@ -211,30 +224,18 @@ class USDTPriceMonitor:
             for future in concurrent.futures.as_completed(futures):
                 try:
                     data = future.result()
-                    exchange = data["exchange"]
-                    pair = data["pair"]
-                    if exchange not in results:
-                        results[exchange] = {}
-                    results[exchange][pair] = data
+                    results.setdefault(data.exchange, {})[data.pair] = data
                 except Exception as e:
                     print(f"❌ 查询失败: {str(e)}")
         return results
 
     def _get_error_data(self, exchange, pair):
         """错误数据处理（新增方法）"""
-        return {
-            "exchange": exchange,
-            "pair": pair,
-            "buy_price": 0,
-            "sell_price": 0,
-            "spread": 0,
-            "net_profit": 0,
-            "status": "⚪ 无数据"
-        }
+        return PairQuote(exchange, pair)
 
     def _get_pair_price(self, exchange_name, pair_name):
         """最终修正版价格计算"""
-        contract = self.exchanges[exchange_name]
+        contract = self.routers[exchange_name]
         paths = self.trading_pairs[pair_name]
         
         try:
@@ -251,23 +252,15 @@ class USDTPriceMonitor:
             fee = 0.003  # 0.3%手续费
             net_profit = sell_price*(1 - fee) - buy_price*(1 + fee)
             
-            # 判断交易状态
+            # 判断交易状态（状态以代码存放，显示时才转成文字）
             if net_profit > 0.1:
-                status = "🟢 盈利"
+                status = STATUS_PROFIT
             elif net_profit < -0.1:
-                status = "🔴 亏损"
+                status = STATUS_LOSS
             else:
-                status = "🟡 持平"
+                status = STATUS_FLAT
             
-            return {
-                "exchange": exchange_name,
-                "pair": pair_name,
-                "buy_price": buy_price,
-                "sell_price": sell_price,
-                "spread": sell_price - buy_price,
-                "net_profit": net_profit,
-                "status": status
-            }
+            return PairQuote(exchange_name, pair_name, buy_price, sell_price, net_profit, status)
         except Exception as e:
             print(f"价格查询异常: {str(e)}")
             return self._get_error_data(exchange_name, pair_name)
@@ -281,10 +274,7 @@ class USDTPriceMonitor:
             input_decimals = TOKEN_DECIMALS[path[0]]
             output_decimals = TOKEN_DECIMALS[path[-1]]
             
-            amounts = contract.functions.getAmountsOut(
-                1 * 10 ** input_decimals,
-                path
-            ).call()
+            amounts = contract.get_amounts_out(1 * 10 ** input_decimals, path)
             
             return amounts[-1] / 10 ** output_decimals
         except Exception as e:
@@ -298,29 +288,35 @@ class USDTPriceMonitor:
 # 终端显示模块（优化版）
 # --------------------------
 class AdvancedDisplay:
-    @staticmethod
-    def clear_screen():
-        """清空终端屏幕"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+    def __init__(self):
+        """背景執行緒繪製，只重寫有變動的列"""
+        self.dashboard = Dashboard(self.render, header_rows=3).start()
 
     @staticmethod
-    def show(data):
-        AdvancedDisplay.clear_screen()
-        print("\n🔥 BSC交易所套利监控系统")
-        print("📌 买价=购买1个代币所需USDT | 卖价=卖出1个代币获得USDT | 手续费=0.3%")
-        
+    def render(data) -> list:
+        lines = ["", "🔥 BSC交易所套利监控系统",
+                 "📌 买价=购买1个代币所需USDT | 卖价=卖出1个代币获得USDT | 手续费=0.3%"]
         for exchange, pairs in data.items():
-            print(f"\n🔷 {exchange.upper()}交易所")
-            print(f"{'代币':<4} | {'买价':<6} | {'卖价':<6} | {'价差':<8} | {'净收益':<7} | {'状态':<6}")
-            print("-" * 70)
-            for pair, values in pairs.items():
-                print(f"{pair:<6} | "
-                      f"{values['buy_price']:<8.4f} | "
-                      f"{values['sell_price']:<8.4f} | "
-                      f"{values['spread']:>+10.4f} | "
-                      f"{values['net_profit']:>+10.4f} | "
-                      f"{values['status']}")
-        print("\n🔄 数据每3秒刷新 | CTRL+C 退出")
+            lines.append("")
+            lines.append(f"🔷 {exchange.upper()}交易所")
+            lines.append(f"{'代币':<4} | {'买价':<6} | {'卖价':<6} | {'价差':<8} | {'净收益':<7} | {'状态':<6}")
+            lines.append("-" * 70)
+            for pair, q in pairs.items():
+                lines.append(f"{pair:<6} | "
+                             f"{q.buy_price:<8.4f} | "
+                             f"{q.sell_price:<8.4f} | "
+                             f"{q.spread:>+10.4f} | "
+                             f"{q.net_profit:>+10.4f} | "
+                             f"{STATUS_LABELS[q.status]}")
+        lines.append("")
+        lines.append("🔄 数据每个新区块刷新 | CTRL+C 退出")
+        return lines
+
+    def show(self, data):
+        self.dashboard.publish(data)
+
+    def close(self):
+        self.dashboard.close()
 
 
 # --------------------------
@@ -329,26 +325,23 @@ class AdvancedDisplay:
 def main():
     # 初始化區塊鏈連接
     web3 = EnhancedWeb3(BSC_RPC_URLS)
-    print(f"✅ 連接成功 | 最新區塊高度: {web3.eth.block_number}")
+    print(f"✅ 連接成功 | 最新區塊高度: {web3.batch.block_number()}")
     
     # 啟動價格監控系統
     monitor = USDTPriceMonitor(web3)
     display = AdvancedDisplay()
+    # 每個新區塊刷新一次，區塊之間不再重複查詢
+    clock = BlockClock(web3.batch, ws_url=os.getenv("BSC_WS_URL")).start()
     
     try:
-        while True:
-            start_time = time.time()
-            
+        for block in clock.ticks():
             # 獲取並顯示價格數據
             price_data = monitor.get_all_prices()
             display.show(price_data)
             
-            # 精確控制刷新頻率
-            elapsed = time.time() - start_time
-            sleep_time = max(5.0 - elapsed, 0)
-            time.sleep(sleep_time)
-            
     except KeyboardInterrupt:
+        clock.stop()
+        display.close()
         print("\n🛑 監控系統已安全停止")
 
 if __name__ == "__main__":